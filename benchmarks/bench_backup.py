@@ -0,0 +1,96 @@
+"""Till commit latency while Backup.backup copies the live database.
+
+Builds a database of about --mb megabytes, then runs a till process that
+commits one small order row every --every-ms milliseconds and reports its
+commit latency (p50/p99/max) in three phases: no backup, a throttled
+backup (the defaults: 256 pages, 10 ms off between steps) and an
+unthrottled one (everything in one step):
+
+    python benchmarks/bench_backup.py --mb 200 --compress zlib
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from Backup import backup  # noqa: E402
+from DBProxy import DBProxy  # noqa: E402
+from Migrations import ensure_schema  # noqa: E402
+
+
+def setup(db_path: str, mb: int) -> None:
+    db = DBProxy(db_path, pooled=True)
+    ensure_schema(db)
+    rows = mb * 1024 * 1024 // 600
+    db.bulk_insert('gastos', ['data', 'categoria', 'descricao', 'valor_centavos', 'created_at'],
+                   (('2024-01-01', 'insumos', 'x' * 500, i, '2024-01-01T00:00:00') for i in range(rows)),
+                   chunk_size=20_000)
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def till(db_path: str, every: float, stop, out) -> None:
+    db = DBProxy(db_path, pooled=True)
+    lat = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        db.execute("INSERT INTO pedidos (id, mesa, status, total_centavos, criado_em) "
+                   "VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM pedidos), '1', 'aberto', 1000, '2024')",
+                   commit=True)
+        lat.append(time.perf_counter() - t0)
+        time.sleep(every)
+    out.put(lat)
+
+
+def phase(name: str, db_path: str, every: float, work) -> dict:
+    ctx = mp.get_context('spawn')
+    stop, out = ctx.Event(), ctx.Queue()
+    p = ctx.Process(target=till, args=(db_path, every, stop, out))
+    p.start()
+    time.sleep(1.0)   # let the till import and warm up
+    t0 = time.perf_counter()
+    res = work()
+    seconds = time.perf_counter() - t0
+    stop.set()
+    lat = sorted(out.get())
+    p.join()
+    report = {'phase': name, 'seconds': round(seconds, 2), 'commits': len(lat),
+              'p50_ms': round(statistics.median(lat) * 1000, 3),
+              'p99_ms': round(lat[min(len(lat) - 1, int(0.99 * len(lat)))] * 1000, 3),
+              'max_ms': round(lat[-1] * 1000, 3)}
+    if res is not None:
+        report.update(pages=res.pages, archive_mb=round(res.size / 2 ** 20, 1), verified=res.verified)
+    print(json.dumps(report), file=sys.stderr)
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--mb', type=int, default=100)
+    ap.add_argument('--every-ms', type=float, default=5.0)
+    ap.add_argument('--idle-s', type=float, default=5.0, help='length of the no-backup phase')
+    ap.add_argument('--compress', choices=('none', 'zlib', 'lzma'), default='zlib')
+    args = ap.parse_args(argv)
+    every = args.every_ms / 1000
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data', 'SysDB.db')
+        setup(db_path, args.mb)
+        dest = os.path.join(tmp, 'backups')
+        results.append(phase('no backup', db_path, every, lambda: time.sleep(args.idle_s)))
+        results.append(phase('throttled backup', db_path, every,
+                             lambda: backup(db_path, dest, compress=args.compress)))
+        results.append(phase('unthrottled backup', db_path, every,
+                             lambda: backup(db_path, dest, compress=args.compress, pages=-1, sleep=0)))
+    print(json.dumps({'db_mb': args.mb, 'compress': args.compress, 'results': results}, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Throughput of the DBServer service mode with 1 vs N client processes.
+
+Starts ``src/DBServer.py`` on a Unix socket in a temporary directory, then
+runs the same workload from 1 and from --clients client processes: each
+client does --ops operations, --write-pct percent of them inserts and the
+rest point reads by id. The status quo, every process opening the database
+file through its own DBProxy, is measured the same way:
+
+    python benchmarks/bench_dbserver.py --clients 8 --ops 2000 --pipeline 16
+
+--pipeline keeps that many requests in flight per client (1 = wait for
+each reply before sending the next).
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from DBProxy import DBProxy  # noqa: E402
+from RemoteDBProxy import RemoteDBProxy  # noqa: E402
+
+INSERT = "INSERT INTO eventos (cliente, n, texto) VALUES (?, ?, ?)"
+SELECT = "SELECT id, cliente, n, texto FROM eventos WHERE id = ?"
+
+
+def setup(db_path: str, rows: int = 10_000) -> None:
+    db = DBProxy(db_path, pooled=True)
+    db.execute("CREATE TABLE eventos (id INTEGER PRIMARY KEY, cliente INTEGER, n INTEGER, texto TEXT)",
+               commit=True)
+    db.bulk_insert('eventos', ['cliente', 'n', 'texto'], ((-1, i, 'x' * 40) for i in range(rows)))
+
+
+def client(mode: str, target: str, k: int, ops: int, write_pct: int, pipeline: int, start, out) -> None:
+    rnd = random.Random(k)
+    plan = [rnd.randrange(100) < write_pct for _ in range(ops)]
+    if mode == 'direct':
+        db = DBProxy(target, pooled=True)
+    else:
+        db = RemoteDBProxy(target)
+    start.wait()
+    t0 = time.perf_counter()
+    if mode == 'direct':
+        for i, write in enumerate(plan):
+            if write:
+                db.execute(INSERT, (k, i, 'y' * 40), commit=True)
+            else:
+                db.query_one(SELECT, (rnd.randint(1, 10_000),))
+    else:
+        inflight = []
+        for i, write in enumerate(plan):
+            if write:
+                inflight.append(db.execute_async(INSERT, (k, i, 'y' * 40)))
+            else:
+                inflight.append(db.query_all_async(SELECT, (rnd.randint(1, 10_000),)))
+            if len(inflight) >= pipeline:
+                inflight.pop(0).result()
+        for f in inflight:
+            f.result()
+    out.put(time.perf_counter() - t0)
+
+
+def run(mode: str, target: str, clients: int, ops: int, write_pct: int, pipeline: int) -> dict:
+    ctx = mp.get_context('spawn')
+    start, out = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=client, args=(mode, target, k, ops, write_pct, pipeline, start, out))
+             for k in range(clients)]
+    for p in procs:
+        p.start()
+    time.sleep(0.5 + 0.1 * clients)   # let every client import and connect
+    t0 = time.perf_counter()
+    start.set()
+    times = [out.get() for _ in procs]
+    wall = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    total = clients * ops
+    return {'mode': mode, 'clients': clients, 'pipeline': pipeline if mode == 'server' else 1,
+            'ops_per_s': round(total / wall), 'slowest_client_s': round(max(times), 3)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--clients', type=int, default=8)
+    ap.add_argument('--ops', type=int, default=2000, help='operations per client')
+    ap.add_argument('--write-pct', type=int, default=20)
+    ap.add_argument('--pipeline', type=int, default=16)
+    args = ap.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'SysDB.db')
+        sock = os.path.join(tmp, 'sysdb.sock')
+        setup(db_path)
+        server = subprocess.Popen([sys.executable, os.path.join(SRC, 'DBServer.py'), '--db', db_path,
+                                   '--unix', sock], cwd=tmp)
+        try:
+            for _ in range(100):
+                if os.path.exists(sock):
+                    break
+                time.sleep(0.05)
+            for n in (1, args.clients):
+                results.append(run('direct', db_path, n, args.ops, args.write_pct, 1))
+                results.append(run('server', f'unix:{sock}', n, args.ops, args.write_pct, 1))
+                results.append(run('server', f'unix:{sock}', n, args.ops, args.write_pct, args.pipeline))
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps({'ops_per_client': args.ops, 'write_pct': args.write_pct, 'results': results}, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
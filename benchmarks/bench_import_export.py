@@ -0,0 +1,122 @@
+"""Throughput and peak memory of the streaming importer/exporter.
+
+Generates --rows users (with pre-hashed passwords, so the database side is
+what gets measured) and --rows gastos, then imports and exports both as CSV
+and JSONL into a temporary database:
+
+    python benchmarks/bench_import_export.py --rows 1000000
+
+Password hashing is measured separately on --hash-rows plain passwords with
+1 and --workers hasher processes: at the default PBKDF2 cost a million
+hashes take hours on any machine, so that stage is reported in hashes/s.
+
+The process's peak RSS is reported at the end; --trace-memory adds each
+step's tracemalloc peak (Python allocations, which should stay flat as
+--rows grows) at the price of much slower steps.
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from AuthUtils import hash_password  # noqa: E402
+from ImportExport import export_table, export_usuarios, import_table, import_usuarios  # noqa: E402
+from PasswordHasher import PasswordHasher  # noqa: E402
+
+USER_COLS = ['nome', 'sobrenome', 'cpf', 'nome_usuario', 'senha', 'tipo_acesso']
+GASTO_COLS = ['data', 'categoria', 'descricao', 'valor_centavos', 'created_at']
+
+
+def users(n: int, senha: str):
+    for i in range(n):
+        yield {'nome': f'Nome{i}', 'sobrenome': 'Silva', 'cpf': 10_000_000_000 + i,
+               'nome_usuario': f'user{i}', 'senha': senha, 'tipo_acesso': 'atend'}
+
+
+def gastos(n: int):
+    for i in range(n):
+        yield {'data': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}', 'categoria': ('luz', 'agua', 'insumos')[i % 3],
+               'descricao': f'nota {i}', 'valor_centavos': 100 + i % 10_000, 'created_at': '2024-01-01T00:00:00'}
+
+
+def write_file(path: str, records, cols) -> None:
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            w = csv.DictWriter(f, cols)
+            w.writeheader()
+            w.writerows(records)
+        else:
+            for r in records:
+                f.write(json.dumps(r) + '\n')
+
+
+def measure(name: str, rows: int, fn, trace: bool = False) -> dict:
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    res = {'step': name, 'rows': rows, 'seconds': round(secs, 2), 'rows_per_s': round(rows / secs)}
+    if trace:
+        res['peak_mib'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    if hasattr(out, 'rejected'):
+        res['rejected'] = out.rejected
+    print(json.dumps(res), file=sys.stderr)
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=1_000_000)
+    ap.add_argument('--chunk-size', type=int, default=5000)
+    ap.add_argument('--hash-rows', type=int, default=64)
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--trace-memory', action='store_true')
+    args = ap.parse_args(argv)
+
+    results = []
+    stored = hash_password('benchmark')
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ('csv', 'jsonl'):
+            db = os.path.join(tmp, fmt, 'SysDB.db')
+            os.makedirs(os.path.dirname(db))
+            src_u, src_g = os.path.join(tmp, f'usuarios.{fmt}'), os.path.join(tmp, f'gastos.{fmt}')
+            write_file(src_u, users(args.rows, stored), USER_COLS)
+            write_file(src_g, gastos(args.rows), GASTO_COLS)
+            trace = args.trace_memory
+            results.append(measure(f'import usuarios {fmt}', args.rows,
+                                   lambda: import_usuarios(src_u, db, chunk_size=args.chunk_size), trace))
+            results.append(measure(f'import gastos {fmt}', args.rows,
+                                   lambda: import_table('gastos', src_g, db, chunk_size=args.chunk_size), trace))
+            out = os.path.join(tmp, f'out.{fmt}')
+            results.append(measure(f'export usuarios {fmt}', args.rows, lambda: export_usuarios(out, db), trace))
+            results.append(measure(f'export gastos {fmt}', args.rows, lambda: export_table('gastos', out, db), trace))
+            os.remove(src_u)
+            os.remove(src_g)
+
+        plain = os.path.join(tmp, 'plain.csv')
+        write_file(plain, users(args.hash_rows, 'segredo'), USER_COLS)
+        for workers in sorted({1, args.workers}):
+            db = os.path.join(tmp, f'hash{workers}', 'SysDB.db')
+            os.makedirs(os.path.dirname(db))
+            hasher = PasswordHasher(workers, inline=workers == 1)
+            res = measure(f'import usuarios, hashing with {workers} worker(s)', args.hash_rows,
+                          lambda: import_usuarios(plain, db, hasher=hasher, chunk_size=max(1, args.hash_rows // 4)))
+            hasher.shutdown()
+            results.append(res)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss   # KiB on Linux
+    print(json.dumps({'rows': args.rows, 'chunk_size': args.chunk_size, 'peak_rss_mib': round(peak_rss / 1024, 1),
+                      'results': results}, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""CPU cost of a brute-force login loop with and without the rate limiter.
+
+Runs headless against a temporary database:
+
+    python benchmarks/bench_login_attack.py --attempts 200
+
+For each mode it reports the attacker's attempts, how many were rejected
+before hashing, process CPU seconds spent, and the latency of a legitimate
+login made from another terminal right after the attack.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from AuthService import AuthService  # noqa: E402
+from PasswordHasher import PasswordHasher  # noqa: E402
+from RateLimiter import LoginRateLimiter  # noqa: E402
+from Usuario import Usuario  # noqa: E402
+
+
+def run(attempts: int, limited: bool, db_path: str) -> dict:
+    repo = Usuario(db_path)
+    # inline hashing so the KDF cost shows up in this process's CPU time
+    hasher = PasswordHasher(inline=True)
+    if limited:
+        limiter = LoginRateLimiter()
+    else:
+        limiter = LoginRateLimiter(max_failures=attempts + 1, max_per_terminal=attempts + 1)
+    svc = AuthService(repo, hasher, rate_limiter=limiter, verify_ttl=0)
+
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    rejected = 0
+    for i in range(attempts):
+        res = svc.authenticate('vitima', f'chute{i}', terminal='atacante')
+        if res.retry_after:
+            rejected += 1
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+
+    t0 = time.perf_counter()
+    ok = svc.authenticate('caixa', 'senha-caixa', terminal='caixa-1').ok
+    legit_ms = (time.perf_counter() - t0) * 1000
+    return {'mode': 'limited' if limited else 'unlimited', 'attempts': attempts, 'rejected': rejected,
+            'cpu_s': round(cpu, 4), 'wall_s': round(wall, 4),
+            'cpu_per_attempt_ms': round(cpu * 1000 / attempts, 3),
+            'legit_login_ok': ok, 'legit_login_ms': round(legit_ms, 2)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--attempts', type=int, default=200)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'SysDB.db')
+        repo = Usuario(db_path)
+        repo.adicionar('Vitima', 'Alvo', '1', 'vitima', 'segredo-forte')
+        repo.adicionar('Caixa', 'Um', '2', 'caixa', 'senha-caixa')
+        results = [run(args.attempts, False, db_path), run(args.attempts, True, db_path)]
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
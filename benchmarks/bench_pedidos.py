@@ -0,0 +1,92 @@
+"""Orders per second through the Pedidos engine.
+
+Runs headless against a temporary database:
+
+    python benchmarks/bench_pedidos.py --orders 2000 --updates 3
+
+Each order is created with two items, updated --updates times and closed.
+Reports orders/s and mutations/s for the engine, and the same workload
+written row by row with one commit per mutation as a baseline.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from DBProxy import DBProxy  # noqa: E402
+from Migrations import ensure_schema  # noqa: E402
+from Pedidos import Pedidos  # noqa: E402
+
+
+def seed(db_path: str, produtos: int = 50) -> None:
+    db = DBProxy(db_path)
+    ensure_schema(db)
+    db.bulk_insert('produtos', ['nome', 'preco_centavos', 'created_at'],
+                   [(f'produto {i}', 500 + i * 10, '2024-01-01T00:00:00') for i in range(1, produtos + 1)])
+    db.close()
+
+
+def run_engine(db_path: str, orders: int, updates: int) -> dict:
+    pedidos = Pedidos(db_path)
+    t0 = time.perf_counter()
+    for n in range(orders):
+        pid = pedidos.criarPedido(mesa=str(n % 20), itens=[{'produto_id': 1 + n % 50, 'quantidade': 1},
+                                                          {'produto_id': 1 + (n * 7) % 50, 'quantidade': 2}])
+        for u in range(updates):
+            pedidos.atualizarPedido(pid, adicionar=[{'produto_id': 1 + (n + u) % 50, 'quantidade': 1}])
+        pedidos.fecharPedido(pid)
+    pedidos.close()
+    wall = time.perf_counter() - t0
+    return {'mode': 'engine', 'orders': orders, 'wall_s': round(wall, 4),
+            'orders_per_s': round(orders / wall, 1),
+            'mutations_per_s': round(orders * (updates + 2) / wall, 1)}
+
+
+def run_naive(db_path: str, orders: int, updates: int) -> dict:
+    db = DBProxy(db_path)
+    precos = {r['id']: r['preco_centavos'] for r in db.query_all("SELECT id, preco_centavos FROM produtos")}
+    next_id = (db.query_one("SELECT COALESCE(MAX(id), 0) FROM pedidos")[0] or 0) + 1
+    item_sql = ("INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unit_centavos) "
+                "VALUES (?, ?, ?, ?)")
+    t0 = time.perf_counter()
+    for n in range(orders):
+        pid = next_id + n
+        db.execute("INSERT INTO pedidos (id, mesa, criado_em) VALUES (?, ?, datetime('now'))",
+                   (pid, str(n % 20)), commit=True)
+        for p, q in ((1 + n % 50, 1), (1 + (n * 7) % 50, 2)):
+            db.execute(item_sql, (pid, p, q, precos[p]), commit=True)
+        for u in range(updates):
+            p = 1 + (n + u) % 50
+            db.execute(item_sql, (pid, p, 1, precos[p]), commit=True)
+        db.execute("UPDATE pedidos SET status = 'fechado', fechado_em = datetime('now'), total_centavos = "
+                   "(SELECT SUM(quantidade * preco_unit_centavos) FROM pedido_itens WHERE pedido_id = ?) "
+                   "WHERE id = ?", (pid, pid), commit=True)
+    wall = time.perf_counter() - t0
+    db.close()
+    return {'mode': 'naive', 'orders': orders, 'wall_s': round(wall, 4),
+            'orders_per_s': round(orders / wall, 1),
+            'mutations_per_s': round(orders * (updates + 2) / wall, 1)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--orders', type=int, default=2000)
+    ap.add_argument('--updates', type=int, default=3)
+    args = ap.parse_args(argv)
+
+    results = []
+    for runner in (run_naive, run_engine):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'SysDB.db')
+            seed(db_path)
+            results.append(runner(db_path, args.orders, args.updates))
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Report generation time: columnar Relatorios engine vs a naive SQL + Python loop.
+
+Seeds a temporary database with a year of closed orders and expenses, then
+times both implementations over the whole year:
+
+    python benchmarks/bench_relatorios.py --lines 1000000
+
+The naive baseline fetches every line as sqlite3.Row, parses the timestamp in
+Python and groups with dicts. Results are checked against each other.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from DBProxy import DBProxy  # noqa: E402
+from Migrations import ensure_schema  # noqa: E402
+from Relatorios import Relatorios, np  # noqa: E402
+
+INICIO = date(2024, 1, 1)
+FIM = date(2024, 12, 31)
+
+
+def seed(db_path: str, lines: int, produtos: int = 60, por_pedido: int = 3) -> None:
+    db = DBProxy(db_path)
+    ensure_schema(db)
+    rnd = random.Random(42)
+    db.bulk_insert('produtos', ['nome', 'preco_centavos', 'created_at'],
+                   [(f'produto {i}', rnd.randint(300, 3000), '2024-01-01') for i in range(1, produtos + 1)])
+    precos = [r[0] for r in db.query_all("SELECT preco_centavos FROM produtos ORDER BY id")]
+    pedidos = lines // por_pedido
+    segundos = int((FIM - INICIO).total_seconds()) + 86400
+
+    def pedido_rows():
+        base = datetime(2024, 1, 1)
+        for pid in range(1, pedidos + 1):
+            ts = (base + timedelta(seconds=rnd.randrange(segundos))).isoformat(timespec='seconds')
+            yield (pid, 'fechado', 0, ts, ts)
+
+    def item_rows():
+        for pid in range(1, pedidos + 1):
+            for _ in range(por_pedido):
+                prod = rnd.randint(1, produtos)
+                yield (pid, prod, 'x', rnd.randint(1, 3), precos[prod - 1])
+
+    db.bulk_insert('pedidos', ['id', 'status', 'total_centavos', 'criado_em', 'fechado_em'], pedido_rows(),
+                   chunk_size=20000)
+    db.bulk_insert('pedido_itens', ['pedido_id', 'produto_id', 'descricao', 'quantidade', 'preco_unit_centavos'],
+                   item_rows(), chunk_size=20000)
+    db.bulk_insert('gastos', ['data', 'categoria', 'valor_centavos', 'created_at'],
+                   (((INICIO + timedelta(days=rnd.randrange(366))).isoformat(), 'fornecedor',
+                     rnd.randint(1000, 50000), '2024-01-01') for _ in range(5000)))
+    db.close()
+
+
+def naive(db_path: str) -> dict:
+    db = DBProxy(db_path)
+    receita_dia = defaultdict(float)
+    receita_hora = defaultdict(float)
+    receita_semana = defaultdict(float)
+    por_produto = defaultdict(lambda: [0.0, 0.0])
+    rows = db.query_all(
+        "SELECT p.fechado_em, i.produto_id, i.quantidade, i.preco_unit_centavos "
+        "FROM pedidos p JOIN pedido_itens i ON i.pedido_id = p.id "
+        "WHERE p.status = 'fechado' AND p.fechado_em >= ? AND p.fechado_em < ?",
+        (INICIO.isoformat(), (FIM + timedelta(days=1)).isoformat()))
+    for r in rows:
+        ts = datetime.fromisoformat(r['fechado_em'])
+        valor = r['quantidade'] * r['preco_unit_centavos']
+        receita_dia[ts.date()] += valor
+        receita_hora[ts.hour] += valor
+        receita_semana[ts.isoweekday() % 7] += valor
+        p = por_produto[r['produto_id']]
+        p[0] += r['quantidade']
+        p[1] += valor
+    gastos_dia = defaultdict(int)
+    for r in db.query_all("SELECT data, valor_centavos FROM gastos WHERE data BETWEEN ? AND ?",
+                          (INICIO.isoformat(), FIM.isoformat())):
+        gastos_dia[date.fromisoformat(r['data'])] += r['valor_centavos']
+    db.close()
+    return {'receita': round(sum(receita_dia.values())), 'gastos': sum(gastos_dia.values()),
+            'produtos': len(por_produto)}
+
+
+def timed(fn):
+    """Wall time of one run, and peak traced memory of a second run (tracing slows it down)."""
+    t0 = time.perf_counter()
+    out = fn()
+    wall = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, wall, peak
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--lines', type=int, default=300_000)
+    ap.add_argument('--chunk-size', type=int, default=50_000)
+    args = ap.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'SysDB.db')
+        seed(db_path, args.lines)
+        base, wall, peak = timed(lambda: naive(db_path))
+        results.append({'mode': 'naive', 'wall_s': round(wall, 3), 'peak_mib': round(peak / 2**20, 1)})
+        modos = [False] + ([True] if np is not None else [])
+        for use_numpy in modos:
+            rel = Relatorios(db_path, chunk_size=args.chunk_size, use_numpy=use_numpy)
+            r, wall, peak = timed(lambda: rel.gerar(INICIO, FIM))
+            assert r['totais']['receita_centavos'] == base['receita'], (r['totais'], base)
+            assert r['totais']['gastos_centavos'] == base['gastos']
+            results.append({'mode': 'numpy' if use_numpy else 'array', 'wall_s': round(wall, 3),
+                            'peak_mib': round(peak / 2**20, 1)})
+    print(json.dumps({'lines': args.lines, 'results': results}, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
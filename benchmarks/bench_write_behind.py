@@ -0,0 +1,92 @@
+"""Write throughput: commit per statement vs the WriteBehindQueue group commit.
+
+Several producer threads each insert rows into a temporary database, either
+committing every statement on their own pooled connection (what a click did
+before) or submitting it to the shared WriteBehindQueue and waiting for the
+future:
+
+    python benchmarks/bench_write_behind.py --threads 8 --writes 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from DBProxy import DBProxy, ConnectionPool, WriteBehindQueue  # noqa: E402
+
+SQL = "INSERT INTO eventos (produtor, n, texto) VALUES (?, ?, ?)"
+
+
+def setup(db_path: str) -> None:
+    db = DBProxy(db_path, pooled=True)
+    db.execute("CREATE TABLE eventos (id INTEGER PRIMARY KEY, produtor INTEGER, n INTEGER, texto TEXT)",
+               commit=True)
+
+
+def run(threads: int, writes: int, fn) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(k):
+        barrier.wait()
+        for i in range(writes):
+            fn(k, i)
+        ConnectionPool.get(DB_PATH).release()
+
+    ts = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for t in ts:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in ts:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    global DB_PATH
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--threads', type=int, default=8)
+    ap.add_argument('--writes', type=int, default=1000, help='writes per thread')
+    ap.add_argument('--durable', action='store_true', help='use synchronous=FULL for every write')
+    args = ap.parse_args(argv)
+    total = args.threads * args.writes
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        DB_PATH = os.path.join(tmp, 'SysDB.db')
+        setup(DB_PATH)
+        db = DBProxy(DB_PATH, pooled=True)
+        if args.durable:
+            ConnectionPool.get(DB_PATH).pragmas['synchronous'] = 'FULL'
+
+        def direct(k, i):
+            db.execute(SQL, (k, i, 'x' * 40), commit=True)
+
+        wall = run(args.threads, args.writes, direct)
+        results.append({'mode': 'commit_per_write', 'wall_s': round(wall, 3), 'writes_s': round(total / wall)})
+
+        wq = WriteBehindQueue(DB_PATH)
+
+        def queued(k, i):
+            wq.execute(SQL, (k, i, 'x' * 40), durable=args.durable).result()
+
+        wall = run(args.threads, args.writes, queued)
+        wq.close()
+        results.append({'mode': 'write_behind', 'wall_s': round(wall, 3), 'writes_s': round(total / wall),
+                        **wq.stats()})
+        assert db.query_one("SELECT COUNT(*) FROM eventos")[0] == 2 * total
+        ConnectionPool.get(DB_PATH).close_all()
+    print(json.dumps({'threads': args.threads, 'writes': total, 'durable': args.durable, 'results': results},
+                     indent=2))
+    return results
+
+
+DB_PATH = ''
+
+if __name__ == '__main__':
+    main()
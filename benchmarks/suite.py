@@ -0,0 +1,354 @@
+"""Benchmark suite: auth, user CRUD and pagination, bulk inserts, orders and reports.
+
+Seeds a temporary database with synthetic usuarios, products, stock, a year
+of closed orders and expenses at the requested scale, runs every case and
+writes the results as JSON. Runs headless (no Tk import):
+
+    python benchmarks/suite.py --scale 10k --out baseline.json
+    python benchmarks/suite.py --scale 10k --baseline baseline.json --tolerance 0.2
+    python benchmarks/suite.py --scale 1k --only auth,usuarios --repeat 5
+
+--scale is the number of usuarios and of order lines (1k, 10k, 100k, 1m or
+any integer); expenses are a tenth of it. Data is generated from a fixed
+seed. Each case runs --repeat times on the same database and the median of
+every measurement is kept. With --baseline the results are compared by name
+and the process exits with status 1 when a measurement got worse by more
+than --tolerance (a fraction), so a CI job or a pre-release check can gate
+on it. Compare runs made at the same scale on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from AuthService import AuthService  # noqa: E402
+from AuthUtils import hash_password  # noqa: E402
+from Controle import Controle  # noqa: E402
+from DBProxy import DBProxy, ConnectionPool  # noqa: E402
+from Estoque import Estoque  # noqa: E402
+from Gastos import Gastos  # noqa: E402
+from Migrations import ensure_schema  # noqa: E402
+from PasswordHasher import PasswordHasher  # noqa: E402
+from Pedidos import Pedidos  # noqa: E402
+from RateLimiter import LoginRateLimiter  # noqa: E402
+from Relatorios import Relatorios  # noqa: E402
+from Usuario import Usuario  # noqa: E402
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+INICIO = date(2024, 1, 1)
+FIM = date(2024, 12, 31)
+PRODUTOS = 60
+INSUMOS = 200
+# users with their own real password hash; the rest share one (hashing 1M passwords would take hours)
+LOGIN_USERS = 20
+
+CASES: 'OrderedDict[str, Callable[[str, int], List[Dict[str, Any]]]]' = OrderedDict()
+
+
+def case(name: str):
+    def deco(fn):
+        CASES[name] = fn
+        return fn
+    return deco
+
+
+def rate(name: str, n: int, seconds: float, unit: str = 'ops/s') -> Dict[str, Any]:
+    return {'name': name, 'value': round(n / seconds, 1), 'unit': unit, 'better': 'higher'}
+
+
+def latency(name: str, samples: List[float]) -> List[Dict[str, Any]]:
+    """p50 and p95 of samples (seconds) in milliseconds."""
+    s = sorted(samples)
+    p95 = s[min(len(s) - 1, int(0.95 * len(s)))]
+    return [{'name': f'{name}.p50', 'value': round(statistics.median(s) * 1000, 4), 'unit': 'ms', 'better': 'lower'},
+            {'name': f'{name}.p95', 'value': round(p95 * 1000, 4), 'unit': 'ms', 'better': 'lower'}]
+
+
+def sample(fn: Callable[[], Any], n: int) -> List[float]:
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+# --- seeding ---
+def seed(db_path: str, n: int) -> List[Dict[str, Any]]:
+    """Create the synthetic data set; return the bulk insert rates measured while doing it."""
+    db = DBProxy(db_path, pooled=True)
+    ensure_schema(db)
+    rnd = random.Random(42)
+    now = '2024-01-01T00:00:00'
+    shared = hash_password('senha-compartilhada')
+    reais = [hash_password(f'senha{i}') for i in range(LOGIN_USERS)]
+    results = []
+
+    def usuarios():
+        for i in range(n):
+            yield (f'Nome{i}', f'Sobrenome{rnd.randrange(1000)}', 10_000_000_000 + i, f'usuario{i}',
+                   reais[i] if i < LOGIN_USERS else shared, '2024-01-01', 'atend' if i % 10 else 'admin', now)
+
+    t0 = time.perf_counter()
+    db.bulk_insert('usuarios', ['nome', 'sobrenome', 'cpf', 'nome_usuario', 'senha', 'data_admissao',
+                                'tipo_acesso', 'created_at'], usuarios(), chunk_size=20_000)
+    results.append(rate('dbproxy.bulk_insert.usuarios', n, time.perf_counter() - t0, 'rows/s'))
+
+    db.bulk_insert('produtos', ['nome', 'categoria', 'preco_centavos', 'created_at'],
+                   [(f'Produto {i}', 'bebida' if i % 2 else 'comida', rnd.randint(300, 3000), now)
+                    for i in range(1, PRODUTOS + 1)])
+    db.bulk_insert('estoque_itens', ['nome', 'unidade', 'quantidade', 'ponto_reposicao', 'custo_unit_centavos',
+                                     'created_at'],
+                   [(f'Insumo {i}', 'g', 1e9, rnd.choice((0, 2e9)), rnd.randint(1, 50), now)
+                    for i in range(1, INSUMOS + 1)])
+    db.bulk_insert('produto_ingredientes', ['produto_id', 'item_id', 'quantidade'],
+                   [(p, i, rnd.randint(1, 30)) for p in range(1, PRODUTOS + 1)
+                    for i in rnd.sample(range(1, INSUMOS + 1), 3)])
+    precos = [r[0] for r in db.query_all("SELECT preco_centavos FROM produtos ORDER BY id")]
+
+    por_pedido = 3
+    pedidos = max(n // por_pedido, 1)
+    segundos = int((FIM - INICIO).total_seconds()) + 86400
+    base = datetime(2024, 1, 1)
+
+    def pedido_rows():
+        for pid in range(1, pedidos + 1):
+            ts = (base + timedelta(seconds=rnd.randrange(segundos))).isoformat(timespec='seconds')
+            yield (pid, str(pid % 20), 'fechado', 0, ts, ts)
+
+    def item_rows():
+        for pid in range(1, pedidos + 1):
+            for _ in range(por_pedido):
+                prod = rnd.randint(1, PRODUTOS)
+                yield (pid, prod, f'Produto {prod}', rnd.randint(1, 3), precos[prod - 1])
+
+    db.bulk_insert('pedidos', ['id', 'mesa', 'status', 'total_centavos', 'criado_em', 'fechado_em'],
+                   pedido_rows(), chunk_size=20_000)
+    t0 = time.perf_counter()
+    db.bulk_insert('pedido_itens', ['pedido_id', 'produto_id', 'descricao', 'quantidade', 'preco_unit_centavos'],
+                   item_rows(), chunk_size=20_000)
+    results.append(rate('dbproxy.bulk_insert.pedido_itens', pedidos * por_pedido, time.perf_counter() - t0,
+                        'rows/s'))
+    db.execute("UPDATE pedidos SET total_centavos = (SELECT SUM(quantidade * preco_unit_centavos) "
+               "FROM pedido_itens WHERE pedido_id = pedidos.id)", commit=True)
+    db.bulk_insert('gastos', ['data', 'categoria', 'descricao', 'valor_centavos', 'created_at'],
+                   (((INICIO + timedelta(days=rnd.randrange(366))).isoformat(),
+                     rnd.choice(('fornecedor', 'aluguel', 'energia', 'salarios')), 'gasto',
+                     rnd.randint(1000, 50_000), now) for _ in range(max(n // 10, 100))))
+    Controle(db_path).reconstruir()
+    return results
+
+
+# --- cases ---
+@case('auth')
+def bench_auth(db_path: str, n: int) -> List[Dict[str, Any]]:
+    repo = Usuario(db_path)
+    limiter = LoginRateLimiter(max_failures=10**9, max_per_terminal=10**9)
+    # inline KDF: measures this process's hashing, not the pool's warm-up
+    svc = AuthService(repo, PasswordHasher(inline=True), rate_limiter=limiter, verify_ttl=0)
+    logins = [(f'usuario{i}', f'senha{i}') for i in range(LOGIN_USERS)]
+    t0 = time.perf_counter()
+    for u, p in logins:
+        assert svc.authenticate(u, p, terminal='bench').ok
+    out = [rate('auth.authenticate.cold', len(logins), time.perf_counter() - t0)]
+    # user rows now cached: the KDF alone
+    t0 = time.perf_counter()
+    for u, p in logins:
+        svc.authenticate(u, p, terminal='bench')
+    out.append(rate('auth.authenticate.kdf', len(logins), time.perf_counter() - t0))
+    cached = AuthService(repo, PasswordHasher(inline=True), rate_limiter=limiter)
+    for u, p in logins:
+        cached.authenticate(u, p, terminal='bench')
+    t0 = time.perf_counter()
+    for _ in range(50):
+        for u, p in logins:
+            cached.authenticate(u, p, terminal='bench')
+    out.append(rate('auth.authenticate.cached', 50 * len(logins), time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    for u, p in logins:
+        svc.authenticate(u + '-x', p, terminal='bench')
+    out.append(rate('auth.authenticate.unknown_user', len(logins), time.perf_counter() - t0))
+    return out
+
+
+@case('usuarios')
+def bench_usuarios(db_path: str, n: int) -> List[Dict[str, Any]]:
+    repo = Usuario(db_path)
+    rnd = random.Random(7)
+    out = latency('usuarios.listar.first_page', sample(lambda: repo.listar(True, limit=100), 50))
+    ids = [rnd.randint(1, n) for _ in range(50)]
+    it = iter(ids)
+    out += latency('usuarios.listar.keyset_page', sample(lambda: repo.listar(True, after_id=next(it), limit=100), 50))
+    termos = iter([f'Nome{rnd.randrange(n)}'[:6] for _ in range(50)])
+    out += latency('usuarios.listar.busca', sample(lambda: repo.listar(True, busca=next(termos), limit=100), 50))
+    # broad prefixes (newest first), narrow ones (ranked) and two-word queries; not 'nome' or
+    # 'sobrenome' alone: every seeded user has distinct words Nome<i>/Sobrenome<j>, and a prefix
+    # shared by n distinct words (unlike real names) costs a posting-list merge per word
+    buscas = iter([rnd.choice(('no', f'nome{rnd.randrange(n)}'[:7],
+                               f'sobrenome{rnd.randrange(1000)} nome{rnd.randrange(n)}'[:22]))
+                   for _ in range(50)])
+    out += latency('usuarios.buscar', sample(lambda: repo.buscar(next(buscas), 20), 50))
+    out += latency('usuarios.contar', sample(lambda: repo.contar(True), 20))
+    it = iter(ids)
+    out += latency('usuarios.obter', sample(lambda: repo.obter(next(it)), 50))
+    t0 = time.perf_counter()
+    total = sum(1 for _ in repo.iterar(True, colunas=('id', 'nome', 'nome_usuario')))
+    out.append(rate('usuarios.iterar', total, time.perf_counter() - t0, 'rows/s'))
+    t0 = time.perf_counter()
+    for uid in ids:
+        repo.atualizar(uid, sobrenome=f'Novo{uid}')
+    out.append(rate('usuarios.atualizar', len(ids), time.perf_counter() - t0))
+    wb = Usuario(db_path, write_behind=True)
+    t0 = time.perf_counter()
+    for uid in ids:
+        wb.atualizar(uid, sobrenome=f'Outro{uid}')
+    out.append(rate('usuarios.atualizar.write_behind', len(ids), time.perf_counter() - t0))
+    return out
+
+
+@case('pedidos')
+def bench_pedidos(db_path: str, n: int) -> List[Dict[str, Any]]:
+    pedidos = Pedidos(db_path)
+    Estoque(db_path).registrar(pedidos)
+    Controle(db_path).registrar(pedidos)
+    orders = max(min(n // 10, 2000), 50)
+    t0 = time.perf_counter()
+    for k in range(orders):
+        pid = pedidos.criarPedido(mesa=str(k % 20), itens=[{'produto_id': 1 + k % PRODUTOS, 'quantidade': 1},
+                                                          {'produto_id': 1 + (k * 7) % PRODUTOS, 'quantidade': 2}])
+        pedidos.atualizarPedido(pid, adicionar=[{'produto_id': 1 + (k * 3) % PRODUTOS, 'quantidade': 1}])
+        pedidos.fecharPedido(pid)
+    pedidos.close()
+    return [rate('pedidos.criar_atualizar_fechar', orders, time.perf_counter() - t0)]
+
+
+@case('relatorios')
+def bench_relatorios(db_path: str, n: int) -> List[Dict[str, Any]]:
+    rel = Relatorios(db_path)
+    t0 = time.perf_counter()
+    rel.gerar(INICIO, FIM)
+    out = [{'name': 'relatorios.gerar.ano', 'value': round(time.perf_counter() - t0, 4), 'unit': 's',
+            'better': 'lower'}]
+    ctl = Controle(db_path)
+    out += latency('controle.calcularBalanco.ano', sample(lambda: ctl.calcularBalanco(INICIO, FIM), 20))
+    gastos = Gastos(db_path)
+    gastos.somarGastos(INICIO, FIM)  # builds the prefix sums
+    out += latency('gastos.somarGastos.ano', sample(lambda: gastos.somarGastos(INICIO, FIM), 50))
+    t0 = time.perf_counter()
+    ctl.reconstruir()
+    out.append({'name': 'controle.reconstruir', 'value': round(time.perf_counter() - t0, 4), 'unit': 's',
+                'better': 'lower'})
+    return out
+
+
+# --- running and comparing ---
+def median_results(runs: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    by_name: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+    values: Dict[str, List[float]] = {}
+    for run in runs:
+        for m in run:
+            by_name.setdefault(m['name'], m)
+            values.setdefault(m['name'], []).append(m['value'])
+    return [{**m, 'value': statistics.median(values[name])} for name, m in by_name.items()]
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float,
+            floor_ms: float = 0.0) -> List[Dict[str, Any]]:
+    """Per-measurement change vs the baseline; 'regression' is set past the tolerance.
+
+    Latencies (ms) that moved by less than floor_ms never count: sub-millisecond
+    timings jitter by more than any sensible tolerance.
+    """
+    base = {m['name']: m for m in baseline}
+    rows = []
+    for m in results:
+        b = base.get(m['name'])
+        if b is None or not b['value']:
+            continue
+        change = (m['value'] - b['value']) / b['value']
+        worse = -change if m['better'] == 'higher' else change
+        if m['unit'] == 'ms' and abs(m['value'] - b['value']) < floor_ms:
+            worse = 0.0
+        rows.append({'name': m['name'], 'baseline': b['value'], 'value': m['value'], 'unit': m['unit'],
+                     'change_pct': round(100 * change, 1), 'regression': worse > tolerance})
+    return rows
+
+
+def environment(scale: int) -> Dict[str, Any]:
+    return {'scale': scale, 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'hash_iters': os.environ.get('SYSDB_HASH_ITERS'), 'timestamp': datetime.now().isoformat(timespec='seconds')}
+
+
+def parse_scale(text: str) -> int:
+    return SCALES.get(text.lower()) or int(text.replace('_', ''))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--scale', default='10k', help='1k, 10k, 100k, 1m or a number of rows')
+    ap.add_argument('--only', default='', help=f"comma separated cases ({', '.join(CASES)})")
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--out', help='write results to this JSON file')
+    ap.add_argument('--baseline', help='compare against a JSON file written by --out')
+    ap.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown, as a fraction')
+    ap.add_argument('--floor-ms', type=float, default=0.05,
+                    help='ignore latency changes smaller than this many milliseconds')
+    ap.add_argument('--keep-db', help='copy the seeded database here (to inspect or reuse it)')
+    args = ap.parse_args(argv)
+
+    scale = parse_scale(args.scale)
+    names = [c.strip() for c in args.only.split(',') if c.strip()] or list(CASES)
+    unknown = [c for c in names if c not in CASES]
+    if unknown:
+        ap.error(f'unknown cases: {unknown}')
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'SysDB.db')
+        t0 = time.perf_counter()
+        results += seed(db_path, scale)
+        print(f'seeded {scale} rows in {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+        for name in names:
+            runs = [CASES[name](db_path, scale) for _ in range(args.repeat)]
+            results += median_results(runs)
+            print(f'{name}: done', file=sys.stderr)
+        if args.keep_db:
+            dst = sqlite3.connect(args.keep_db)
+            with dst:
+                sqlite3.connect(db_path).backup(dst)
+            dst.close()
+        ConnectionPool.get(db_path).close_all()
+
+    report: Dict[str, Any] = {'environment': environment(scale), 'results': results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('scale') != scale:
+            print('warning: baseline was recorded at a different scale', file=sys.stderr)
+        report['comparison'] = compare(results, baseline['results'], args.tolerance, args.floor_ms)
+        regressions = [r for r in report['comparison'] if r['regression']]
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    for r in regressions:
+        print(f"REGRESSION {r['name']}: {r['baseline']} -> {r['value']} {r['unit']} ({r['change_pct']:+}%)",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,18 @@
+import threading
 import tkinter as tk
-from tkinter import messagebox, ttk, font as tkfont
+from tkinter import messagebox
 from const import WIN_WIDTH, WIN_HEIGHT
+from Startup import STARTUP
 
 
 class App:
+	def __init__(self):
+		# guards the lazily created services, which warm_up() may be building
+		# on its own thread when a screen first asks for them
+		self._lazy_lock = threading.RLock()
+		# usuarios.id of the logged-in user, set by showMenutype
+		self._usuario_id = None
+
 	def homeScreen(self, root=None):
 		"""Create a simple desktop home screen (Tkinter) with a welcome message.
 
@@ -47,9 +56,10 @@ class App:
 			# Provide an AuthService instance so the login dialog can authenticate
 			# against the DB (falls back to built-in accounts when needed).
 			from Login import Login
-			from AuthService import AuthService
-			authsvc = AuthService()
-			login_screen = Login(parent=root, auth_handler=authsvc.authenticate)
+			from TkBridge import TkBridge
+			authsvc = self._auth_service()
+			# password verification runs off the Tk thread through the bridge
+			login_screen = Login(parent=root, auth_handler=authsvc.authenticate, bridge=TkBridge(root))
 			creds = login_screen.show()
 			if creds is None:
 				messagebox.showinfo("Login", "Login cancelado.")
@@ -58,7 +68,9 @@ class App:
 				# If login set a userType (admin/atend), consider it a success and
 				# destroy the home screen before opening the menu.
 				ut = getattr(login_screen, 'userType', None)
-				if ut is not None:
+				if login_screen.retry_after:
+					messagebox.showwarning("Login", f"Muitas tentativas de login.\nTente novamente em {int(login_screen.retry_after) + 1} s.")
+				elif ut is not None:
 					if owns_root:
 						root.destroy()
 					else:
@@ -89,6 +101,13 @@ class App:
 		# Make the window non-resizable for a cleaner welcome screen
 		root.resizable(False, False)
 
+		# database, migrations and caches warm up once the window is on screen
+		def shown():
+			STARTUP.mark('first_window')
+			self.warm_up()
+
+		root.after_idle(shown)
+
 		if owns_root:
 			root.mainloop()
 
@@ -100,6 +119,7 @@ class App:
 		- If None -> show a message informing that the user type was not identified
 		"""
 		ut = getattr(login_instance, 'userType', None)
+		self._usuario_id = getattr(login_instance, 'userId', None)
 		# Dispatch to helper methods
 		if ut is True:
 			win, frm = self._new_menu_window(login_instance, title="Menu Administrativo")
@@ -138,23 +158,20 @@ class App:
 
 	def _render_admin_menu(self, frm, win):
 		"""Render the administrative menu inside the supplied frame."""
+		# the frame may hold a submenu we are coming back from
+		for w in list(frm.winfo_children()):
+			w.destroy()
+
 		label = tk.Label(frm, text="Menu Administrativo", font=("Segoe UI", 14, "bold"))
 		label.pack(pady=(4, 12))
 		msg = tk.Label(frm, text="Aqui você encontrará opções administrativas:", wraplength=380, justify=tk.CENTER)
 		msg.pack(pady=6)
 
-		def open_pedidos():
-			try:
-				from Pedidos import Pedidos
-				_ = Pedidos()
-				messagebox.showinfo("Pedidos", "Abrindo módulo Pedidos (placeholder)")
-			except Exception:
-				messagebox.showinfo("Pedidos", "Módulo Pedidos não implementado - placeholder.")
-
 		# main admin options
 		menu_frame = tk.Frame(frm)
 		menu_frame.pack(pady=(8, 6))
-		ped_btn = tk.Button(menu_frame, text="Pedidos", width=40, command=open_pedidos)
+		ped_btn = tk.Button(menu_frame, text="Pedidos", width=40,
+							command=lambda: self._render_atendimento_menu(frm, win, on_back=lambda: self._render_admin_menu(frm, win)))
 		ctr_btn = tk.Button(menu_frame, text="Controle", width=40, command=lambda: self._render_controle_menu(frm, win))
 		ped_btn.grid(row=0, column=0, padx=8, pady=6)
 		ctr_btn.grid(row=0, column=1, padx=8, pady=6)
@@ -180,8 +197,8 @@ class App:
 		usr_btn = tk.Button(opts, text="Usuários", width=20, command=lambda: self._render_user_management(frm, win))
 		est_btn = tk.Button(opts, text="Estoque", width=20, command=lambda: self._open_placeholder('Estoque'))
 		gas_btn = tk.Button(opts, text="Gastos", width=20, command=lambda: self._open_placeholder('Gastos'))
-		fat_btn = tk.Button(opts, text="Faturamento", width=20, command=lambda: self._open_placeholder('Faturamento'))
-		ges_btn = tk.Button(opts, text="Gestão", width=20, command=lambda: self._open_placeholder('Gestão'))
+		fat_btn = tk.Button(opts, text="Faturamento", width=20, command=lambda: self._render_relatorio(frm, win, 'faturamento'))
+		ges_btn = tk.Button(opts, text="Gestão", width=20, command=lambda: self._render_relatorio(frm, win, 'gestao'))
 
 		# 2-column grid
 		usr_btn.grid(row=0, column=0, padx=8, pady=6)
@@ -201,14 +218,116 @@ class App:
 		messagebox.showinfo(title, f"Abrindo {title} (placeholder)")
 
 
+	def _auth_service(self):
+		"""Return the AuthService shared by every login attempt on this App.
+
+		Keeping one instance keeps its caches and login throttling alive between
+		attempts; lockouts are also persisted in the database.
+		"""
+		with self._lazy_lock:
+			svc = getattr(self, '_auth', None)
+			if svc is None:
+				from AuthService import AuthService
+				from RateLimiter import LoginRateLimiter
+				from RemoteDBProxy import open_db
+				svc = self._auth = AuthService(rate_limiter=LoginRateLimiter(db=open_db()))
+			return svc
+
+
+	def _pedidos(self):
+		"""Return the Pedidos engine shared by this App's screens (created on first use).
+
+		Closing an order also decrements stock and updates the balance rollups.
+		"""
+		with self._lazy_lock:
+			ped = getattr(self, '_ped', None)
+			if ped is None:
+				from Pedidos import Pedidos
+				from Estoque import Estoque
+				from Controle import Controle
+				ped = self._ped = Pedidos()
+				Estoque().registrar(ped)
+				Controle().registrar(ped)
+			return ped
+
+
+	def _render_atendimento_menu(self, frm, win, on_back=None):
+		"""Render the attendant point-of-sale screen (MenuFunc) inside the given frame."""
+		from MenuFunc import MenuFunc
+		from TkBridge import TkBridge
+		self._maximize_window(win)
+		MenuFunc(frm, win, pedidos=self._pedidos(), bridge=TkBridge(win),
+				 usuario_id=self._usuario_id, on_back=on_back).render()
+
+
+	def _async_db(self):
+		"""Return the AsyncDBProxy shared by this App's screens (created on first use)."""
+		with self._lazy_lock:
+			adb = getattr(self, '_adb', None)
+			if adb is None:
+				from AsyncDBProxy import AsyncDBProxy
+				adb = self._adb = AsyncDBProxy()
+			return adb
+
+	def warm_up(self):
+		"""Prepare what the first screens need on a background thread.
+
+		Opens the pooled connection and runs pending migrations, starts the
+		ChangeWatcher that brings other tills' changes to this process's
+		ChangeBus, builds the AuthService (user cache, dummy hash, hasher
+		processes), loads the product catalog and starts the scheduled
+		backups. Orders, stock and reports stay unloaded until their screen
+		is opened.
+		"""
+		def schema():
+			from Migrations import ensure_schema
+			from RemoteDBProxy import open_db
+			ensure_schema(open_db())
+
+		def changes():
+			from ChangeBus import BUS
+			BUS.watch()
+
+		def catalogo():
+			from Catalogo import Catalogo
+			Catalogo.get()
+
+		def backups():
+			import os
+			if os.environ.get('SYSDB_SERVER'):
+				# a DBServer backs up the file it owns
+				return
+			from Backup import schedule
+			schedule()
+
+		return STARTUP.warm_up([
+			('schema', schema),
+			('changes', changes),
+			('auth', lambda: self._auth_service().warm_up()),
+			('catalogo', catalogo),
+			('backup', backups),
+		])
+
+
 	def _render_user_management(self, frm, win):
 		"""Render the user management UI inside the given frame.
 
 		This method contains the same functionality as the previous inline
 		'open_usuarios' block but separated into a single method for clarity.
+		Every Usuario call runs on the AsyncDBProxy thread; results come back
+		to the Tk thread through a TkBridge so the window never freezes. Writes
+		are group-committed by the database's WriteBehindQueue. The list is
+		patched row by row from 'usuarios' ChangeBus events, whichever screen
+		or till made the change. The search box shows Usuario.buscar's ranked
+		matches instead of the paged list while it has text.
 		"""
+		from tkinter import ttk
 		from Usuario import Usuario
-		u_mgr = Usuario()
+		from TkBridge import TkBridge
+		from VirtualTree import VirtualTreeview
+		u_mgr = Usuario(write_behind=True)
+		adb = self._async_db()
+		bridge = TkBridge(win)
 
 		# clear frame
 		for w in list(frm.winfo_children()):
@@ -242,29 +361,31 @@ class App:
 					entries[lbl] = e
 
 			def submit_add():
-				try:
-					tipo_sel = entries['Tipo acesso'].get().strip()
-					tipo_val = None
-					if tipo_sel == 'Administrador':
-						tipo_val = 'admin'
-					elif tipo_sel == 'Funcionário':
-						tipo_val = 'atend'
-
-					nid = u_mgr.adicionar(
-						entries['Nome'].get().strip(),
-						entries['Sobrenome'].get().strip(),
-						entries['CPF'].get().strip(),
-						entries['Nome de usuário'].get().strip(),
-						entries['Senha'].get(),
-						entries['Data admissão'].get().strip() or None,
-						tipo_val,
-					)
+				tipo_sel = entries['Tipo acesso'].get().strip()
+				tipo_val = None
+				if tipo_sel == 'Administrador':
+					tipo_val = 'admin'
+				elif tipo_sel == 'Funcionário':
+					tipo_val = 'atend'
+
+				def added(nid):
 					messagebox.showinfo('Usuários', f'Usuário criado (id={nid})')
 					add_win.destroy()
-					refresh_list()
-				except Exception as ex:
+
+				def failed(ex):
 					messagebox.showerror('Erro', f'Falha ao adicionar usuário: {ex}')
 
+				bridge.submit(adb.call(
+					u_mgr.adicionar,
+					entries['Nome'].get().strip(),
+					entries['Sobrenome'].get().strip(),
+					entries['CPF'].get().strip(),
+					entries['Nome de usuário'].get().strip(),
+					entries['Senha'].get(),
+					entries['Data admissão'].get().strip() or None,
+					tipo_val,
+				), on_success=added, on_error=failed)
+
 			btns = tk.Frame(frm_add)
 			btns.grid(row=len(labels), column=0, columnspan=2, pady=(12,0))
 			tk.Button(btns, text='Salvar', command=submit_add).pack(side=tk.LEFT, padx=6)
@@ -276,9 +397,12 @@ class App:
 		back_btn = tk.Button(ctrl_top, text='Voltar', width=12, command=lambda: self._render_controle_menu(frm, win))
 		back_btn.pack(side=tk.RIGHT)
 
-		# Treeview list for users
+		tk.Label(ctrl_top, text='Buscar:').pack(side=tk.LEFT, padx=(16, 4))
+		busca_entry = tk.Entry(ctrl_top, width=30)
+		busca_entry.pack(side=tk.LEFT)
+
+		# Treeview list for users: pages are fetched on scroll, mutations patch single rows
 		cols = ('id', 'nome', 'sobrenome', 'nome_usuario', 'cpf', 'tipo_acesso', 'ativo')
-		tree = ttk.Treeview(frm, columns=cols, show='headings', selectmode='browse')
 		label_map = {
 			'id': 'ID',
 			'nome': 'Nome',
@@ -288,15 +412,35 @@ class App:
 			'tipo_acesso': 'Tipo de acesso',
 			'ativo': 'Status',
 		}
-		for c in cols:
-			tree.heading(c, text=label_map.get(c, c), anchor=tk.CENTER)
-			tree.column(c, width=120, anchor=tk.CENTER)
 
-		# vertical scrollbar
-		vsb = ttk.Scrollbar(frm, orient='vertical', command=tree.yview)
-		tree.configure(yscrollcommand=vsb.set)
-		tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
-		vsb.pack(side=tk.LEFT, fill=tk.Y)
+		def format_row(urec):
+			# display human-friendly tipo_acesso label
+			tipo = urec.get('tipo_acesso')
+			if tipo == 'admin':
+				tipo_label = 'Administrador'
+			elif tipo == 'atend':
+				tipo_label = 'Funcionário'
+			else:
+				tipo_label = tipo
+			return (urec['id'], urec['nome'], urec['sobrenome'], urec['nome_usuario'], urec['cpf'], tipo_label, 'Ativo' if urec.get('ativo',1) == 1 else 'Inativo')
+
+		# search box: empty lists every user page by page, text shows the best FTS matches
+		busca = {'texto': '', 'after': None}
+
+		def fetch_page(after, n):
+			texto = busca['texto']
+			if texto:
+				return u_mgr.buscar(texto, 200, colunas=cols) if after is None else []
+			return u_mgr.listar(include_inativos=True, colunas=cols, after_id=after, limit=n)
+
+		vt = VirtualTreeview(
+			frm, cols,
+			fetch_page=fetch_page,
+			headings=label_map, format_row=format_row,
+			runner=lambda work, done: bridge.submit(adb.call(work), on_success=done),
+		)
+		tree = vt.tree
+		vt.pack()
 
 		# action area
 		action_frame = tk.Frame(frm, padx=8)
@@ -308,23 +452,43 @@ class App:
 		selected_user_id = {'id': None}
 
 		def refresh_list():
-			# clear
-			for r in tree.get_children():
-				tree.delete(r)
-			users = u_mgr.listar(include_inativos=True)
-			for urec in users:
-				# display human-friendly tipo_acesso label
-				tipo = urec.get('tipo_acesso')
-				if tipo == 'admin':
-					tipo_label = 'Administrador'
-				elif tipo == 'atend':
-					tipo_label = 'Funcionário'
-				else:
-					tipo_label = tipo
-				tree.insert('', tk.END, values=(urec['id'], urec['nome'], urec['sobrenome'], urec['nome_usuario'], urec['cpf'], tipo_label, 'Ativo' if urec.get('ativo',1) == 1 else 'Inativo'))
+			vt.reload()
+
+		def refresh_row(uid):
+			# re-read one user and patch only its row
+			bridge.submit(adb.call(u_mgr.obter, uid),
+						  on_success=lambda urec: vt.upsert(urec) if urec else vt.delete(uid))
+
+		def on_search(event=None):
+			# debounced: query once typing pauses
+			if busca['after'] is not None:
+				frm.after_cancel(busca['after'])
+			busca['after'] = frm.after(150, run_search)
+
+		def run_search():
+			busca['after'] = None
+			if not busca_entry.winfo_exists():
+				return
+			texto = busca_entry.get().strip()
+			if texto != busca['texto']:
+				busca['texto'] = texto
+				refresh_list()
 
-			# After populating, compute column widths based on content and header
-			self._adjust_columns(tree, cols)
+		busca_entry.bind('<KeyRelease>', on_search)
+
+		def on_change(change):
+			if busca['texto'] and change.op != 'delete':
+				# the change may move rows in or out of the ranked results
+				refresh_list()
+			elif change.key is None:
+				# bulk insert, or the watcher missed pruned changes
+				refresh_list()
+			elif change.op == 'delete':
+				vt.delete(change.key)
+			else:
+				refresh_row(change.key)
+
+		bridge.subscribe('usuarios', on_change, owner=tree)
 
 		def on_select(event):
 			sel = tree.selection()
@@ -349,19 +513,28 @@ class App:
 				return
 			if not messagebox.askyesno('Remover', 'Confirmar remoção permanente do usuário do banco de dados?'):
 				return
-			ok = u_mgr.remover(uid)
-			if ok:
-				messagebox.showinfo('Remover', 'Usuário removido do banco de dados')
-				refresh_list()
-			else:
-				messagebox.showwarning('Remover', 'Falha ao remover (id não encontrado)')
+
+			def removed(ok):
+				if ok:
+					messagebox.showinfo('Remover', 'Usuário removido do banco de dados')
+					selected_user_id['id'] = None
+					info_label.config(text='Selecione um usuário')
+					btn_update.pack_forget()
+					btn_remove.pack_forget()
+				else:
+					messagebox.showwarning('Remover', 'Falha ao remover (id não encontrado)')
+
+			bridge.submit(adb.call(u_mgr.remover, uid), on_success=removed,
+						  on_error=lambda ex: messagebox.showerror('Erro', f'Falha ao remover: {ex}'))
 
 		def do_update():
 			uid = selected_user_id['id']
 			if uid is None:
 				messagebox.showwarning('Atualizar', 'Nenhum usuário selecionado')
 				return
-			data = u_mgr.obter(uid)
+			bridge.submit(adb.call(u_mgr.obter, uid), on_success=lambda data: open_update(uid, data))
+
+		def open_update(uid, data):
 			if not data:
 				messagebox.showerror('Atualizar', 'Usuário não encontrado')
 				return
@@ -415,16 +588,16 @@ class App:
 					fields['tipo_acesso'] = 'atend'
 				# include ativo status (1 or 0)
 				fields['ativo'] = int(ativo_var.get())
-				try:
-					ok = u_mgr.atualizar(uid, **fields)
+
+				def updated(ok):
 					if ok:
 						messagebox.showinfo('Atualizar', 'Usuário atualizado com sucesso')
 						upd_win.destroy()
-						refresh_list()
 					else:
 						messagebox.showwarning('Atualizar', 'Nenhuma alteração realizada')
-				except Exception as ex:
-					messagebox.showerror('Erro', f'Falha ao atualizar: {ex}')
+
+				bridge.submit(adb.call(u_mgr.atualizar, uid, **fields), on_success=updated,
+							  on_error=lambda ex: messagebox.showerror('Erro', f'Falha ao atualizar: {ex}'))
 
 			bfr = tk.Frame(fup)
 			# move buttons down one row so they don't overlap the 'Ativo' checkbox
@@ -438,22 +611,110 @@ class App:
 		refresh_list()
 		# done rendering the users screen
 
-	def _adjust_columns(self, tree: ttk.Treeview, cols: tuple):
-		"""Adjust Treeview column widths based on header and cell content."""
-		try:
-			f = tkfont.nametofont(tree.cget('font'))
-		except Exception:
-			f = tkfont.nametofont('TkDefaultFont')
-		padding = 18
-		for c in cols:
-			header = tree.heading(c)['text']
-			max_w = f.measure(str(header))
-			for iid in tree.get_children():
-				val = tree.set(iid, c)
-				if val is None:
-					val = ''
-				w = f.measure(str(val))
-				if w > max_w:
-					max_w = w
-			tree.column(c, width=max_w + padding, anchor=tk.CENTER)
-    
\ No newline at end of file
+
+	def _render_relatorio(self, frm, win, tipo: str):
+		"""Render the Faturamento ('faturamento') or Gestão ('gestao') report.
+
+		The report is computed by Relatorios on a background thread through a
+		TkBridge; the screen only shows the resulting rows.
+		"""
+		from datetime import date
+		from tkinter import ttk
+		from Relatorios import Relatorios
+		from TkBridge import TkBridge
+		from Metrics import METRICS
+		from MenuFunc import reais
+		rel = Relatorios()
+		bridge = TkBridge(win)
+
+		for w in list(frm.winfo_children()):
+			w.destroy()
+
+		titulo = 'Faturamento' if tipo == 'faturamento' else 'Gestão'
+		tk.Label(frm, text=titulo, font=("Segoe UI", 14, "bold")).pack(pady=(4, 8))
+
+		ctrl_top = tk.Frame(frm)
+		ctrl_top.pack(fill=tk.X, pady=(0, 8))
+		hoje = date.today()
+		tk.Label(ctrl_top, text='De').pack(side=tk.LEFT)
+		ent_ini = tk.Entry(ctrl_top, width=12)
+		ent_ini.insert(0, hoje.replace(day=1).isoformat())
+		ent_ini.pack(side=tk.LEFT, padx=(4, 8))
+		tk.Label(ctrl_top, text='Até').pack(side=tk.LEFT)
+		ent_fim = tk.Entry(ctrl_top, width=12)
+		ent_fim.insert(0, hoje.isoformat())
+		ent_fim.pack(side=tk.LEFT, padx=(4, 8))
+		gen_btn = tk.Button(ctrl_top, text='Gerar', width=12)
+		gen_btn.pack(side=tk.LEFT)
+		back_btn = tk.Button(ctrl_top, text='Voltar', width=12, command=lambda: self._render_controle_menu(frm, win))
+		back_btn.pack(side=tk.RIGHT)
+
+		totais_lbl = tk.Label(frm, text='', font=("Segoe UI", 11))
+		totais_lbl.pack(pady=(0, 6))
+
+		def make_tree(parent, cols, headings):
+			box = tk.Frame(parent)
+			box.pack(expand=True, fill=tk.BOTH, pady=(0, 6))
+			tree = ttk.Treeview(box, columns=cols, show='headings', height=8)
+			vsb = ttk.Scrollbar(box, orient='vertical', command=tree.yview)
+			tree.configure(yscrollcommand=vsb.set)
+			for c, h in zip(cols, headings):
+				tree.heading(c, text=h, anchor=tk.CENTER)
+				tree.column(c, width=110, anchor=tk.CENTER)
+			tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+			vsb.pack(side=tk.LEFT, fill=tk.Y)
+			return tree
+
+		if tipo == 'faturamento':
+			fluxo_tree = make_tree(frm, ('dia', 'receita', 'gastos', 'saldo', 'acumulado', 'media'),
+								   ('Dia', 'Receita', 'Gastos', 'Saldo', 'Saldo acumulado', 'Média 7 dias'))
+		else:
+			prod_tree = make_tree(frm, ('nome', 'qtd', 'receita', 'custo', 'margem', 'pct'),
+								  ('Produto', 'Quantidade', 'Receita', 'Custo', 'Margem', 'Margem %'))
+			tempo_tree = make_tree(frm, ('periodo', 'receita'), ('Hora / dia da semana', 'Receita'))
+
+		@METRICS.timed('sysdb_ui_seconds', fn='relatorio.show')
+		def show(r):
+			t = r['totais']
+			pct = '' if t['margem_pct'] is None else f" ({t['margem_pct']}%)"
+			totais_lbl.config(text=f"Receita {reais(t['receita_centavos'])}   Gastos {reais(t['gastos_centavos'])}"
+								   f"   Saldo {reais(t['saldo_centavos'])}{pct}")
+			if tipo == 'faturamento':
+				fluxo_tree.delete(*fluxo_tree.get_children())
+				for d in r['fluxo_caixa']:
+					fluxo_tree.insert('', tk.END, values=(
+						d['dia'], reais(d['receita_centavos']), reais(d['gastos_centavos']),
+						reais(d['saldo_centavos']), reais(d['saldo_acumulado_centavos']),
+						reais(d['media_movel_receita_centavos'])))
+				return
+			prod_tree.delete(*prod_tree.get_children())
+			for p in r['por_produto']:
+				prod_tree.insert('', tk.END, values=(
+					p['nome'], f"{p['quantidade']:g}", reais(p['receita_centavos']), reais(p['custo_centavos']),
+					reais(p['margem_centavos']), '' if p['margem_pct'] is None else f"{p['margem_pct']}%"))
+			tempo_tree.delete(*tempo_tree.get_children())
+			for h in r['por_hora']:
+				if h['receita_centavos']:
+					tempo_tree.insert('', tk.END, values=(f"{h['hora']:02d}h", reais(h['receita_centavos'])))
+			for d in r['por_dia_semana']:
+				tempo_tree.insert('', tk.END, values=(d['dia_semana'], reais(d['receita_centavos'])))
+
+		def finished(r):
+			# the user may have left this screen while the report ran
+			if not gen_btn.winfo_exists():
+				return
+			gen_btn.config(state=tk.NORMAL)
+			show(r)
+
+		def failed(ex):
+			if not gen_btn.winfo_exists():
+				return
+			gen_btn.config(state=tk.NORMAL)
+			messagebox.showerror(titulo, f'Falha ao gerar relatório: {ex}')
+
+		def gerar():
+			gen_btn.config(state=tk.DISABLED)
+			bridge.call(rel.gerar, ent_ini.get().strip(), ent_fim.get().strip(), on_success=finished, on_error=failed)
+
+		gen_btn.config(command=gerar)
+		gerar()
@@ -0,0 +1,107 @@
+"""Asyncio front end for DBProxy.
+
+AsyncDBProxy runs every database call on one dedicated executor thread that
+owns its DBProxy connection, so coroutines (and the Tk UI, through TkBridge)
+can await database work without blocking their own thread.
+
+Usage:
+    adb = AsyncDBProxy()
+    rows = await adb.query_all("SELECT * FROM usuarios WHERE ativo = ?", (1,))
+    new_id = await adb.call(Usuario().adicionar, 'Ana', 'Lima', ...)
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Iterable, Tuple, Callable
+
+from DBProxy import DBProxy, ExecResult
+from RemoteDBProxy import open_db
+
+
+class AsyncDBProxy:
+    """Awaitable wrapper around a DBProxy living on its own thread.
+
+    All work is serialized on a single worker thread, which keeps SQLite's
+    one-writer rule without extra locking. The worker uses ``open_db()`` (a
+    pooled DBProxy, or the shared RemoteDBProxy in service mode), so
+    repository objects (e.g. Usuario) passed to ``call()`` share the same
+    connection and transaction state.
+    """
+
+    def __init__(self, db_path: str = "data/SysDB.db", *, enable_foreign_keys: bool = True,
+                 pooled: bool = True):
+        self.db_path = db_path
+        self.enable_foreign_keys = enable_foreign_keys
+        self.pooled = pooled
+        # only touched from the executor thread
+        self._db: Optional[DBProxy] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sysdb-async',
+                                            initializer=self._open)
+
+    def _open(self) -> None:
+        if self.pooled:
+            self._db = open_db(self.db_path, enable_foreign_keys=self.enable_foreign_keys)
+        else:
+            self._db = DBProxy(self.db_path, enable_foreign_keys=self.enable_foreign_keys)
+
+    async def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run any blocking callable on the database thread and return its result."""
+        return await self._run(fn, *args, **kwargs)
+
+    async def query_all(self, sql: str, params: Optional[Iterable[Any]] = None):
+        return await self._run(lambda: self._db.query_all(sql, params))
+
+    async def query_one(self, sql: str, params: Optional[Iterable[Any]] = None):
+        return await self._run(lambda: self._db.query_one(sql, params))
+
+    async def execute(self, sql: str, params: Optional[Iterable[Any]] = None, commit: bool = True) -> ExecResult:
+        def work():
+            cur = self._db.execute(sql, params, commit=commit)
+            return ExecResult(cur.lastrowid, cur.rowcount)
+        return await self._run(work)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable[Tuple], commit: bool = True) -> int:
+        return await self._run(lambda: self._db.executemany(sql, seq_of_params, commit=commit).rowcount)
+
+    async def transaction(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(db, *args, **kwargs) inside ``db.transaction()`` on the database thread.
+
+        The whole callable runs without interleaving other queued calls, so it
+        commits (or rolls back on error) atomically.
+        """
+        def work():
+            with self._db.transaction():
+                return fn(self._db, *args, **kwargs)
+        return await self._run(work)
+
+    def close(self) -> None:
+        """Close the worker's DBProxy and stop the thread (waits for queued work)."""
+        def shutdown():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        try:
+            self._executor.submit(shutdown).result()
+        except RuntimeError:
+            # executor already shut down
+            pass
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+        return False
+
+
+__all__ = ['AsyncDBProxy', 'ExecResult']
@@ -7,20 +7,33 @@ access-type mapping).
 """
 from __future__ import annotations
 
-from typing import Optional, Dict, Any
+import hashlib
+import hmac
+import os
+import socket
+import threading
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 
+from ChangeBus import BUS, Change, ALL
 from Usuario import Usuario
-from AuthUtils import verify_password
+from AuthUtils import needs_rehash, hash_password
+from CacheUtils import TTLCache
+from Metrics import METRICS
+from PasswordHasher import PasswordHasher, default_hasher
+from RateLimiter import LoginRateLimiter
 
 
 class AuthResult:
     """Small immutable payload returned by AuthService.authenticate()."""
 
-    def __init__(self, ok: bool, user: Optional[Dict[str, Any]] = None, access_type: Optional[str] = None):
+    def __init__(self, ok: bool, user: Optional[Dict[str, Any]] = None, access_type: Optional[str] = None,
+                 retry_after: Optional[float] = None):
         self.ok = ok
         self.user = user
         # access_type: 'admin', 'atend' or None
         self.access_type = access_type
+        # retry_after: seconds to wait when the attempt was rate limited
+        self.retry_after = retry_after
 
     def __repr__(self) -> str:
         return f"AuthResult(ok={self.ok}, access_type={self.access_type}, user_id={self.user and self.user.get('id')})"
@@ -33,39 +46,225 @@ class AuthService:
       - builtin accounts 'admin'/'admin' -> access_type 'admin'
       - builtin accounts 'atend'/'atend' -> access_type 'atend'
       - else lookup Usuario by nome_usuario and verify hashed password
+
+    Password verification is delegated to a PasswordHasher (a process pool,
+    the shared default_hasher() unless one is given), so concurrent logins
+    run on separate cores instead of queueing behind the caller.
+
+    After a successful login with a hash whose scheme or cost differs from the
+    current AuthUtils configuration (including the legacy salt:hash format),
+    the password is re-hashed and stored, so cost changes roll out without
+    password resets.
+
+    Caching (all bounded LRU with TTL, see ``cache_stats()``):
+      - user rows by nome_usuario, plus a short negative cache of unknown names
+      - successful verifications, keyed by an HMAC (per-process random key) of
+        username, password and stored hash; the plaintext is never kept
+    Entries are dropped on every 'usuarios' change on the ChangeBus (other
+    tills' included when a ChangeWatcher runs). Unknown
+    users still pay one verification against a dummy hash so their latency
+    matches a wrong password.
+
+    Every attempt first goes through a LoginRateLimiter (per username and per
+    terminal, default terminal = this host); throttled attempts return
+    AuthResult(ok=False, retry_after=seconds) without touching the database
+    or computing a hash.
+
+    With METRICS enabled, authenticate() records its total time and the
+    'lookup' and 'kdf' phases under sysdb_auth_seconds.
     """
 
-    def __init__(self, user_repo: Optional[Usuario] = None):
+    def __init__(self, user_repo: Optional[Usuario] = None, hasher: Optional[PasswordHasher] = None, *,
+                 cache_size: int = 256, user_ttl: float = 300.0, verify_ttl: float = 60.0,
+                 negative_ttl: float = 30.0, rate_limiter: Optional[LoginRateLimiter] = None,
+                 terminal: Optional[str] = None):
         self.user_repo = user_repo or Usuario()
+        self.hasher = hasher or default_hasher()
+        self.rate_limiter = rate_limiter or LoginRateLimiter()
+        self.terminal = terminal or socket.gethostname()
+        self._users = TTLCache(cache_size, user_ttl)
+        self._missing = TTLCache(cache_size, negative_ttl)
+        self._verified = TTLCache(cache_size, verify_ttl)
+        self._cache_key = os.urandom(32)
+        self._dummy: Optional[str] = None
+        self._dummy_lock = threading.Lock()
+        # changes from this process and, with a ChangeWatcher running, from other tills
+        BUS.subscribe('usuarios', self._on_user_changed)
 
-    def authenticate(self, username: str, password: str) -> AuthResult:
-        username = (username or '').strip()
-        password = password or ''
-
+    @staticmethod
+    def _builtin(username: str, password: str) -> Optional[AuthResult]:
         # quick builtin fallbacks
         if username == 'admin' and password == 'admin':
             return AuthResult(ok=True, user={'nome_usuario': 'admin', 'tipo_acesso': 'admin'}, access_type='admin')
         if username == 'atend' and password == 'atend':
             return AuthResult(ok=True, user={'nome_usuario': 'atend', 'tipo_acesso': 'atend'}, access_type='atend')
+        return None
 
-        # DB-backed user
+    def _lookup(self, username: str) -> Optional[Dict[str, Any]]:
+        """Return the user row when it exists and has a stored hash, else None."""
+        row = self._users.get(username)
+        if row is not None:
+            return row
+        if self._missing.get(username):
+            return None
         try:
             row = self.user_repo.obter_por_nome_usuario(username)
         except Exception:
             # If the repository raises, hide implementation details and just fail auth
-            return AuthResult(ok=False)
+            return None
+        if not row or not row.get('senha'):
+            self._missing.set(username, True)
+            return None
+        self._users.set(username, row)
+        return row
 
-        if not row:
-            return AuthResult(ok=False)
+    def _token(self, username: str, password: str, stored: str) -> bytes:
+        msg = '\x00'.join((username, password, stored)).encode('utf-8')
+        return hmac.new(self._cache_key, msg, hashlib.sha256).digest()
+
+    def _dummy_hash(self) -> str:
+        with self._dummy_lock:
+            if self._dummy is None:
+                self._dummy = hash_password(os.urandom(16).hex())
+            return self._dummy
+
+    def warm_up(self) -> None:
+        """Pay one-time costs before the first login: the schema, the dummy hash
+        and the hasher's worker processes. Safe to call from a background thread."""
+        self.user_repo.contar()
+        self.hasher.verify('', self._dummy_hash())
+
+    def _on_user_changed(self, change: Change) -> None:
+        if change.table == ALL:
+            self.clear_caches()
+            return
+        op, user_id = change.op, change.key
+        nome_usuario = change.data.get('nome_usuario')
+        if nome_usuario:
+            self._users.pop(nome_usuario)
+            self._missing.pop(nome_usuario)
+        if user_id is not None:
+            self._users.discard_where(lambda _k, row: row.get('id') == user_id)
+        if op == 'insert' and user_id is None:
+            # bulk insert: any cached "unknown user" may now exist
+            self._missing.clear()
+        if op != 'insert':
+            # password, status or row may have changed; drop every verified login
+            self._verified.clear()
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Return size/hit/miss counters of the user, negative and verification caches."""
+        return {'users': self._users.stats(), 'missing': self._missing.stats(),
+                'verified': self._verified.stats()}
+
+    def clear_caches(self) -> None:
+        self._users.clear()
+        self._missing.clear()
+        self._verified.clear()
 
-        stored_hash = row.get('senha')
-        if not stored_hash:
+    def authenticate(self, username: str, password: str, terminal: Optional[str] = None) -> AuthResult:
+        username = (username or '').strip()
+        password = password or ''
+        terminal = terminal or self.terminal
+
+        wait = self.rate_limiter.check(username, terminal)
+        if wait:
+            return AuthResult(ok=False, retry_after=wait)
+
+        with METRICS.timer('sysdb_auth_seconds', phase='total'):
+            res = self._authenticate(username, password)
+        if res.ok:
+            self.rate_limiter.record_success(username, terminal)
+        else:
+            self.rate_limiter.record_failure(username, terminal)
+        return res
+
+    def _authenticate(self, username: str, password: str) -> AuthResult:
+        builtin = self._builtin(username, password)
+        if builtin is not None:
+            return builtin
+
+        # DB-backed user
+        with METRICS.timer('sysdb_auth_seconds', phase='lookup'):
+            row = self._lookup(username)
+        if row is None:
+            # same KDF cost as a wrong password so unknown names are not revealed by timing
+            with METRICS.timer('sysdb_auth_seconds', phase='kdf'):
+                self.hasher.verify(password, self._dummy_hash())
             return AuthResult(ok=False)
 
-        if verify_password(password, stored_hash):
+        token = self._token(username, password, row['senha'])
+        if self._verified.get(token):
+            return AuthResult(ok=True, user=row, access_type=row.get('tipo_acesso'))
+
+        with METRICS.timer('sysdb_auth_seconds', phase='kdf'):
+            ok = self.hasher.verify(password, row['senha'])
+        if ok:
+            self._verified.set(token, True)
+            self._maybe_rehash(row, password)
             return AuthResult(ok=True, user=row, access_type=row.get('tipo_acesso'))
 
         return AuthResult(ok=False)
 
+    def _maybe_rehash(self, row: Dict[str, Any], password: str) -> None:
+        """Upgrade a stale stored hash with the verified plaintext; never fails the login."""
+        if row.get('id') is None or not needs_rehash(row['senha']):
+            return
+        try:
+            self.user_repo.atualizar(row['id'], senha=password)
+        except Exception:
+            # the old hash still works; try again on the next login
+            pass
+
+    def authenticate_many(self, credentials: Iterable[Tuple[str, str]], terminal: Optional[str] = None) -> List[AuthResult]:
+        """Authenticate several (username, password) pairs, verifying hashes in one parallel batch.
+
+        Results keep the input order. Rate limits apply to each pair.
+        """
+        terminal = terminal or self.terminal
+        results: List[Optional[AuthResult]] = []
+        names: List[str] = []
+        # (result index or None for dummy checks, row, password, token)
+        batch: List[Tuple[Optional[int], Dict[str, Any], str, Optional[bytes]]] = []
+        for username, password in credentials:
+            username = (username or '').strip()
+            password = password or ''
+            names.append(username)
+            wait = self.rate_limiter.check(username, terminal)
+            if wait:
+                results.append(AuthResult(ok=False, retry_after=wait))
+                continue
+            res = self._builtin(username, password)
+            if res is None:
+                row = self._lookup(username)
+                if row is None:
+                    res = AuthResult(ok=False)
+                    batch.append((None, {'senha': self._dummy_hash()}, password, None))
+                else:
+                    token = self._token(username, password, row['senha'])
+                    if self._verified.get(token):
+                        res = AuthResult(ok=True, user=row, access_type=row.get('tipo_acesso'))
+                    else:
+                        batch.append((len(results), row, password, token))
+            results.append(res)
+
+        with METRICS.timer('sysdb_auth_seconds', phase='kdf_batch'):
+            oks = self.hasher.verify_many((pwd, row['senha']) for _, row, pwd, _ in batch)
+        for (idx, row, pwd, token), ok in zip(batch, oks):
+            if idx is None:
+                continue
+            if ok:
+                self._verified.set(token, True)
+                self._maybe_rehash(row, pwd)
+            results[idx] = AuthResult(ok=True, user=row, access_type=row.get('tipo_acesso')) if ok else AuthResult(ok=False)
+        for username, res in zip(names, results):
+            if res.retry_after:
+                continue
+            if res.ok:
+                self.rate_limiter.record_success(username, terminal)
+            else:
+                self.rate_limiter.record_failure(username, terminal)
+        return results
+
 
 __all__ = ['AuthService', 'AuthResult']
\ No newline at end of file
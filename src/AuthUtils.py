@@ -3,44 +3,147 @@
 This module centralizes password hashing and verification so other modules
 (e.g., Usuario, AuthService) can reuse the same implementation and configuration
 (salt size, iterations, algorithm).
+
+Stored hashes are self-describing so the cost can change without breaking
+existing rows:
+
+    $pbkdf2-sha256$<iterations>$<salt_hex>$<key_hex>
+    $scrypt$n=<N>,r=<r>,p=<p>$<salt_hex>$<key_hex>
+
+The original ``<salt_hex>:<key_hex>`` format (PBKDF2-SHA256, 100,000
+iterations) is still accepted by verify_password and reported as stale by
+needs_rehash, so it is upgraded on the user's next successful login.
+
+Defaults for new hashes come from the module parameters below, which may be
+set per deployment through the SYSDB_HASH_SCHEME / SYSDB_HASH_ITERS /
+SYSDB_SCRYPT_N environment variables or at runtime with configure().
 """
 from __future__ import annotations
 
 import hashlib
 import hmac
 import os
-from typing import Tuple
+from typing import Tuple, Dict, Any, Optional
 
 # Configurable parameters
 SALT_SIZE = 16  # bytes
-HASH_ITERS = 100_000
+HASH_ITERS = int(os.environ.get('SYSDB_HASH_ITERS', 100_000))
 ALGO = 'sha256'
+# scheme used for new hashes: 'pbkdf2-sha256' or 'scrypt'
+SCHEME = os.environ.get('SYSDB_HASH_SCHEME', 'pbkdf2-sha256')
+SCRYPT_N = int(os.environ.get('SYSDB_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+SCHEMES = ('pbkdf2-sha256', 'scrypt')
+LEGACY_ITERS = 100_000
+KEY_LEN = 32  # bytes
+
+
+def configure(scheme: Optional[str] = None, iterations: Optional[int] = None,
+              scrypt_n: Optional[int] = None, scrypt_r: Optional[int] = None,
+              scrypt_p: Optional[int] = None) -> None:
+    """Change the parameters used for new hashes in this process."""
+    global SCHEME, HASH_ITERS, SCRYPT_N, SCRYPT_R, SCRYPT_P
+    if scheme is not None:
+        if scheme not in SCHEMES:
+            raise ValueError(f'unknown hash scheme: {scheme!r}')
+        SCHEME = scheme
+    if iterations is not None:
+        if iterations < 1:
+            raise ValueError('iterations must be positive')
+        HASH_ITERS = iterations
+    if scrypt_n is not None:
+        if scrypt_n < 2 or scrypt_n & (scrypt_n - 1):
+            raise ValueError('scrypt_n must be a power of two greater than 1')
+        SCRYPT_N = scrypt_n
+    if scrypt_r is not None:
+        SCRYPT_R = scrypt_r
+    if scrypt_p is not None:
+        SCRYPT_P = scrypt_p
+
+
+def current_params() -> Dict[str, Any]:
+    """Return the parameters for new hashes as keyword arguments for hash_password.
+
+    Useful when hashing happens in another process (see PasswordHasher), where
+    a configure() call made in this process would not be visible.
+    """
+    if SCHEME == 'scrypt':
+        return {'scheme': 'scrypt', 'n': SCRYPT_N, 'r': SCRYPT_R, 'p': SCRYPT_P}
+    return {'scheme': 'pbkdf2-sha256', 'iterations': HASH_ITERS}
 
 
-def hash_password(password: str) -> str:
-    """Return a string containing salt:hash, both hex-encoded.
+def _derive(password: str, scheme: str, params: Dict[str, int], salt: bytes) -> bytes:
+    pwd = password.encode('utf-8')
+    if scheme == 'pbkdf2-sha256':
+        return hashlib.pbkdf2_hmac(ALGO, pwd, salt, params['iterations'])
+    if scheme == 'scrypt':
+        n, r, p = params['n'], params['r'], params['p']
+        # scrypt needs ~128*n*r bytes; give it headroom over the 32 MiB default
+        return hashlib.scrypt(pwd, salt=salt, n=n, r=r, p=p, dklen=KEY_LEN, maxmem=256 * n * r + (1 << 20))
+    raise ValueError(f'unknown hash scheme: {scheme!r}')
 
-    Example format: <salt_hex>:<key_hex>
+
+def hash_password(password: str, scheme: Optional[str] = None, **params) -> str:
+    """Return a self-describing hash string for password.
+
+    scheme and params (iterations for PBKDF2; n, r, p for scrypt) default to
+    the module configuration.
+
+    Example format: $pbkdf2-sha256$100000$<salt_hex>$<key_hex>
     """
     if not isinstance(password, str):
         raise TypeError('password must be a string')
+    if scheme is None:
+        defaults = current_params()
+        scheme = defaults.pop('scheme')
+        defaults.update(params)
+        params = defaults
     salt = os.urandom(SALT_SIZE)
-    key = hashlib.pbkdf2_hmac(ALGO, password.encode('utf-8'), salt, HASH_ITERS)
-    return salt.hex() + ':' + key.hex()
+    if scheme == 'pbkdf2-sha256':
+        p = {'iterations': int(params.get('iterations', HASH_ITERS))}
+        encoded = str(p['iterations'])
+    elif scheme == 'scrypt':
+        p = {'n': int(params.get('n', SCRYPT_N)), 'r': int(params.get('r', SCRYPT_R)),
+             'p': int(params.get('p', SCRYPT_P))}
+        encoded = f"n={p['n']},r={p['r']},p={p['p']}"
+    else:
+        raise ValueError(f'unknown hash scheme: {scheme!r}')
+    key = _derive(password, scheme, p, salt)
+    return f'${scheme}${encoded}${salt.hex()}${key.hex()}'
+
+
+def parse_hash(stored: str) -> Tuple[str, Dict[str, int], bytes, bytes]:
+    """Split a stored hash into (scheme, params, salt, key) or raise ValueError."""
+    if not stored.startswith('$'):
+        salt_hex, key_hex = stored.split(':')
+        return 'pbkdf2-sha256', {'iterations': LEGACY_ITERS}, bytes.fromhex(salt_hex), bytes.fromhex(key_hex)
+    parts = stored.split('$')
+    if len(parts) != 5 or parts[0] != '':
+        raise ValueError('malformed password hash')
+    _, scheme, encoded, salt_hex, key_hex = parts
+    if scheme == 'pbkdf2-sha256':
+        params = {'iterations': int(encoded)}
+    elif scheme == 'scrypt':
+        params = {k: int(v) for k, v in (item.split('=') for item in encoded.split(','))}
+        if set(params) != {'n', 'r', 'p'}:
+            raise ValueError('malformed scrypt parameters')
+    else:
+        raise ValueError(f'unknown hash scheme: {scheme!r}')
+    return scheme, params, bytes.fromhex(salt_hex), bytes.fromhex(key_hex)
 
 
 def verify_password(password: str, stored: str) -> bool:
-    """Verify a password against a stored salt:hash string.
+    """Verify a password against any supported stored hash (legacy or versioned).
 
     Returns True when the password is correct, False otherwise.
     """
     if not isinstance(password, str) or not isinstance(stored, str):
         return False
     try:
-        salt_hex, key_hex = stored.split(':')
-        salt = bytes.fromhex(salt_hex)
-        expected = bytes.fromhex(key_hex)
-        got = hashlib.pbkdf2_hmac(ALGO, password.encode('utf-8'), salt, HASH_ITERS)
+        scheme, params, salt, expected = parse_hash(stored)
+        got = _derive(password, scheme, params, salt)
         # Use compare_digest for timing-attack-safe comparison
         # use hmac.compare_digest which is available and intended for
         # timing-safe bytes comparisons
@@ -49,7 +152,19 @@ def verify_password(password: str, stored: str) -> bool:
         return False
 
 
+def needs_rehash(stored: str) -> bool:
+    """Return True when stored was not produced with the current scheme and parameters."""
+    try:
+        scheme, params, _, _ = parse_hash(stored)
+    except Exception:
+        return True
+    if not stored.startswith('$'):
+        return True
+    wanted = current_params()
+    return scheme != wanted.pop('scheme') or params != wanted
+
+
 def split_storage(stored: str) -> Tuple[str, str]:
     """Split stored value into (salt_hex, key_hex) or raise ValueError."""
-    s, k = stored.split(':')
-    return s, k
+    _, _, salt, key = parse_hash(stored)
+    return salt.hex(), key.hex()
@@ -0,0 +1,427 @@
+"""Online backups of SysDB that do not stall the tills, with rotation and restore.
+
+``backup()`` copies the live database with SQLite's backup API while the
+tills keep writing:
+
+- the copy reads one snapshot: the source connection holds a read
+  transaction for the whole copy, which in WAL mode never blocks writers
+  (without it, every commit by a till would restart the copy from page 1);
+- it copies ``pages`` pages per step and sleeps ``sleep`` seconds between
+  steps, so it never competes with the tills for the disk for long;
+- the copy is converted to a single self-contained file (journal_mode=DELETE),
+  compressed (zlib -> .db.gz, lzma -> .db.xz, or none), written under a
+  temporary name and renamed into place, so a crash never leaves a
+  half-written backup looking complete;
+- with check=True (the default) the archive is restored into a temporary file and must
+  pass ``PRAGMA integrity_check``;
+- with keep=N only the newest N backups of that database are kept.
+
+Backups are named ``<db stem>-YYYYmmdd-HHMMSS.db[.gz|.xz]`` in ``dest_dir``
+(default: a ``backups`` directory next to the database). A lock file there
+keeps two processes (tills sharing the database, a DBServer) from backing up
+at once.
+
+``schedule()`` starts a daemon thread that backs up every ``interval``
+seconds, counted from the newest backup in dest_dir, so tills sharing a
+database take turns instead of each making its own. The App starts it at
+warm-up (a DBServer with --backup-interval does it on its side), configured by
+
+    SYSDB_BACKUP_INTERVAL_H=6     hours between backups (0 disables)
+    SYSDB_BACKUP_KEEP=14          backups to keep
+    SYSDB_BACKUP_COMPRESS=zlib    zlib, lzma or none
+    SYSDB_BACKUP_DIR=...          default: backups/ next to the database
+
+From the command line:
+
+    python src/Backup.py backup                    # data/SysDB.db -> data/backups/
+    python src/Backup.py list
+    python src/Backup.py verify data/backups/SysDB-20240101-230000.db.gz
+    python src/Backup.py restore data/backups/SysDB-20240101-230000.db.gz --to data/SysDB.db --force
+
+Restore over the live database only with every till and the DBServer closed.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import lzma
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Callable, Dict, List, NamedTuple
+
+from Metrics import METRICS
+
+INTERVAL = float(os.environ.get('SYSDB_BACKUP_INTERVAL_H', 6)) * 3600
+KEEP = int(os.environ.get('SYSDB_BACKUP_KEEP', 14))
+COMPRESS = os.environ.get('SYSDB_BACKUP_COMPRESS', 'zlib')
+
+# compression -> file suffix
+COMPRESSIONS: Dict[str, str] = {'none': '', 'zlib': '.gz', 'lzma': '.xz'}
+
+_NAME = re.compile(r'^(?P<stem>.+)-(?P<ts>\d{8}-\d{6})\.db(?P<ext>\.gz|\.xz)?$')
+_COPY_CHUNK = 1 << 20
+# a lock older than this belongs to a process that died mid-backup
+_STALE_LOCK = 6 * 3600
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _log():
+    import logging
+    return logging.getLogger('sysdb.backup')
+
+
+class BackupBusy(Exception):
+    """Another process is backing up into the same directory."""
+
+
+class BackupResult(NamedTuple):
+    path: str
+    pages: int
+    size: int                 # bytes of the archive
+    seconds: float
+    verified: Optional[bool]  # None when not verified
+
+
+def default_dir(db_path: str) -> str:
+    return os.environ.get('SYSDB_BACKUP_DIR') or os.path.join(os.path.dirname(db_path) or '.', 'backups')
+
+
+def _stem(db_path: str) -> str:
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def list_backups(db_path: str = "data/SysDB.db", dest_dir: Optional[str] = None) -> List[str]:
+    """Paths of db_path's backups in dest_dir, newest first."""
+    dest_dir = dest_dir or default_dir(db_path)
+    stem = _stem(db_path)
+    try:
+        names = os.listdir(dest_dir)
+    except FileNotFoundError:
+        return []
+    found = [n for n in names if (m := _NAME.match(n)) and m.group('stem') == stem]
+    # the timestamp sorts as text; the name tie-breaks the same second
+    found.sort(key=lambda n: (_NAME.match(n).group('ts'), n), reverse=True)
+    return [os.path.join(dest_dir, n) for n in found]
+
+
+def prune(db_path: str = "data/SysDB.db", dest_dir: Optional[str] = None, keep: int = KEEP) -> List[str]:
+    """Delete all but the newest keep backups of db_path; return the deleted paths."""
+    old = list_backups(db_path, dest_dir)[max(keep, 1):]
+    for path in old:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return old
+
+
+class _DirLock:
+    """Exclusive lock file in the backup directory (works across processes and OSes)."""
+
+    def __init__(self, dest_dir: str):
+        self.path = os.path.join(dest_dir, '.backup.lock')
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        for _ in range(2):
+            try:
+                self._fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self._fd, f'{os.getpid()}\n'.encode())
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) < _STALE_LOCK:
+                        raise BackupBusy(f'backup in progress ({self.path})') from None
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+        raise BackupBusy(f'backup in progress ({self.path})')
+
+    def __exit__(self, exc_type, exc, tb):
+        os.close(self._fd)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        return False
+
+
+def _fsync(path: str) -> None:
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _snapshot(db_path: str, target: str, pages: int, sleep: float,
+              progress: Optional[ProgressCallback]) -> int:
+    """Copy one consistent snapshot of db_path into target; return its page count."""
+    src = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    dst = sqlite3.connect(target, isolation_level=None)
+    total = 0
+    try:
+        # the read transaction pins the snapshot for the whole copy (see the module docstring);
+        # only in WAL mode: with a rollback journal it would lock the writers out until the end
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        if wal:
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+
+        def step(status, remaining, count):
+            nonlocal total
+            total = count
+            if progress is not None:
+                progress(count - remaining, count)
+            if remaining and sleep > 0:
+                time.sleep(sleep)
+
+        src.backup(dst, pages=pages, progress=step)
+        if wal:
+            src.execute("COMMIT")
+        # an archive is one file: no -wal to carry along
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dst.close()
+        src.close()
+    return total
+
+
+def _compression_of(path: str) -> str:
+    for compress, suffix in COMPRESSIONS.items():
+        if suffix and path.endswith(suffix):
+            return compress
+    return 'none'
+
+
+def _open(path: str, mode: str, compress: str):
+    if compress == 'zlib':
+        return gzip.open(path, mode, compresslevel=6)
+    if compress == 'lzma':
+        return lzma.open(path, mode, preset=6 if 'w' in mode else None)
+    return open(path, mode)
+
+
+def _compress(source: str, target: str, compress: str) -> None:
+    with open(source, 'rb') as fin, _open(target, 'wb', compress) as fout:
+        shutil.copyfileobj(fin, fout, _COPY_CHUNK)
+    _fsync(target)
+
+
+def verify(archive: str) -> bool:
+    """Restore archive into a temporary file and run PRAGMA integrity_check on it."""
+    fd, tmp = tempfile.mkstemp(suffix='.db', prefix='sysdb-verify-')
+    os.close(fd)
+    try:
+        restore(archive, tmp, overwrite=True, check=False)
+        conn = sqlite3.connect(f'file:{tmp}?mode=ro', uri=True)
+        try:
+            return conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        for path in (tmp, tmp + '-journal'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def restore(archive: str, target: str, *, overwrite: bool = False, check: bool = True) -> str:
+    """Decompress archive into target (checked with integrity_check first) and return target.
+
+    Overwriting a database also deletes its -wal/-shm files, which belong to
+    the old file: never do it while any process has target open.
+    """
+    if os.path.exists(target) and not overwrite:
+        raise FileExistsError(f'{target} exists (pass overwrite=True)')
+    if check and not verify(archive):
+        raise sqlite3.DatabaseError(f'{archive} failed the integrity check')
+    partial = target + '.partial'
+    with _open(archive, 'rb', _compression_of(archive)) as fin, open(partial, 'wb') as fout:
+        shutil.copyfileobj(fin, fout, _COPY_CHUNK)
+        fout.flush()
+        os.fsync(fout.fileno())
+    for suffix in ('-wal', '-shm', '-journal'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    os.replace(partial, target)
+    return target
+
+
+def backup(db_path: str = "data/SysDB.db", dest_dir: Optional[str] = None, *, compress: str = COMPRESS,
+           pages: int = 256, sleep: float = 0.01, check: bool = True, keep: Optional[int] = None,
+           progress: Optional[ProgressCallback] = None) -> BackupResult:
+    """Back up the live database into dest_dir and return where it went.
+
+    pages/sleep throttle the copy (256 pages of 4 KiB, then 10 ms off: at
+    most ~100 MB/s, typically much less). progress(pages_done, pages_total)
+    is called after every step, on this thread. Raises BackupBusy when
+    another process is backing up into dest_dir.
+    """
+    if compress not in COMPRESSIONS:
+        raise ValueError(f'unknown compression: {compress!r} (use one of {sorted(COMPRESSIONS)})')
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+    dest_dir = dest_dir or default_dir(db_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    with _DirLock(dest_dir):
+        name = f"{_stem(db_path)}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db{COMPRESSIONS[compress]}"
+        final = os.path.join(dest_dir, name)
+        # hidden while incomplete; partial keeps the suffix verify() reads the format from
+        copy = os.path.join(dest_dir, f'.copy-{_stem(db_path)}.db')
+        partial = os.path.join(dest_dir, f'.partial-{name}')
+        try:
+            total = _snapshot(db_path, copy, pages, sleep, progress)
+            if compress == 'none':
+                _fsync(copy)
+                os.replace(copy, partial)
+            else:
+                _compress(copy, partial, compress)
+            verified = verify(partial) if check else None
+            if verified is False:
+                raise sqlite3.DatabaseError(f'backup of {db_path} failed the integrity check')
+            os.replace(partial, final)
+        finally:
+            for path in (copy, copy + '-journal', partial):
+                if os.path.exists(path):
+                    os.remove(path)
+        if keep is not None:
+            prune(db_path, dest_dir, keep)
+    seconds = time.perf_counter() - t0
+    METRICS.observe('sysdb_backup_seconds', seconds, compress=compress)
+    return BackupResult(final, total, os.path.getsize(final), seconds, verified)
+
+
+class BackupScheduler:
+    """Daemon thread backing up db_path every interval seconds.
+
+    The schedule follows the newest backup in dest_dir, whoever made it:
+    restarting a till does not trigger an extra backup, and tills sharing a
+    database and backup directory do not each make their own.
+    """
+
+    def __init__(self, db_path: str = "data/SysDB.db", dest_dir: Optional[str] = None, *,
+                 interval: float = INTERVAL, keep: int = KEEP, compress: str = COMPRESS,
+                 delay: float = 60.0, retry: float = 300.0, **backup_kwargs):
+        self.db_path = db_path
+        self.dest_dir = dest_dir or default_dir(db_path)
+        self.interval = interval
+        self.keep = keep
+        self.compress = compress
+        self.delay = delay
+        self.retry = retry
+        self.backup_kwargs = backup_kwargs
+        self.last: Optional[BackupResult] = None
+        self.stopped = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self._run, name='sysdb-backup', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.stopped = True
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def due_in(self) -> float:
+        """Seconds until the next backup is due (<= 0: due now)."""
+        newest = list_backups(self.db_path, self.dest_dir)[:1]
+        if not newest:
+            return 0.0
+        try:
+            return os.path.getmtime(newest[0]) + self.interval - time.time()
+        except FileNotFoundError:
+            return 0.0
+
+    def run_once(self) -> Optional[BackupResult]:
+        """Back up now if one is due; None when not due or another process is at it."""
+        if self.due_in() > 0:
+            return None
+        try:
+            self.last = backup(self.db_path, self.dest_dir, compress=self.compress, keep=self.keep,
+                               **self.backup_kwargs)
+        except BackupBusy:
+            return None
+        return self.last
+
+    def _run(self) -> None:
+        # the first check waits for start-up to be over
+        wait = self.delay
+        while not self._stop.wait(wait):
+            try:
+                self.run_once()
+                wait = max(self.due_in(), 1.0)
+            except Exception:
+                _log().exception('backup of %s failed', self.db_path)
+                wait = self.retry
+
+
+_schedulers: Dict[str, BackupScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def schedule(db_path: str = "data/SysDB.db", **kwargs) -> Optional[BackupScheduler]:
+    """Start (once per database) scheduled backups of db_path; None when the interval is 0."""
+    if kwargs.get('interval', INTERVAL) <= 0:
+        return None
+    key = os.path.abspath(db_path)
+    with _schedulers_lock:
+        sched = _schedulers.get(key)
+        if sched is None or sched.stopped:
+            sched = _schedulers[key] = BackupScheduler(db_path, **kwargs)
+            sched.start()
+        return sched
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='Back up, verify and restore SysDB')
+    sub = ap.add_subparsers(dest='action', required=True)
+    b = sub.add_parser('backup', help='back up the database now')
+    b.add_argument('--db', default='data/SysDB.db')
+    b.add_argument('--dir', help='backup directory (default: backups/ next to the database)')
+    b.add_argument('--compress', choices=sorted(COMPRESSIONS), default=COMPRESS)
+    b.add_argument('--keep', type=int, default=KEEP)
+    b.add_argument('--no-check', action='store_true', help='skip the verification restore')
+    ls = sub.add_parser('list', help='list backups, newest first')
+    ls.add_argument('--db', default='data/SysDB.db')
+    ls.add_argument('--dir')
+    v = sub.add_parser('verify', help='restore a backup into a temporary file and check it')
+    v.add_argument('archive')
+    r = sub.add_parser('restore', help='restore a backup (close every till first)')
+    r.add_argument('archive')
+    r.add_argument('--to', default='data/SysDB.db')
+    r.add_argument('--force', action='store_true', help='overwrite an existing database')
+    args = ap.parse_args(argv)
+
+    if args.action == 'backup':
+        res = backup(args.db, args.dir, compress=args.compress, keep=args.keep, check=not args.no_check)
+        print(f'{res.path}: {res.pages} pages, {res.size} bytes, {res.seconds:.1f}s, verified={res.verified}')
+    elif args.action == 'list':
+        for path in list_backups(args.db, args.dir):
+            print(f'{path}\t{os.path.getsize(path)}')
+    elif args.action == 'verify':
+        ok = verify(args.archive)
+        print('ok' if ok else 'FAILED')
+        return 0 if ok else 1
+    else:
+        restore(args.archive, args.to, overwrite=args.force)
+        print(f'restored {args.archive} -> {args.to}')
+    return 0
+
+
+__all__ = ['backup', 'restore', 'verify', 'prune', 'list_backups', 'schedule', 'BackupScheduler',
+           'BackupResult', 'BackupBusy', 'default_dir']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
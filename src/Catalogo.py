@@ -0,0 +1,136 @@
+"""In-memory product catalog with prefix search for the point-of-sale screen.
+
+The active products are read once per database (``Catalogo.get(db_path)``)
+into a trie keyed by every word of the product name, lower-cased and without
+accents, so "lat" finds "Café Latte" and "cafe" finds "Café". Each trie node
+keeps the name-order positions of the products below it, so a one-word lookup
+costs O(len(prefix)) plus the size of the answer, independent of the catalog
+size. Queries with several words return the products matching all of them:
+the shortest position list is walked and each candidate is binary-searched in
+the others, O(shortest list * log n) at worst. An all-digit query also
+matches the product id (its code).
+
+Call ``recarregar()`` after editing products.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import unicodedata
+from bisect import bisect_left
+from itertools import islice
+from typing import Optional, Dict, Any, List, ClassVar, Iterator, Tuple
+
+from Migrations import ensure_schema
+from RemoteDBProxy import open_db
+
+
+def normalizar(texto: str) -> str:
+    """Lower-case text and strip accents ("Café" -> "cafe")."""
+    decomposed = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class _No:
+    __slots__ = ('filhos', 'ids')
+
+    def __init__(self):
+        self.filhos: Dict[str, '_No'] = {}
+        # positions in name order (indexes into the id list), ascending
+        self.ids: List[int] = []
+
+
+class Catalogo:
+    """Active products indexed for search-as-you-type.
+
+    Usage:
+        cat = Catalogo.get('data/SysDB.db')
+        cat.buscar('cap')       # [{'id': 3, 'nome': 'Cappuccino', 'preco_centavos': 900, ...}]
+        cat.produto(3)
+    """
+
+    _instances: ClassVar[Dict[str, 'Catalogo']] = {}
+    _instances_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str = "data/SysDB.db") -> 'Catalogo':
+        """Return the shared catalog for db_path, loading it on first use."""
+        key = os.path.abspath(db_path)
+        with cls._instances_lock:
+            cat = cls._instances.get(key)
+            if cat is None:
+                cat = cls._instances[key] = cls(db_path)
+            return cat
+
+    def __init__(self, db_path: str = "data/SysDB.db"):
+        self.db = open_db(db_path)
+        ensure_schema(self.db)
+        # (trie root, products by id, ids in name order), replaced as a whole on reload
+        self._indice: Tuple[_No, Dict[int, Dict[str, Any]], List[int]] = (_No(), {}, [])
+        self.recarregar()
+
+    def recarregar(self) -> int:
+        """Reload active products from the database; return how many were indexed."""
+        rows = self.db.query_all(
+            "SELECT id, nome, categoria, preco_centavos FROM produtos WHERE ativo = 1 ORDER BY nome COLLATE NOCASE")
+        produtos = {r['id']: dict(r) for r in rows}
+        ordem = list(produtos)
+        raiz = _No()
+        for pos, pid in enumerate(ordem):
+            for palavra in set(normalizar(produtos[pid]['nome']).split()):
+                no = raiz
+                for ch in palavra:
+                    no = no.filhos.setdefault(ch, _No())
+                    # words of one product are indexed together: skip "cafe" after "cafeina"
+                    if not no.ids or no.ids[-1] != pos:
+                        no.ids.append(pos)
+        # a single assignment, so a concurrent reader never mixes old and new
+        self._indice = (raiz, produtos, ordem)
+        return len(produtos)
+
+    def _prefixo(self, raiz: _No, prefixo: str) -> List[int]:
+        no = raiz
+        for ch in prefixo:
+            no = no.filhos.get(ch)
+            if no is None:
+                return []
+        return no.ids
+
+    @staticmethod
+    def _intersecao(listas: List[List[int]]) -> Iterator[int]:
+        """Positions present in every list (all ascending), shortest list first."""
+        primeira, outras = listas[0], listas[1:]
+        inicio = [0] * len(outras)
+        for pos in primeira:
+            for k, lista in enumerate(outras):
+                # later candidates are larger: never search before the last hit
+                j = inicio[k] = bisect_left(lista, pos, inicio[k])
+                if j == len(lista):
+                    return
+                if lista[j] != pos:
+                    break
+            else:
+                yield pos
+
+    def buscar(self, texto: str, limit: int = 30) -> List[Dict[str, Any]]:
+        """Products whose name has a word starting with each word of texto, in name order."""
+        raiz, produtos, ordem = self._indice
+        termos = normalizar(texto).split()
+        if not termos:
+            return list(islice(produtos.values(), limit))
+        listas = sorted((self._prefixo(raiz, t) for t in termos), key=len)
+        resultado = [produtos[ordem[pos]] for pos in islice(self._intersecao(listas), limit)]
+        if len(termos) == 1 and termos[0].isdigit():
+            p = produtos.get(int(termos[0]))
+            if p is not None and p not in resultado:
+                resultado = [p] + resultado[:limit - 1]
+        return resultado
+
+    def produto(self, produto_id: int) -> Optional[Dict[str, Any]]:
+        return self._indice[1].get(produto_id)
+
+    def __len__(self) -> int:
+        return len(self._indice[1])
+
+
+__all__ = ['Catalogo', 'normalizar']
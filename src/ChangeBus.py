@@ -0,0 +1,235 @@
+"""Row-level change notifications, in this process and from other tills.
+
+Repositories (Usuario, Pedidos, Estoque, Gastos) call ``BUS.record`` inside
+the transaction that changes a row. That writes an ``alteracoes`` row in
+the same transaction and, once it commits, publishes a ``Change`` to this
+process's subscribers, so screens patch the affected rows instead of
+reloading whole tables:
+
+    unsubscribe = BUS.subscribe('usuarios', on_change)   # on_change(change)
+    BUS.watch('data/SysDB.db')                           # see other tills' changes too
+
+The watcher is the cross-process fallback: it polls ``PRAGMA data_version``,
+which only moves when another connection commits, and publishes the
+``alteracoes`` rows written by other processes (``change.local`` is False).
+Rows older than the last ``keep`` are pruned as it goes.
+
+Callbacks run on whatever thread committed (or on the watcher thread); Tk
+code subscribes through ``TkBridge.subscribe``. Bound methods are held
+weakly, so caches can subscribe without being kept alive by the bus.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+import types
+import uuid
+import weakref
+from datetime import datetime
+from typing import Optional, Any, Callable, Dict, List, NamedTuple
+
+# identifies this process's rows in alteracoes
+ORIGIN = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+# table of the change published when a watcher missed pruned rows: reload everything
+ALL = '*'
+
+
+class Change(NamedTuple):
+    """One committed change: op is 'insert', 'update', 'delete' or 'reload'.
+
+    key is the row's primary key, or None when many rows changed at once
+    (bulk inserts, a watcher that fell behind); subscribers then reload.
+    """
+    table: str
+    op: str
+    key: Optional[int]
+    data: Dict[str, Any]
+    local: bool = True
+
+
+Callback = Callable[[Change], None]
+
+
+def _ref(callback: Callback):
+    return weakref.WeakMethod(callback) if isinstance(callback, types.MethodType) else (lambda cb=callback: cb)
+
+
+class ChangeBus:
+    """In-process publish/subscribe of Change events, keyed by table."""
+
+    def __init__(self):
+        self._subs: Dict[Optional[str], List[Any]] = {}
+        self._lock = threading.Lock()
+        self._watchers: Dict[str, 'ChangeWatcher'] = {}
+
+    def subscribe(self, table: Optional[str], callback: Callback) -> Callable[[], None]:
+        """Call callback(change) for every change to table (None = every table).
+
+        Returns a function that cancels the subscription.
+        """
+        ref = _ref(callback)
+        with self._lock:
+            self._subs.setdefault(table, []).append(ref)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                refs = self._subs.get(table, [])
+                if ref in refs:
+                    refs.remove(ref)
+        return unsubscribe
+
+    def publish(self, change: Change) -> None:
+        with self._lock:
+            if change.table == ALL:
+                refs = [r for rs in self._subs.values() for r in rs]
+            else:
+                refs = self._subs.get(change.table, []) + self._subs.get(None, [])
+        dead = []
+        for ref in refs:
+            cb = ref()
+            if cb is None:
+                dead.append(ref)
+                continue
+            try:
+                cb(change)
+            except Exception:
+                # a broken subscriber must not undo a committed change or starve the others
+                pass
+        if dead:
+            with self._lock:
+                for refs in self._subs.values():
+                    refs[:] = [r for r in refs if r not in dead]
+
+    def record(self, db, table: str, op: str, key: Optional[int] = None, *, publish: bool = True,
+               **data) -> None:
+        """Log a change made in db's current transaction and publish it after the commit.
+
+        Call it inside the ``transaction()`` that makes the change, so the log
+        row commits (or rolls back) with it. data must be JSON serializable
+        and is visible to every till: never pass secrets. publish=False only
+        logs it, for changes already announced here when they happened in
+        memory (Pedidos).
+        """
+        db.execute("INSERT INTO alteracoes (tabela, op, chave, dados, origem, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                   (table, op, key, json.dumps(data) if data else None, ORIGIN, datetime.utcnow().isoformat()),
+                   cached=True)
+        if publish:
+            change = Change(table, op, key, data)
+            db.after_commit(lambda: self.publish(change))
+
+    def watch(self, db_path: str = "data/SysDB.db", **kwargs) -> 'ChangeWatcher':
+        """Start (once per database) a watcher publishing other processes' changes."""
+        key = os.path.abspath(db_path)
+        with self._lock:
+            watcher = self._watchers.get(key)
+            if watcher is None or watcher.stopped:
+                watcher = self._watchers[key] = ChangeWatcher(self, db_path, **kwargs)
+                watcher.start()
+            return watcher
+
+
+class ChangeWatcher:
+    """Daemon thread polling for commits made by other processes.
+
+    Each poll is one ``PRAGMA data_version`` on the watcher thread's own
+    connection (the counter is per connection, so poll() belongs to that
+    thread); only when it moved does it read the new ``alteracoes`` rows. Through a
+    DBServer (which has no shared file to watch) it reads the rows directly.
+    """
+
+    def __init__(self, bus: ChangeBus, db_path: str = "data/SysDB.db", *, interval: float = 0.5,
+                 keep: int = 10_000, batch: int = 1000):
+        self.bus = bus
+        self.db_path = db_path
+        self.interval = interval
+        self.keep = keep
+        self.batch = batch
+        self.stopped = False
+        self._db = None
+        self._version: Optional[int] = None
+        self._last: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> threading.Thread:
+        self._mark_start()   # before anything can be missed
+        self._thread = threading.Thread(target=self._run, name='sysdb-change-watcher', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.stopped = True
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        last_prune = 0.0
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                if time.monotonic() - last_prune > 600:
+                    self.prune()
+                    last_prune = time.monotonic()
+            except Exception:
+                # locked or unreachable database: try again on the next tick
+                pass
+
+    def _open(self):
+        if self._db is None:
+            from RemoteDBProxy import open_db
+            from Migrations import ensure_schema
+            db = open_db(self.db_path)
+            ensure_schema(db)
+            self._db = db
+        return self._db
+
+    def _mark_start(self) -> None:
+        # start from now: earlier changes are already in whatever the screens loaded
+        row = self._open().query_one("SELECT seq FROM sqlite_sequence WHERE name = 'alteracoes'")
+        self._last = row[0] if row else 0
+
+    def poll(self) -> int:
+        """Publish other processes' changes committed since the last poll; return how many."""
+        db = self._open()
+        if not getattr(db, 'remote', False):
+            version = db.query_one("PRAGMA data_version")[0]
+            if version == self._version:
+                return 0
+            self._version = version
+        if self._last is None:
+            self._mark_start()
+            return 0
+        published = 0
+        while True:
+            rows = db.query_all("SELECT seq, tabela, op, chave, dados, origem FROM alteracoes "
+                                "WHERE seq > ? ORDER BY seq LIMIT ?", (self._last, self.batch))
+            if not rows:
+                return published
+            if rows[0][0] > self._last + 1:
+                # AUTOINCREMENT never skips a committed seq: the missing rows were pruned
+                self.bus.publish(Change(ALL, 'reload', None, {}, local=False))
+                published += 1
+            for seq, tabela, op, chave, dados, origem in rows:
+                if origem != ORIGIN:
+                    self.bus.publish(Change(tabela, op, chave, json.loads(dados) if dados else {}, local=False))
+                    published += 1
+            self._last = rows[-1][0]
+            if len(rows) < self.batch:
+                return published
+
+    def prune(self) -> int:
+        """Delete all but the newest keep rows of alteracoes; return how many went."""
+        db = self._open()
+        top = db.query_one("SELECT COALESCE(MAX(seq), 0) FROM alteracoes")[0]
+        return db.execute("DELETE FROM alteracoes WHERE seq <= ?", (top - self.keep,), commit=True).rowcount
+
+
+BUS = ChangeBus()
+
+
+__all__ = ['BUS', 'ChangeBus', 'ChangeWatcher', 'Change', 'ORIGIN', 'ALL']
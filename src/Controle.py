@@ -1,2 +1,246 @@
+"""Sales and balance control (selecionarPeriodo, somaPedidosVendidos, calcularBalanco, gerarFluxoCaixa).
+
+Totals are read from two rollup tables, ``balanco_diario`` (one row per day)
+and ``balanco_mensal`` (one row per month), holding revenue, order and item
+counts and expenses. They are maintained incrementally:
+
+  - ``Controle.registrar(pedidos)`` adds a Pedidos close hook that adds the
+    order to its day and month inside the fecharPedido transaction;
+  - expense changes call ``Controle.lancarGasto(data, delta)`` inside their own
+    transaction (Gastos does this).
+
+A period report therefore reads whole months from ``balanco_mensal`` and only
+the partial months at its edges from ``balanco_diario``. ``verificar()``
+recomputes the rollups from ``pedidos`` and ``gastos`` and reports any
+difference; ``reconstruir()`` rewrites them from the raw data:
+
+    python src/Controle.py --verificar
+    python src/Controle.py --reconstruir
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Union, TYPE_CHECKING
+
+from DBProxy import DBProxy
+from Migrations import ensure_schema
+from RemoteDBProxy import open_db
+
+if TYPE_CHECKING:
+    from Pedidos import Pedido, Pedidos
+
+Dia = Union[str, date]
+
+METRICAS = ('receita_centavos', 'pedidos', 'itens', 'gastos_centavos')
+
+_UPSERT = (
+    "INSERT INTO {tabela} ({chave}, receita_centavos, pedidos, itens, gastos_centavos) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT ({chave}) DO UPDATE SET receita_centavos = receita_centavos + excluded.receita_centavos, "
+    "pedidos = pedidos + excluded.pedidos, itens = itens + excluded.itens, "
+    "gastos_centavos = gastos_centavos + excluded.gastos_centavos"
+)
+
+# rollups recomputed from the raw tables, keyed by day
+_RAW_DIARIO = """
+    SELECT dia, SUM(receita_centavos) AS receita_centavos, SUM(pedidos) AS pedidos,
+           SUM(itens) AS itens, SUM(gastos_centavos) AS gastos_centavos
+    FROM (
+        SELECT substr(p.fechado_em, 1, 10) AS dia, p.total_centavos AS receita_centavos, 1 AS pedidos,
+               COALESCE((SELECT SUM(i.quantidade) FROM pedido_itens i WHERE i.pedido_id = p.id), 0) AS itens,
+               0 AS gastos_centavos
+        FROM pedidos p WHERE p.status = 'fechado' AND p.fechado_em IS NOT NULL
+        UNION ALL
+        SELECT data, 0, 0, 0, valor_centavos FROM gastos
+    )
+    GROUP BY dia
+"""
+
+
+def _dia(d: Dia) -> date:
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+
+def _intervalos(inicio: date, fim: date) -> Tuple[List[Tuple[date, date]], Optional[Tuple[str, str]]]:
+    """Split [inicio, fim] into edge day ranges and the whole months in between."""
+    primeiro = inicio if inicio.day == 1 else (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    ultimo_dia = calendar.monthrange(fim.year, fim.month)[1]
+    ultimo = fim if fim.day == ultimo_dia else fim.replace(day=1) - timedelta(days=1)
+    if primeiro > ultimo:
+        return [(inicio, fim)], None
+    dias = []
+    if inicio < primeiro:
+        dias.append((inicio, primeiro - timedelta(days=1)))
+    if ultimo < fim:
+        dias.append((ultimo + timedelta(days=1), fim))
+    return dias, (primeiro.strftime('%Y-%m'), ultimo.strftime('%Y-%m'))
+
+
 class Controle:
-    pass
\ No newline at end of file
+    """Balance reports over the balanco_diario / balanco_mensal rollups.
+
+    Usage:
+        controle = Controle()
+        controle.registrar(pedidos)            # keep rollups current on fecharPedido
+        controle.selecionarPeriodo('2024-01-01', '2024-03-31')
+        controle.calcularBalanco()             # {'receita_centavos': ..., 'saldo_centavos': ...}
+    """
+
+    def __init__(self, db_path: str = "data/SysDB.db"):
+        self.db = open_db(db_path)
+        ensure_schema(self.db)
+        hoje = date.today()
+        self.periodo: Tuple[date, date] = (hoje.replace(day=1), hoje)
+
+    # --- incremental maintenance ---
+    @staticmethod
+    def _somar(db: DBProxy, dia: str, valores: Tuple[int, int, float, int]) -> None:
+        """Add valores (receita, pedidos, itens, gastos) to dia and its month (caller owns the transaction)."""
+        db.execute(_UPSERT.format(tabela='balanco_diario', chave='dia'), (dia,) + valores)
+        db.execute(_UPSERT.format(tabela='balanco_mensal', chave='mes'), (dia[:7],) + valores)
+
+    def pedidoFechado(self, db: DBProxy, pedido: 'Pedido') -> None:
+        """Add a closed order to the rollups (a Pedidos close hook)."""
+        dia = (pedido.fechado_em or datetime.now().isoformat())[:10]
+        itens = sum(i.quantidade for i in pedido.itens)
+        self._somar(db, dia, (pedido.total_centavos, 1, itens, 0))
+
+    def registrar(self, pedidos: 'Pedidos') -> None:
+        """Update the rollups inside every pedidos.fecharPedido transaction."""
+        pedidos.add_close_hook(self.pedidoFechado)
+
+    def lancarGasto(self, data: Dia, delta_centavos: int, db: Optional[DBProxy] = None) -> None:
+        """Add delta_centavos (negative to reverse) to the expenses of data.
+
+        Pass the caller's db to join its transaction, so the expense row and
+        the rollups commit together.
+        """
+        db = db or self.db
+        with db.transaction():
+            self._somar(db, _dia(data).isoformat(), (0, 0, 0, int(delta_centavos)))
+
+    # --- period ---
+    def selecionarPeriodo(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None) -> Tuple[date, date]:
+        """Set the period used by the reports when none is given (default: the current month)."""
+        hoje = date.today()
+        ini = _dia(inicio) if inicio is not None else hoje.replace(day=1)
+        end = _dia(fim) if fim is not None else hoje
+        if end < ini:
+            raise ValueError('fim must not be before inicio')
+        self.periodo = (ini, end)
+        return self.periodo
+
+    def _periodo(self, inicio: Optional[Dia], fim: Optional[Dia]) -> Tuple[date, date]:
+        return (_dia(inicio) if inicio is not None else self.periodo[0],
+                _dia(fim) if fim is not None else self.periodo[1])
+
+    def _totais(self, inicio: date, fim: date) -> Dict[str, Any]:
+        cols = ', '.join(f"COALESCE(SUM({m}), 0)" for m in METRICAS)
+        dias, meses = _intervalos(inicio, fim)
+        totais = dict.fromkeys(METRICAS, 0)
+        consultas = [(f"SELECT {cols} FROM balanco_diario WHERE dia BETWEEN ? AND ?", (a.isoformat(), b.isoformat()))
+                     for a, b in dias]
+        if meses:
+            consultas.append((f"SELECT {cols} FROM balanco_mensal WHERE mes BETWEEN ? AND ?", meses))
+        for sql, params in consultas:
+            row = self.db.query_one(sql, params)
+            for m, v in zip(METRICAS, row):
+                totais[m] += v
+        return totais
+
+    # --- reports ---
+    def somaPedidosVendidos(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None) -> Dict[str, Any]:
+        """Closed orders in the period: {'pedidos', 'itens', 'receita_centavos'}."""
+        t = self._totais(*self._periodo(inicio, fim))
+        return {'pedidos': t['pedidos'], 'itens': t['itens'], 'receita_centavos': t['receita_centavos']}
+
+    def calcularBalanco(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None) -> Dict[str, Any]:
+        """Revenue minus expenses over the period (Ganhos - Gastos)."""
+        ini, end = self._periodo(inicio, fim)
+        t = self._totais(ini, end)
+        t['saldo_centavos'] = t['receita_centavos'] - t['gastos_centavos']
+        t['inicio'], t['fim'] = ini.isoformat(), end.isoformat()
+        return t
+
+    def gerarFluxoCaixa(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None,
+                        por: str = 'dia') -> List[Dict[str, Any]]:
+        """Cash flow per 'dia' or 'mes' with running balance; days without movement are omitted."""
+        ini, end = self._periodo(inicio, fim)
+        if por == 'dia':
+            sql = f"SELECT dia AS periodo, {', '.join(METRICAS)} FROM balanco_diario WHERE dia BETWEEN ? AND ? ORDER BY dia"
+            params = (ini.isoformat(), end.isoformat())
+        elif por == 'mes':
+            # edge months may be partial: aggregate those from the daily table
+            dias, meses = _intervalos(ini, end)
+            partes = [f"SELECT substr(dia, 1, 7) AS periodo, {', '.join(METRICAS)} FROM balanco_diario "
+                      "WHERE dia BETWEEN ? AND ?" for _ in dias]
+            params = tuple(x for a, b in dias for x in (a.isoformat(), b.isoformat()))
+            if meses:
+                partes.append(f"SELECT mes AS periodo, {', '.join(METRICAS)} FROM balanco_mensal WHERE mes BETWEEN ? AND ?")
+                params += meses
+            somas = ', '.join(f"SUM({m}) AS {m}" for m in METRICAS)
+            sql = f"SELECT periodo, {somas} FROM ({' UNION ALL '.join(partes)}) GROUP BY periodo ORDER BY periodo"
+        else:
+            raise ValueError("por must be 'dia' or 'mes'")
+        fluxo, acumulado = [], 0
+        for r in self.db.query_all(sql, params):
+            d = dict(r)
+            d['saldo_centavos'] = d['receita_centavos'] - d['gastos_centavos']
+            acumulado += d['saldo_centavos']
+            d['saldo_acumulado_centavos'] = acumulado
+            fluxo.append(d)
+        return fluxo
+
+    # --- verification ---
+    def verificar(self) -> List[Dict[str, Any]]:
+        """Compare balanco_diario with totals recomputed from pedidos/gastos; return differing days."""
+        raw = {r['dia']: dict(r) for r in self.db.query_all(_RAW_DIARIO)}
+        rollup = {r['dia']: dict(r) for r in self.db.query_all(f"SELECT dia, {', '.join(METRICAS)} FROM balanco_diario")}
+        diffs = []
+        for dia in sorted(set(raw) | set(rollup)):
+            esperado = raw.get(dia) or dict.fromkeys(METRICAS, 0)
+            atual = rollup.get(dia) or dict.fromkeys(METRICAS, 0)
+            if any(abs((esperado[m] or 0) - (atual[m] or 0)) > 1e-6 for m in METRICAS):
+                diffs.append({'dia': dia, 'esperado': {m: esperado[m] for m in METRICAS},
+                              'atual': {m: atual[m] for m in METRICAS}})
+        return diffs
+
+    def reconstruir(self) -> int:
+        """Recompute both rollup tables from pedidos and gastos; return the number of days."""
+        with self.db.transaction():
+            self.db.execute("DELETE FROM balanco_diario")
+            self.db.execute("DELETE FROM balanco_mensal")
+            self.db.execute(f"INSERT INTO balanco_diario (dia, {', '.join(METRICAS)}) {_RAW_DIARIO}")
+            somas = ', '.join(f"SUM({m})" for m in METRICAS)
+            self.db.execute(f"INSERT INTO balanco_mensal (mes, {', '.join(METRICAS)}) "
+                            f"SELECT substr(dia, 1, 7), {somas} FROM balanco_diario GROUP BY substr(dia, 1, 7)")
+            return self.db.query_one("SELECT COUNT(*) FROM balanco_diario")[0]
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description='Verify or rebuild the balance rollups.')
+    ap.add_argument('--db', default='data/SysDB.db')
+    grp = ap.add_mutually_exclusive_group(required=True)
+    grp.add_argument('--verificar', action='store_true', help='report days whose rollups differ from raw data')
+    grp.add_argument('--reconstruir', action='store_true', help='recompute the rollups from raw data')
+    args = ap.parse_args(argv)
+    controle = Controle(args.db)
+    if args.verificar:
+        diffs = controle.verificar()
+        print(json.dumps(diffs, indent=2))
+        return 1 if diffs else 0
+    print(f'{controle.reconstruir()} dias reconstruídos')
+    return 0
+
+
+__all__ = ['Controle']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,8 +1,236 @@
 
+import os
+import queue
+import re
+import shutil
 import sqlite3
-from typing import Optional, Any, Iterable, Tuple
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from concurrent.futures import Future
+from typing import Optional, Any, Iterable, Tuple, Dict, List, Sequence, Callable, NamedTuple
 from contextlib import contextmanager
 
+from Metrics import METRICS
+
+
+# Pragmas applied to every pooled connection. WAL lets readers keep going while
+# one writer commits; synchronous=NORMAL is crash-safe in WAL mode and avoids an
+# fsync per commit on the WAL file.
+POOL_PRAGMAS: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,           # ms to wait on a locked database
+    'mmap_size': 64 * 1024 * 1024,  # bytes of the file mapped into memory
+    'cache_size': -16000,           # negative => KiB of page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+# size of sqlite3's own per-connection prepared statement cache
+SQLITE_CACHED_STATEMENTS = 256
+
+
+class ExecResult(NamedTuple):
+    """What callers usually need from a write cursor, safe to pass across threads."""
+    lastrowid: Optional[int]
+    rowcount: int
+
+
+_IDENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_CONFLICT_VERBS = {'IGNORE', 'REPLACE', 'ABORT', 'FAIL', 'ROLLBACK'}
+
+
+def _ident(name: str) -> str:
+    """Validate a table/column name before it is interpolated into SQL."""
+    if not isinstance(name, str) or not _IDENT_RE.match(name):
+        raise ValueError(f'invalid SQL identifier: {name!r}')
+    return name
+
+
+def _as_params(params: Iterable[Any]):
+    # sqlite3 accepts sequences and mappings as-is; only copy other iterables
+    if isinstance(params, (tuple, list, dict)):
+        return params
+    return tuple(params)
+
+
+_prepared_paths: set = set()
+
+
+def _prepare_path(db_path: str) -> None:
+    """Create the parent directory of db_path and move a stray root SysDB.db into it.
+
+    Runs once per path and process; later connects skip the filesystem probes.
+    """
+    key = os.path.abspath(db_path)
+    if key in _prepared_paths:
+        return
+    _prepared_paths.add(key)
+    parent = os.path.dirname(db_path)
+    if parent and not os.path.exists(parent):
+        os.makedirs(parent, exist_ok=True)
+
+    # if an old SysDB.db is at repo root, move it into data/
+    try:
+        root_db = os.path.join(os.getcwd(), 'SysDB.db')
+        if os.path.exists(root_db) and os.path.abspath(root_db) != os.path.abspath(db_path):
+            shutil.move(root_db, db_path)
+    except Exception:
+        pass
+
+
+class _ConnState:
+    """Per-connection bookkeeping shared by every DBProxy using that connection.
+
+    Holds the transaction nesting depth (so commits inside ``transaction()``
+    are deferred to the outermost block), the callbacks waiting for that
+    commit and the LRU of reusable cursors.
+    """
+
+    __slots__ = ('conn', 'depth', 'after_commit', 'cursors', 'hits', 'misses')
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.depth = 0
+        self.after_commit: List[Callable[[], None]] = []
+        self.cursors: 'OrderedDict[str, sqlite3.Cursor]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+class ConnectionPool:
+    """Shared SQLite connections for one database file.
+
+    Every thread gets its own connection from ``connection()``, opened on first
+    use and reused by all pooled DBProxy instances running on that thread.
+    Background jobs that do not want to pin a connection to their thread can
+    borrow one with ``lease()`` instead; leased connections are returned to a
+    small idle list when the block exits.
+
+    Pools are process-wide and keyed by absolute path, see ``ConnectionPool.get``.
+    """
+
+    _pools: Dict[str, 'ConnectionPool'] = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str, **kwargs) -> 'ConnectionPool':
+        """Return the pool for db_path, creating it on first use."""
+        key = os.path.abspath(db_path)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(db_path, **kwargs)
+                cls._pools[key] = pool
+            return pool
+
+    def __init__(self, db_path: str, *, enable_foreign_keys: bool = True, max_idle: int = 4,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        if db_path == ':memory:':
+            # every connection to :memory: is a different database
+            raise ValueError('pooled connections require a database file')
+        self.db_path = db_path
+        self.enable_foreign_keys = enable_foreign_keys
+        self.max_idle = max_idle
+        self.pragmas = dict(POOL_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+        self._open_conns: List[sqlite3.Connection] = []
+        # filesystem checks run once per pool, not on every connect
+        _prepare_path(db_path)
+
+    def _open(self) -> sqlite3.Connection:
+        timeout = self.pragmas.get('busy_timeout', 5000) / 1000.0
+        # connections may be leased to other threads; each one is still used
+        # by a single thread at a time
+        conn = sqlite3.connect(self.db_path, timeout=timeout, check_same_thread=False,
+                               cached_statements=SQLITE_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value};")
+            except sqlite3.DatabaseError:
+                # unsupported pragma in this sqlite build; keep the default
+                pass
+        if self.enable_foreign_keys:
+            try:
+                conn.execute("PRAGMA foreign_keys = ON;")
+            except Exception:
+                pass
+        with self._lock:
+            self._open_conns.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it if needed."""
+        return self.state().conn
+
+    def state(self) -> _ConnState:
+        """Return the calling thread's connection state, opening it if needed."""
+        st = getattr(self._local, 'state', None)
+        if st is None:
+            st = _ConnState(self._open())
+            self._local.state = st
+        return st
+
+    @contextmanager
+    def lease(self):
+        """Borrow a connection for the duration of a ``with`` block.
+
+        Usage:
+            with pool.lease() as conn:
+                conn.execute(...)
+        """
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                keep = len(self._idle) < self.max_idle
+                if keep:
+                    self._idle.append(conn)
+                else:
+                    self._open_conns.remove(conn)
+            if not keep:
+                conn.close()
+
+    def release(self) -> None:
+        """Close the calling thread's connection (call before a worker thread exits)."""
+        st = getattr(self._local, 'state', None)
+        if st is None:
+            return
+        self._local.state = None
+        conn = st.conn
+        with self._lock:
+            if conn in self._open_conns:
+                self._open_conns.remove(conn)
+        conn.close()
+
+    def close_all(self) -> None:
+        """Close every connection opened by this pool, in any thread."""
+        with self._lock:
+            conns, self._open_conns, self._idle = self._open_conns, [], []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        # thread-local references now point to closed connections; start fresh
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'open': len(self._open_conns), 'idle': len(self._idle)}
+
 
 class DBProxy:
     """Simple SQLite database proxy for SysDB.
@@ -12,34 +240,53 @@ class DBProxy:
         db.execute("CREATE TABLE IF NOT EXISTS ...")
 
     The class provides helpers to run queries and a context-manager interface.
+
+    With ``pooled=True`` the proxy does not own a connection: ``conn`` resolves
+    to the calling thread's connection from the shared ConnectionPool for
+    db_path (WAL journal, busy timeout, mmap). Creating many pooled proxies is
+    cheap and a pooled proxy may be used from several threads.
+
+    ``query_all`` (and ``execute(..., cached=True)``) reuse one cursor per SQL
+    text from a per-connection LRU of statement_cache_size entries; see
+    ``cache_info()``. ``query_one`` closes its cursor after the first row, so
+    a multi-row SELECT does not hold the connection's read snapshot open. Bulk writes go through ``bulk_insert`` /
+    ``bulk_upsert``, which run in a single transaction.
     """
 
-    def __init__(self, db_path: str = "data/SysDB.db", *, enable_foreign_keys: bool = True):
+    def __init__(self, db_path: str = "data/SysDB.db", *, enable_foreign_keys: bool = True,
+                 pooled: bool = False, statement_cache_size: int = 64):
         self.db_path = db_path
-        self.conn: Optional[sqlite3.Connection] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pool: Optional[ConnectionPool] = None
+        self._own_state: Optional[_ConnState] = None
         self.enable_foreign_keys = enable_foreign_keys
+        self.pooled = pooled
+        self.statement_cache_size = statement_cache_size
         self.connect()
 
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        if self._pool is not None:
+            return self._pool.connection()
+        return self._conn
+
+    @conn.setter
+    def conn(self, value: Optional[sqlite3.Connection]) -> None:
+        self._conn = value
+
     def connect(self) -> None:
         """Open a connection to the SQLite database (if not already opened)."""
-        if self.conn:
+        if self.pooled:
+            if self._pool is None:
+                self._pool = ConnectionPool.get(self.db_path, enable_foreign_keys=self.enable_foreign_keys)
+            return
+        if self._conn:
             return
         # ensure parent directory exists and move old root DB if needed
-        import os, shutil
-        parent = os.path.dirname(self.db_path)
-        if parent and not os.path.exists(parent):
-            os.makedirs(parent, exist_ok=True)
-
-        # if an old SysDB.db is at repo root, move it into data/
-        try:
-            root_db = os.path.join(os.getcwd(), 'SysDB.db')
-            if os.path.exists(root_db) and os.path.abspath(root_db) != os.path.abspath(self.db_path):
-                shutil.move(root_db, self.db_path)
-        except Exception:
-            pass
+        _prepare_path(self.db_path)
 
         # allow multi-threaded usage if required; keep default check_same_thread=True
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, cached_statements=SQLITE_CACHED_STATEMENTS)
         # return rows as sqlite3.Row for convenience
         self.conn.row_factory = sqlite3.Row
         if self.enable_foreign_keys:
@@ -50,45 +297,132 @@ class DBProxy:
                 pass
 
     def close(self) -> None:
-        """Close the database connection."""
+        """Close the database connection.
+
+        Pooled proxies only detach from the pool; the shared connections stay
+        open for other proxies until ConnectionPool.close_all().
+        """
+        if self._pool is not None:
+            self._pool = None
+            return
+        self._own_state = None
         if self.conn:
             try:
                 self.conn.close()
             finally:
                 self.conn = None
 
-    def execute(self, sql: str, params: Optional[Iterable[Any]] = None, commit: bool = False) -> sqlite3.Cursor:
+    def _state(self) -> _ConnState:
+        if self.pooled:
+            if self._pool is None:
+                self.connect()
+            return self._pool.state()
+        if self._conn is None:
+            self.connect()
+        if self._own_state is None or self._own_state.conn is not self._conn:
+            self._own_state = _ConnState(self._conn)
+        return self._own_state
+
+    def _cursor(self, st: _ConnState, sql: str) -> sqlite3.Cursor:
+        """Return the cached cursor for sql, creating (and maybe evicting) one."""
+        cur = st.cursors.get(sql)
+        if cur is not None:
+            st.cursors.move_to_end(sql)
+            st.hits += 1
+            return cur
+        st.misses += 1
+        cur = st.conn.cursor()
+        st.cursors[sql] = cur
+        while len(st.cursors) > max(self.statement_cache_size, 0):
+            _, old = st.cursors.popitem(last=False)
+            old.close()
+        return cur
+
+    def execute(self, sql: str, params: Optional[Iterable[Any]] = None, commit: bool = False,
+                *, cached: bool = False) -> sqlite3.Cursor:
         """Execute a SQL statement and return the cursor.
 
         Params accepts any iterable (tuple/list) that maps to SQL parameters.
-        If commit=True the transaction is committed after execution.
+        If commit=True the transaction is committed after execution, unless a
+        ``transaction()`` block is open, in which case the commit is deferred
+        to the end of that block.
+
+        With cached=True the cursor is reused for every call with the same SQL
+        text, so the caller must consume the result before the next call.
+
+        When METRICS is enabled the call's latency is recorded under its
+        normalized SQL (query_* include the fetch).
         """
-        if self.conn is None:
-            self.connect()
-        cur = self.conn.cursor()
+        if not METRICS.enabled:
+            return self._execute(sql, params, commit, cached)
+        t0 = time.perf_counter()
+        cur = self._execute(sql, params, commit, cached)
+        self._observe(sql, params, t0)
+        return cur
+
+    def _execute(self, sql: str, params: Optional[Iterable[Any]], commit: bool, cached: bool) -> sqlite3.Cursor:
+        st = self._state()
+        cur = self._cursor(st, sql) if cached else st.conn.cursor()
         if params:
-            cur.execute(sql, tuple(params))
+            cur.execute(sql, _as_params(params))
         else:
             cur.execute(sql)
-        if commit:
-            self.conn.commit()
+        if commit and st.depth == 0:
+            st.conn.commit()
         return cur
 
-    def executemany(self, sql: str, seq_of_params: Iterable[Tuple]) -> sqlite3.Cursor:
-        if self.conn is None:
-            self.connect()
-        cur = self.conn.cursor()
+    def _observe(self, sql: str, params: Optional[Iterable[Any]], t0: float) -> None:
+        conn = self.conn
+        METRICS.observe_sql(sql, time.perf_counter() - t0,
+                            lambda: conn.execute(f"EXPLAIN QUERY PLAN {sql}", _as_params(params or ())).fetchall())
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Tuple], commit: bool = True) -> sqlite3.Cursor:
+        t0 = time.perf_counter() if METRICS.enabled else None
+        st = self._state()
+        cur = st.conn.cursor()
         cur.executemany(sql, seq_of_params)
-        self.conn.commit()
+        if commit and st.depth == 0:
+            st.conn.commit()
+        if t0 is not None:
+            METRICS.observe_sql(sql, time.perf_counter() - t0)
         return cur
 
     def query_all(self, sql: str, params: Optional[Iterable[Any]] = None):
-        cur = self.execute(sql, params)
-        return cur.fetchall()
+        if not METRICS.enabled:
+            return self._execute(sql, params, False, True).fetchall()
+        t0 = time.perf_counter()
+        rows = self._execute(sql, params, False, True).fetchall()
+        self._observe(sql, params, t0)
+        return rows
 
     def query_one(self, sql: str, params: Optional[Iterable[Any]] = None):
-        cur = self.execute(sql, params)
-        return cur.fetchone()
+        if not METRICS.enabled:
+            return self._fetch_one(sql, params)
+        t0 = time.perf_counter()
+        row = self._fetch_one(sql, params)
+        self._observe(sql, params, t0)
+        return row
+
+    def _fetch_one(self, sql: str, params: Optional[Iterable[Any]]):
+        cur = self._execute(sql, params, False, False)
+        try:
+            return cur.fetchone()
+        finally:
+            # an unfinished statement keeps the WAL read snapshot (and blocks
+            # checkpoints) until it is reset; close() resets it
+            cur.close()
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return cursor-cache statistics for the current connection."""
+        st = self._state()
+        return {'size': len(st.cursors), 'capacity': self.statement_cache_size,
+                'hits': st.hits, 'misses': st.misses}
+
+    def clear_cache(self) -> None:
+        st = self._state()
+        for cur in st.cursors.values():
+            cur.close()
+        st.cursors.clear()
 
     @contextmanager
     def transaction(self):
@@ -98,15 +432,113 @@ class DBProxy:
             with db.transaction():
                 db.execute(...)
                 db.execute(...)
+
+        Blocks may be nested: inner blocks become SAVEPOINTs and only the
+        outermost block commits, so everything inside costs a single fsync.
+        Callbacks registered with ``after_commit`` run after that commit.
         """
-        if self.conn is None:
-            self.connect()
+        st = self._state()
+        conn = st.conn
+        if st.depth:
+            name = f"sp_{st.depth}"
+            conn.execute(f"SAVEPOINT {name}")
+            st.depth += 1
+            mark = len(st.after_commit)
+            try:
+                yield self
+            except Exception:
+                conn.execute(f"ROLLBACK TO {name}")
+                conn.execute(f"RELEASE {name}")
+                del st.after_commit[mark:]
+                raise
+            else:
+                conn.execute(f"RELEASE {name}")
+            finally:
+                st.depth -= 1
+            return
+        if not conn.in_transaction:
+            # begin explicitly: a SAVEPOINT opened first would otherwise start
+            # its own transaction and commit on RELEASE
+            conn.execute("BEGIN")
+        st.depth = 1
         try:
             yield self
-            self.conn.commit()
+            st.depth = 0
+            conn.commit()
         except Exception:
-            self.conn.rollback()
+            st.depth = 0
+            st.after_commit.clear()
+            conn.rollback()
             raise
+        pending, st.after_commit = st.after_commit, []
+        for fn in pending:
+            fn()
+
+    def after_commit(self, fn: Callable[[], None]) -> None:
+        """Call fn once the enclosing ``transaction()`` commits (dropped on rollback).
+
+        Outside a transaction block fn runs at once.
+        """
+        st = self._state()
+        if st.depth:
+            st.after_commit.append(fn)
+        else:
+            fn()
+
+    def writer(self, **kwargs) -> 'WriteBehindQueue':
+        """Return the shared WriteBehindQueue for this database (started on first use)."""
+        return WriteBehindQueue.get(self.db_path, **kwargs)
+
+    # bulk writes
+    def bulk_insert(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]], *,
+                    chunk_size: int = 1000, on_conflict: Optional[str] = None) -> int:
+        """Insert many rows in one transaction and return how many were written.
+
+        rows may be any iterable (a generator is fine); it is consumed in
+        chunks of chunk_size, so memory stays bounded. on_conflict selects an
+        ``INSERT OR <verb>`` form, e.g. 'IGNORE' or 'REPLACE'.
+        """
+        cols = [_ident(c) for c in columns]
+        verb = 'INSERT'
+        if on_conflict:
+            if on_conflict.upper() not in _CONFLICT_VERBS:
+                raise ValueError(f'invalid on_conflict: {on_conflict!r}')
+            verb = f'INSERT OR {on_conflict.upper()}'
+        sql = f"{verb} INTO {_ident(table)} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        return self._bulk(sql, rows, chunk_size)
+
+    def bulk_upsert(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    key_columns: Sequence[str], update_columns: Optional[Sequence[str]] = None, *,
+                    chunk_size: int = 1000) -> int:
+        """Insert rows, updating update_columns when key_columns already exist.
+
+        update_columns defaults to every column that is not part of the key.
+        Runs in one transaction like ``bulk_insert``.
+        """
+        cols = [_ident(c) for c in columns]
+        keys = [_ident(c) for c in key_columns]
+        if update_columns is None:
+            update_columns = [c for c in cols if c not in keys]
+        updates = [_ident(c) for c in update_columns]
+        sql = (f"INSERT INTO {_ident(table)} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+               f"ON CONFLICT ({', '.join(keys)}) ")
+        if updates:
+            sql += "DO UPDATE SET " + ', '.join(f"{c} = excluded.{c}" for c in updates)
+        else:
+            sql += "DO NOTHING"
+        return self._bulk(sql, rows, chunk_size)
+
+    def _bulk(self, sql: str, rows: Iterable[Sequence[Any]], chunk_size: int) -> int:
+        total = 0
+        it = iter(rows)
+        with self.transaction():
+            while True:
+                chunk = list(islice(it, chunk_size))
+                if not chunk:
+                    break
+                cur = self.executemany(sql, chunk, commit=False)
+                total += max(cur.rowcount, 0)
+        return total
 
     # allow use with `with DBProxy(...) as db:`
     def __enter__(self):
@@ -127,6 +559,222 @@ class DBProxy:
             return False
 
 
+class _Job:
+    __slots__ = ('kind', 'work', 'args', 'kwargs', 'durable', 'future')
+
+    def __init__(self, kind: str, work: Any, args: tuple, kwargs: dict, durable: bool):
+        self.kind = kind
+        self.work = work
+        self.args = args
+        self.kwargs = kwargs
+        self.durable = durable
+        self.future: Future = Future()
+
+    def run(self, db: 'DBProxy') -> Any:
+        if self.kind == 'execute':
+            cur = db.execute(self.work, self.args[0])
+            return ExecResult(cur.lastrowid, cur.rowcount)
+        if self.kind == 'executemany':
+            return db.executemany(self.work, self.args[0], commit=False).rowcount
+        return self.work(db, *self.args, **self.kwargs)
+
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Single writer thread that group-commits queued writes.
+
+    ``execute`` / ``executemany`` / ``call`` return a concurrent Future at once;
+    the writer thread takes everything queued (optionally waiting max_delay
+    seconds for more; by default whatever piled up during the previous commit
+    forms the next batch), runs each job in its own SAVEPOINT and commits the
+    whole batch once. A failing job only fails its own future. Futures resolve after the
+    commit, so a result is visible to every other connection by then.
+
+    Commits use the pool's ``synchronous=NORMAL`` (safe against application
+    crashes in WAL mode). Jobs submitted with ``durable=True`` (money, stock)
+    make their batch commit with ``synchronous=FULL``, so the WAL is synced to
+    disk before their future resolves.
+
+    Once the writer thread stops, after close() or an unexpected error, every
+    job it did not run fails with RuntimeError and new submissions raise it,
+    so ``fut.result()`` never waits forever.
+
+    Usage:
+        wq = WriteBehindQueue.get('data/SysDB.db')
+        fut = wq.execute("UPDATE usuarios SET ativo = 0 WHERE id = ?", (uid,))
+        fut.add_done_callback(...)          # or fut.result() to wait
+        wq.call(lambda db: ..., durable=True)
+
+    on_success/on_error callbacks run on the writer thread; Tk code should hand
+    the future to a TkBridge instead.
+    """
+
+    _queues: Dict[str, 'WriteBehindQueue'] = {}
+    _queues_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str, **kwargs) -> 'WriteBehindQueue':
+        """Return the running queue for db_path, starting it on first use."""
+        key = os.path.abspath(db_path)
+        with cls._queues_lock:
+            wq = cls._queues.get(key)
+            if wq is None or wq._closed:
+                wq = cls._queues[key] = cls(db_path, **kwargs)
+            return wq
+
+    def __init__(self, db_path: str, *, max_delay: float = 0.0, max_batch: int = 1000,
+                 enable_foreign_keys: bool = True):
+        self.db_path = db_path
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.enable_foreign_keys = enable_foreign_keys
+        self._q: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._closed = False
+        # makes "not closed, then put" atomic with respect to close()
+        self._submit_lock = threading.Lock()
+        self._stats = {'jobs': 0, 'batches': 0, 'errors': 0, 'durable_batches': 0}
+        self._thread = threading.Thread(target=self._run, name='sysdb-writer', daemon=True)
+        self._thread.start()
+
+    # --- submission ---
+    def _submit(self, job: _Job, on_success: Optional[Callable[[Any], None]],
+                on_error: Optional[Callable[[BaseException], None]]) -> Future:
+        if on_success is not None or on_error is not None:
+            def done(f: Future) -> None:
+                exc = f.exception()
+                cb, arg = (on_success, f.result()) if exc is None else (on_error, exc)
+                if cb is not None:
+                    cb(arg)
+            job.future.add_done_callback(done)
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError('write-behind queue is closed')
+            self._q.put(job)
+        return job.future
+
+    def execute(self, sql: str, params: Optional[Iterable[Any]] = None, *, durable: bool = False,
+                on_success: Optional[Callable[[Any], None]] = None,
+                on_error: Optional[Callable[[BaseException], None]] = None) -> Future:
+        """Queue one statement; the future's result is an ExecResult."""
+        return self._submit(_Job('execute', sql, (params,), {}, durable), on_success, on_error)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Tuple], *, durable: bool = False,
+                    on_success: Optional[Callable[[Any], None]] = None,
+                    on_error: Optional[Callable[[BaseException], None]] = None) -> Future:
+        """Queue a statement for many parameter sets; the future's result is the rowcount."""
+        return self._submit(_Job('executemany', sql, (list(seq_of_params),), {}, durable), on_success, on_error)
+
+    def call(self, fn: Callable[..., Any], *args, durable: bool = False,
+             on_success: Optional[Callable[[Any], None]] = None,
+             on_error: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Future:
+        """Queue fn(db, *args, **kwargs) to run in the writer's transaction; keep it short."""
+        return self._submit(_Job('call', fn, args, kwargs, durable), on_success, on_error)
+
+    # --- writer thread ---
+    def _collect(self, first: _Job) -> Tuple[List[_Job], bool]:
+        batch, stop = [first], False
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                job = self._q.get_nowait()
+            except queue.Empty:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                try:
+                    job = self._q.get(timeout=wait)
+                except queue.Empty:
+                    break
+            if job is _STOP:
+                stop = True
+                break
+            batch.append(job)
+        return batch, stop
+
+    def _run(self) -> None:
+        batch: List[_Job] = []
+        try:
+            db = DBProxy(self.db_path, enable_foreign_keys=self.enable_foreign_keys, pooled=True)
+            conn = db.conn
+            full = False
+            try:
+                while True:
+                    first = self._q.get()
+                    if first is _STOP:
+                        break
+                    batch, stop = self._collect(first)
+                    durable = any(j.durable for j in batch)
+                    if durable != full:
+                        # the safety level can only change outside a transaction
+                        conn.execute(f"PRAGMA synchronous = {'FULL' if durable else 'NORMAL'}")
+                        full = durable
+                    self._commit_batch(db, batch)
+                    self._stats['batches'] += 1
+                    self._stats['durable_batches'] += durable
+                    if stop:
+                        break
+            finally:
+                ConnectionPool.get(self.db_path).release()
+        finally:
+            self._fail_pending(batch)
+
+    def _fail_pending(self, batch: List[_Job]) -> None:
+        # nothing will run after this thread: no caller may wait forever on a future
+        with self._submit_lock:
+            self._closed = True
+        left = [j for j in batch if not j.future.done()]
+        while True:
+            try:
+                job = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if job is not _STOP:
+                left.append(job)
+        for job in left:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError('write-behind queue is closed'))
+
+    def _commit_batch(self, db: 'DBProxy', batch: List[_Job]) -> None:
+        results: List[Tuple[_Job, Any, Optional[BaseException]]] = []
+        try:
+            with db.transaction():
+                for job in batch:
+                    try:
+                        with db.transaction():
+                            results.append((job, job.run(db), None))
+                    except Exception as exc:
+                        results.append((job, None, exc))
+        except Exception as exc:
+            # the commit itself failed: nothing in this batch was written
+            results = [(job, None, exc) for job in batch]
+        for job, value, exc in results:
+            self._stats['jobs'] += 1
+            if exc is None:
+                job.future.set_result(value)
+            else:
+                self._stats['errors'] += 1
+                job.future.set_exception(exc)
+
+    # --- lifecycle ---
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until everything queued so far is committed."""
+        self.call(lambda db: None).result(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Commit what is queued and stop the writer thread."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._q.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
 """if __name__ == '__main__':
     # quick demo: create a tiny config table and insert a row (in data/ by default)
     db = DBProxy('data/SysDB_demo.db')
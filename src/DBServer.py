@@ -0,0 +1,375 @@
+"""Service mode: one process owns SysDB and the tills talk to it over a socket.
+
+When several tills open ``data/SysDB.db`` on a shared drive they fight over
+SQLite's file locks. Instead, run one server next to the database file and
+point every App at it (``SYSDB_SERVER=unix:data/sysdb.sock`` or
+``SYSDB_SERVER=tcp:192.168.0.10:8765``; see RemoteDBProxy):
+
+    python src/DBServer.py --db data/SysDB.db --unix data/sysdb.sock
+    python src/DBServer.py --db data/SysDB.db --tcp 0.0.0.0:8765 --token segredo
+
+Each client connection is read by an asyncio task and every request is
+dispatched as soon as it arrives, so clients may pipeline. Per connection:
+
+- reads run on a pool of reader threads, each with its own pooled
+  connection opened ``query_only``; a read waits for the writes sent
+  before it on the same connection, so a client always reads its own writes;
+- writes outside a transaction go to the database's WriteBehindQueue, which
+  commits whatever all clients queued meanwhile as one transaction;
+- ``begin`` leases a dedicated connection (BEGIN IMMEDIATE) whose
+  statements run in order until ``commit``/``rollback``; a client that
+  disconnects mid-transaction is rolled back. SQLite allows one write
+  transaction at a time, so the server runs them one at a time too: a
+  ``begin`` waits (on the event loop, for up to lock_timeout seconds) until
+  the previous transaction ends, and transactions run on their own thread,
+  never on the reader pool.
+
+Replies carry the request id and may arrive out of order. With --token the
+first request must be a ``hello`` carrying it. TCP binds 127.0.0.1 unless
+told otherwise. The server also runs the scheduled online backups
+(--backup-interval, see Backup), since the tills cannot reach the file.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hmac
+import itertools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Dict, List
+
+import Backup
+from DBProxy import ConnectionPool, DBProxy, WriteBehindQueue
+from Migrations import ensure_schema
+from RemoteDBProxy import (PROTOCOL_VERSION, MAX_FRAME, _HEADER, pack, unpack, decode_params, encode_rows,
+                           error_payload, parse_address)
+
+_READ_VERBS = {'SELECT', 'EXPLAIN', 'VALUES'}
+_WRITE_WORDS = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER'}
+
+
+def is_read(sql: str) -> bool:
+    """Whether sql can run on a query_only connection (anything doubtful counts as a write)."""
+    words = sql.lstrip(' \t\r\n(').split(None, 1)
+    if not words:
+        return True
+    verb = words[0].upper()
+    if verb in _READ_VERBS:
+        return True
+    if verb == 'WITH':
+        return not (_WRITE_WORDS & set(sql.upper().replace('(', ' ').split()))
+    if verb == 'PRAGMA':
+        return '=' not in sql and '(' not in sql
+    return False
+
+
+def _run(conn: sqlite3.Connection, sql: str, params: Any) -> Dict[str, Any]:
+    cur = conn.execute(sql, params)
+    reply: Dict[str, Any] = {'lastrowid': cur.lastrowid, 'rowcount': cur.rowcount}
+    if cur.description is not None:
+        reply['columns'] = [d[0] for d in cur.description]
+        reply['rows'] = encode_rows(cur.fetchall())
+    return reply
+
+
+def _run_many(conn: sqlite3.Connection, sql: str, rows: List[Any]) -> Dict[str, Any]:
+    cur = conn.executemany(sql, [decode_params(r) for r in rows])
+    return {'lastrowid': cur.lastrowid, 'rowcount': cur.rowcount}
+
+
+class _Session:
+    """A client transaction: one leased connection, statements applied in arrival order."""
+
+    def __init__(self, lease):
+        self.lease = lease
+        self.conn: sqlite3.Connection = lease.__enter__()
+        self.tail: Optional[asyncio.Future] = None
+        self.ended = False
+
+    def end(self, commit: bool) -> None:
+        try:
+            if commit:
+                self.conn.commit()
+            elif self.conn.in_transaction:
+                self.conn.rollback()
+        finally:
+            self.lease.__exit__(None, None, None)
+
+
+class DBServer:
+    """Asyncio server owning one SQLite database.
+
+    Usage:
+        server = DBServer('data/SysDB.db')
+        asyncio.run(server.serve(unix_path='data/sysdb.sock'))
+    """
+
+    def __init__(self, db_path: str = "data/SysDB.db", *, readers: int = 4, token: Optional[str] = None,
+                 lock_timeout: float = 10.0):
+        self.db_path = db_path
+        self.token = token
+        self.lock_timeout = lock_timeout
+        self.pool = ConnectionPool.get(db_path)
+        ensure_schema(DBProxy(db_path, pooled=True))
+        self.writer = WriteBehindQueue.get(db_path)
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='sysdb-server-read',
+                                           initializer=self._reader_init)
+        # transactions run one at a time (see _begin), so one thread serves them all
+        self._tx_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sysdb-server-tx')
+        self._tx_lock: Optional[asyncio.Lock] = None
+        self._tx_ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stats = {'connections': 0, 'open_connections': 0, 'requests': 0, 'reads': 0, 'writes': 0,
+                       'transactions': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def _reader_init(self) -> None:
+        # reads never take the write lock, even if is_read() guessed wrong
+        self.pool.connection().execute("PRAGMA query_only = ON")
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        out['group_commit'] = self.writer.stats()
+        return out
+
+    # --- lifecycle ---
+    async def start(self, *, unix_path: Optional[str] = None, host: str = '127.0.0.1',
+                    port: Optional[int] = None) -> asyncio.AbstractServer:
+        self._tx_lock = asyncio.Lock()
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self._server = await asyncio.start_unix_server(self._client, path=unix_path, limit=MAX_FRAME)
+            os.chmod(unix_path, 0o660)
+        else:
+            self._server = await asyncio.start_server(self._client, host=host, port=port, limit=MAX_FRAME)
+        return self._server
+
+    async def serve(self, **kwargs) -> None:
+        server = await self.start(**kwargs)
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        self.writer.close()
+        self._readers.shutdown(wait=False)
+        self._tx_thread.shutdown(wait=False)
+
+    # --- per client ---
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._count('connections')
+        self._count('open_connections')
+        sessions: Dict[int, _Session] = {}
+        state = {'authed': self.token is None, 'last_write': None, 'closed': False}
+        tasks = set()
+        try:
+            while True:
+                try:
+                    head = await reader.readexactly(_HEADER.size)
+                    (size,) = _HEADER.unpack(head)
+                    if size > MAX_FRAME:
+                        break
+                    msg = unpack(await reader.readexactly(size))
+                except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    break
+                self._count('requests')
+                task = asyncio.ensure_future(self._dispatch(msg, writer, sessions, state))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            state['closed'] = True
+            for task in list(tasks):
+                task.cancel()
+            for session in list(sessions.values()):
+                await self._end(session, False)
+            sessions.clear()
+            self._count('open_connections', -1)
+            writer.close()
+
+    async def _dispatch(self, msg: Dict[str, Any], writer: asyncio.StreamWriter,
+                        sessions: Dict[int, _Session], state: Dict[str, Any]) -> None:
+        rid = msg.get('id')
+        try:
+            reply = await self._handle(msg, sessions, state)
+            reply.update(id=rid, ok=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._count('errors')
+            reply = {'id': rid, 'ok': False, 'error': error_payload(exc)}
+        if not writer.is_closing():
+            writer.write(pack(reply))
+            await writer.drain()
+
+    async def _handle(self, msg: Dict[str, Any], sessions: Dict[int, _Session],
+                      state: Dict[str, Any]) -> Dict[str, Any]:
+        op = msg.get('op')
+        loop = asyncio.get_running_loop()
+        if op == 'hello':
+            # constant time: the token may be guarding a TCP port
+            if self.token is not None and not hmac.compare_digest(str(msg.get('token') or '').encode(),
+                                                                  self.token.encode()):
+                raise PermissionError('invalid token')
+            state['authed'] = True
+            return {'version': PROTOCOL_VERSION, 'db_path': os.path.realpath(self.db_path)}
+        if not state['authed']:
+            raise PermissionError('send hello with the server token first')
+        if op == 'stats':
+            return {'stats': self.stats()}
+
+        tx = msg.get('tx')
+        if op == 'begin':
+            session = await self._begin()
+            if state['closed']:
+                # the client went away while this begin waited for its turn
+                await self._end(session, False)
+                raise ConnectionError('client disconnected')
+            tx = next(self._tx_ids)
+            sessions[tx] = session
+            self._count('transactions')
+            return {'tx': tx}
+        if tx is not None:
+            session = sessions.get(tx)
+            if session is None:
+                raise sqlite3.OperationalError(f'no such transaction: {tx}')
+            if op in ('commit', 'rollback'):
+                del sessions[tx]
+                await self._end(session, op == 'commit')
+                return {}
+            if op == 'execute':
+                params = decode_params(msg.get('params'))
+                return await self._in_session(session, lambda: _run(session.conn, msg['sql'], params))
+            if op == 'executemany':
+                return await self._in_session(session, lambda: _run_many(session.conn, msg['sql'], msg['rows']))
+            raise ValueError(f'unknown op: {op!r}')
+
+        sql = msg.get('sql') or ''
+        if op == 'execute' and is_read(sql):
+            self._count('reads')
+            params = decode_params(msg.get('params'))
+            last = state['last_write']
+            if last is not None and not last.done():
+                await asyncio.wait([last])
+            return await loop.run_in_executor(self._readers, lambda: _run(self.pool.connection(), sql, params))
+        if op == 'execute':
+            params = decode_params(msg.get('params'))
+            fut = self.writer.call(lambda db: _run(db.conn, sql, params), durable=bool(msg.get('durable')))
+        elif op == 'executemany':
+            rows = msg.get('rows') or []
+            fut = self.writer.call(lambda db: _run_many(db.conn, sql, rows), durable=bool(msg.get('durable')))
+        else:
+            raise ValueError(f'unknown op: {op!r}')
+        self._count('writes')
+        afut = asyncio.wrap_future(fut)
+        state['last_write'] = afut
+        return await afut
+
+    async def _begin(self) -> _Session:
+        """Wait for the previous transaction to end, then open a session.
+
+        Waiting happens on the event loop, so clients queued behind a long
+        transaction tie up no thread, and the transaction holding the lock
+        always has a thread to run its next statement on.
+        """
+        try:
+            await asyncio.wait_for(self._tx_lock.acquire(), self.lock_timeout)
+        except asyncio.TimeoutError:
+            raise sqlite3.OperationalError('database is locked') from None
+        opening = self._tx_thread.submit(self._open_session)
+        try:
+            return await asyncio.shield(asyncio.wrap_future(opening))
+        except BaseException:
+            # cancelled (client gone) or failed: the transaction thread runs jobs
+            # in order, so this undoes the session before any later begin
+            self._tx_thread.submit(self._discard, opening)
+            self._tx_lock.release()
+            raise
+
+    def _open_session(self) -> _Session:
+        session = _Session(self.pool.lease())
+        try:
+            # take the write lock now: upgrading a read transaction later can fail with SQLITE_BUSY
+            session.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            session.lease.__exit__(None, None, None)
+            raise
+        return session
+
+    @staticmethod
+    def _discard(opening) -> None:
+        if opening.exception() is None:
+            opening.result().end(False)
+
+    async def _end(self, session: _Session, commit: bool) -> None:
+        """Commit or roll back session after its pending statements, then let the next begin in."""
+        if session.ended:
+            return
+        session.ended = True
+        task = self._queue(session, lambda: session.end(commit))
+        # released when the end has run, even if this request is cancelled meanwhile
+        task.add_done_callback(lambda _: self._tx_lock.release())
+        await asyncio.shield(task)
+
+    def _queue(self, session: _Session, fn) -> asyncio.Task:
+        """Schedule fn on the transaction thread after every earlier statement of the session."""
+        loop = asyncio.get_running_loop()
+        prev = session.tail
+
+        async def step():
+            if prev is not None:
+                await asyncio.wait([prev])
+            return await loop.run_in_executor(self._tx_thread, fn)
+
+        task = session.tail = asyncio.ensure_future(step())
+        return task
+
+    async def _in_session(self, session: _Session, fn) -> Any:
+        # a cancelled request (client gone) must not cancel the statement itself
+        result = await asyncio.shield(self._queue(session, fn))
+        return {} if result is None else result
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--db', default='data/SysDB.db')
+    where = ap.add_mutually_exclusive_group()
+    where.add_argument('--unix', help='Unix socket path (default data/sysdb.sock)')
+    where.add_argument('--tcp', help='host:port to listen on')
+    ap.add_argument('--readers', type=int, default=4, help='reader threads')
+    ap.add_argument('--lock-timeout', type=float, default=10.0,
+                    help='seconds a begin waits for the running transaction before failing')
+    ap.add_argument('--token', default=os.environ.get('SYSDB_SERVER_TOKEN'), help='shared secret clients must send')
+    ap.add_argument('--backup-interval', type=float, default=Backup.INTERVAL / 3600,
+                    help='hours between online backups of the database (0 disables; see Backup)')
+    args = ap.parse_args(argv)
+
+    server = DBServer(args.db, readers=args.readers, token=args.token, lock_timeout=args.lock_timeout)
+    Backup.schedule(args.db, interval=args.backup_interval * 3600)
+    if args.tcp:
+        _, (host, port) = parse_address(args.tcp)
+        kwargs: Dict[str, Any] = {'host': host, 'port': port}
+    else:
+        kwargs = {'unix_path': args.unix or os.path.join(os.path.dirname(args.db) or '.', 'sysdb.sock')}
+    try:
+        asyncio.run(server.serve(**kwargs))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+__all__ = ['DBServer', 'is_read']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
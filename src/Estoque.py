@@ -1,2 +1,269 @@
+"""Inventory (incluirItem, atualizarItem, excluirItem, mostrarItens).
+
+``estoque_itens.quantidade`` is the current quantity of each item and every
+change to it is also appended to the ``estoque_movimentos`` ledger, in the same
+DBProxy transaction, so reading stock is a primary-key lookup however long the
+history grows and the history can always be audited against it.
+
+Products consume stock through ``produto_ingredientes`` (recipe lines). Once
+registered with ``Estoque.registrar(pedidos)``, closing an order decrements
+all of its ingredients with one batched ``UPDATE ... WHERE quantidade >= ?``
+inside the fecharPedido transaction; if any item would go negative the whole
+close is rolled back and EstoqueInsuficiente is raised.
+
+Every change to an item is recorded on the ChangeBus ('estoque_itens',
+key = item id) inside the transaction that makes it.
+
+``buscar`` finds items by partial name through the ``estoque_itens_fts``
+full-text index.
+
+Items below their reorder point are kept in the partial index
+``idx_estoque_baixo``, so ``itensAbaixoReposicao()`` never scans the table.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple, TYPE_CHECKING
+
+from ChangeBus import BUS
+from DBProxy import DBProxy
+from FullText import search
+from Migrations import ensure_schema
+from RemoteDBProxy import open_db
+
+if TYPE_CHECKING:
+    from Pedidos import Pedido, Pedidos
+
+
+class EstoqueInsuficiente(Exception):
+    """Raised when a movement would leave an item with negative quantity.
+
+    ``faltas`` maps item id to {'nome', 'disponivel', 'necessario'}.
+    """
+
+    def __init__(self, faltas: Dict[int, Dict[str, Any]]):
+        self.faltas = faltas
+        nomes = ', '.join(f"{f['nome']} ({f['disponivel']:g}/{f['necessario']:g})" for f in faltas.values())
+        super().__init__(f'estoque insuficiente: {nomes}')
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
 class Estoque:
-    pass
\ No newline at end of file
+    """Stock manager backed by SysDB.
+
+    Usage:
+        estoque = Estoque()
+        leite = estoque.incluirItem('Leite', unidade='l', quantidade=10, ponto_reposicao=3)
+        estoque.definirReceita(produto_id=1, ingredientes=[(leite, 0.2)])
+        estoque.registrar(pedidos)  # decrement on fecharPedido
+    """
+
+    COLUNAS = ('id', 'nome', 'unidade', 'quantidade', 'ponto_reposicao', 'custo_unit_centavos',
+               'ativo', 'created_at', 'updated_at')
+
+    def __init__(self, db_path: str = "data/SysDB.db"):
+        self.db = open_db(db_path)
+        ensure_schema(self.db)
+
+    # --- items ---
+    def incluirItem(self, nome: str, unidade: str = 'un', quantidade: float = 0, ponto_reposicao: float = 0,
+                    custo_unit_centavos: Optional[int] = None) -> int:
+        """Create an item and return its id; an initial quantity is recorded as a movement."""
+        if not nome:
+            raise ValueError('nome is required')
+        if quantidade < 0:
+            raise ValueError('quantidade must not be negative')
+        agora = _agora()
+        with self.db.transaction():
+            cur = self.db.execute(
+                "INSERT INTO estoque_itens (nome, unidade, quantidade, ponto_reposicao, custo_unit_centavos, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (nome, unidade, quantidade, ponto_reposicao, custo_unit_centavos, agora),
+            )
+            item_id = cur.lastrowid
+            if quantidade:
+                self._registrar_movimentos(self.db, [(item_id, quantidade, 'inclusao', None)], agora)
+            BUS.record(self.db, 'estoque_itens', 'insert', item_id)
+        return item_id
+
+    def atualizarItem(self, item_id: int, **fields) -> bool:
+        """Update fields for item_id. Allowed: nome, unidade, ponto_reposicao, custo_unit_centavos, ativo
+
+        ``quantidade`` may also be given: the difference to the current
+        quantity is recorded as an 'ajuste' movement. Returns True when a row
+        was changed.
+        """
+        allowed = {'nome', 'unidade', 'ponto_reposicao', 'custo_unit_centavos', 'ativo'}
+        set_parts = [f"{k} = ?" for k in fields if k in allowed]
+        params: List[Any] = [v for k, v in fields.items() if k in allowed]
+        nova_qtd = fields.get('quantidade')
+        if not set_parts and nova_qtd is None:
+            return False
+        agora = _agora()
+        with self.db.transaction():
+            changed = False
+            if set_parts:
+                cur = self.db.execute(
+                    f"UPDATE estoque_itens SET {', '.join(set_parts)}, updated_at = ? WHERE id = ?",
+                    params + [agora, item_id],
+                )
+                changed = cur.rowcount > 0
+                if changed:
+                    BUS.record(self.db, 'estoque_itens', 'update', item_id)
+            if nova_qtd is not None:
+                if nova_qtd < 0:
+                    raise ValueError('quantidade must not be negative')
+                row = self.db.query_one("SELECT quantidade FROM estoque_itens WHERE id = ?", (item_id,))
+                if row is not None and row['quantidade'] != nova_qtd:
+                    self._aplicar(self.db, {item_id: nova_qtd - row['quantidade']}, 'ajuste', None, agora)
+                    changed = True
+        return changed
+
+    def excluirItem(self, item_id: int) -> bool:
+        """Deactivate an item (the ledger keeps referencing it). Returns False if not found."""
+        with self.db.transaction():
+            cur = self.db.execute("UPDATE estoque_itens SET ativo = 0, updated_at = ? WHERE id = ? AND ativo = 1",
+                                  (_agora(), item_id))
+            if cur.rowcount > 0:
+                BUS.record(self.db, 'estoque_itens', 'update', item_id, ativo=0)
+        return cur.rowcount > 0
+
+    def mostrarItens(self, include_inativos: bool = False) -> List[Dict[str, Any]]:
+        where = "" if include_inativos else " WHERE ativo = 1"
+        rows = self.db.query_all(f"SELECT {', '.join(self.COLUNAS)} FROM estoque_itens{where} ORDER BY nome")
+        return [dict(r) for r in rows]
+
+    def buscar(self, texto: str, limit: int = 30, include_inativos: bool = False) -> List[Dict[str, Any]]:
+        """Items whose name has a word starting with each word of texto, best match first.
+
+        Ignores case and accents; answered from the estoque_itens_fts index.
+        """
+        return search(self.db, 'estoque_itens', texto, self.COLUNAS, limit,
+                      where=None if include_inativos else "t.ativo = 1")
+
+    def obter(self, item_id: int) -> Optional[Dict[str, Any]]:
+        row = self.db.query_one(f"SELECT {', '.join(self.COLUNAS)} FROM estoque_itens WHERE id = ?", (item_id,))
+        return dict(row) if row else None
+
+    def quantidade(self, item_id: int) -> Optional[float]:
+        """Current quantity of item_id (a primary-key lookup), or None if unknown."""
+        row = self.db.query_one("SELECT quantidade FROM estoque_itens WHERE id = ?", (item_id,))
+        return row[0] if row else None
+
+    def itensAbaixoReposicao(self) -> List[Dict[str, Any]]:
+        """Active items below their reorder point, answered from idx_estoque_baixo."""
+        rows = self.db.query_all(
+            f"SELECT {', '.join(self.COLUNAS)} FROM estoque_itens INDEXED BY idx_estoque_baixo "
+            "WHERE ativo = 1 AND quantidade < ponto_reposicao ORDER BY nome"
+        )
+        return [dict(r) for r in rows]
+
+    # --- movements ---
+    def movimentar(self, item_id: int, delta: float, motivo: str = 'ajuste') -> float:
+        """Add delta (negative to consume) to item_id and return the new quantity.
+
+        Raises EstoqueInsuficiente if the quantity would go negative.
+        """
+        with self.db.transaction():
+            self._aplicar(self.db, {item_id: delta}, motivo, None, _agora())
+            return self.quantidade(item_id)
+
+    def movimentos(self, item_id: int, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.db.query_all(
+            "SELECT id, item_id, delta, motivo, pedido_id, criado_em FROM estoque_movimentos "
+            "WHERE item_id = ? ORDER BY id DESC LIMIT ?",
+            (item_id, int(limit)),
+        )
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def _registrar_movimentos(db: DBProxy, movimentos: List[Tuple[int, float, str, Optional[int]]], agora: str) -> None:
+        db.executemany(
+            "INSERT INTO estoque_movimentos (item_id, delta, motivo, pedido_id, criado_em) VALUES (?, ?, ?, ?, ?)",
+            [m + (agora,) for m in movimentos],
+            commit=False,
+        )
+
+    @classmethod
+    def _aplicar(cls, db: DBProxy, deltas: Dict[int, float], motivo: str, pedido_id: Optional[int],
+                 agora: str) -> None:
+        """Apply deltas and their ledger rows; all or nothing (caller owns the transaction).
+
+        The guard ``quantidade >= ?`` makes the check and the decrement one
+        statement, so concurrent closes cannot both take the last unit.
+        """
+        if not deltas:
+            return
+        try:
+            with db.transaction():
+                cur = db.executemany(
+                    "UPDATE estoque_itens SET quantidade = round(quantidade + ?, 6), updated_at = ? "
+                    "WHERE id = ? AND quantidade >= ?",
+                    [(d, agora, item_id, max(-d, 0)) for item_id, d in deltas.items()],
+                    commit=False,
+                )
+                if cur.rowcount != len(deltas):
+                    raise EstoqueInsuficiente({})
+                cls._registrar_movimentos(db, [(i, d, motivo, pedido_id) for i, d in deltas.items()], agora)
+                for item_id, d in deltas.items():
+                    BUS.record(db, 'estoque_itens', 'update', item_id, delta=d)
+        except EstoqueInsuficiente:
+            # the savepoint was rolled back, so these are the quantities before this call
+            marks = ','.join('?' * len(deltas))
+            atuais = {r['id']: r for r in db.query_all(
+                f"SELECT id, nome, quantidade FROM estoque_itens WHERE id IN ({marks})", list(deltas))}
+            faltas = {}
+            for item_id, d in deltas.items():
+                r = atuais.get(item_id)
+                disponivel = r['quantidade'] if r else 0
+                if r is None or disponivel + d < 0:
+                    faltas[item_id] = {'nome': r['nome'] if r else f'item {item_id}',
+                                       'disponivel': disponivel, 'necessario': -d}
+            raise EstoqueInsuficiente(faltas) from None
+
+    # --- recipes and orders ---
+    def definirReceita(self, produto_id: int, ingredientes: Iterable[Tuple[int, float]]) -> None:
+        """Replace the recipe of produto_id with (item_id, quantidade) lines."""
+        linhas = [(produto_id, item_id, qtd) for item_id, qtd in ingredientes]
+        with self.db.transaction():
+            self.db.execute("DELETE FROM produto_ingredientes WHERE produto_id = ?", (produto_id,))
+            self.db.executemany(
+                "INSERT INTO produto_ingredientes (produto_id, item_id, quantidade) VALUES (?, ?, ?)",
+                linhas, commit=False,
+            )
+
+    def receita(self, produto_id: int) -> List[Dict[str, Any]]:
+        rows = self.db.query_all(
+            "SELECT item_id, quantidade FROM produto_ingredientes WHERE produto_id = ?", (produto_id,))
+        return [dict(r) for r in rows]
+
+    def baixarPedido(self, db: DBProxy, pedido: 'Pedido') -> None:
+        """Decrement the ingredients of every item of pedido (a Pedidos close hook)."""
+        por_produto: Dict[int, float] = {}
+        for item in pedido.itens:
+            if item.produto_id is not None:
+                por_produto[item.produto_id] = por_produto.get(item.produto_id, 0) + item.quantidade
+        if not por_produto:
+            return
+        marks = ','.join('?' * len(por_produto))
+        deltas: Dict[int, float] = {}
+        for r in db.query_all(
+                f"SELECT produto_id, item_id, quantidade FROM produto_ingredientes WHERE produto_id IN ({marks})",
+                list(por_produto)):
+            deltas[r['item_id']] = deltas.get(r['item_id'], 0) - r['quantidade'] * por_produto[r['produto_id']]
+        # fractional units (0.2 l) would otherwise drift as they accumulate
+        deltas = {i: round(d, 6) for i, d in deltas.items()}
+        self._aplicar(db, deltas, 'pedido', pedido.id, _agora())
+
+    def registrar(self, pedidos: 'Pedidos') -> None:
+        """Decrement stock inside every pedidos.fecharPedido transaction."""
+        pedidos.add_close_hook(self.baixarPedido)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+__all__ = ['Estoque', 'EstoqueInsuficiente']
@@ -0,0 +1,86 @@
+"""Ranked prefix search over the FTS5 indexes created by Migrations.
+
+``usuarios``, ``produtos`` and ``estoque_itens`` each have a ``<table>_fts``
+index of their name columns, maintained by triggers, so every write path
+(repositories, bulk imports, other tills) keeps it current. Matching ignores
+case and accents ("joao" finds "João", "acai" finds "Açaí"), every word of
+the query must be the start of a word of the row, and results come best
+match first (bm25; newest first when a short prefix matches too many rows
+to rank within a few milliseconds):
+
+    search(db, 'usuarios', 'jo sil', ['id', 'nome', 'sobrenome'], limit=20)
+
+To index another table, add ``_fts_index(table, columns)`` to a new
+migration and add the table to TABLES.
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional, Any, Dict, List, Sequence
+
+from DBProxy import _ident
+
+# indexed columns of each table, in index order
+TABLES: Dict[str, Sequence[str]] = {
+    'usuarios': ('nome', 'sobrenome', 'nome_usuario'),
+    'produtos': ('nome', 'categoria'),
+    'estoque_itens': ('nome',),
+}
+
+# up to this many matches are ranked by bm25; beyond it, newest first
+RANK_LIMIT = 500
+
+# what the unicode61 tokenizer treats as a word
+_WORD = re.compile(r'\w+')
+
+
+def match_expression(text: str) -> Optional[str]:
+    """FTS5 query matching rows with a word starting with each word of text.
+
+    Each word is quoted, so user input can never be read as FTS5 syntax
+    (AND, NEAR, column filters, ...). Returns None when text has no words.
+    """
+    words = _WORD.findall(text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def search(db, table: str, text: str, columns: Sequence[str], limit: int = 20, *,
+           where: Optional[str] = None, params: Sequence[Any] = (),
+           weights: Optional[Sequence[float]] = None, rank_limit: int = RANK_LIMIT) -> List[Dict[str, Any]]:
+    """Rows of table matching text, best first, as dicts of columns.
+
+    where/params filter the table's rows, aliased t (e.g. ``"t.ativo = 1"``;
+    written by the caller, never user input); weights give each indexed column's
+    importance for the ranking (default: all equal).
+
+    bm25 has to score every match: when more than rank_limit rows match
+    (a letter or two typed on a large table) the newest matches come first
+    instead, read straight off the index in rowid order.
+    """
+    if table not in TABLES:
+        raise ValueError(f'no search index for {table!r}')
+    query = match_expression(text)
+    if query is None:
+        return []
+    fts = f'{table}_fts'
+    probe = db.query_all(f"SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT ?",
+                         (query, rank_limit + 1))
+    if not probe:
+        return []
+    if len(probe) > rank_limit:
+        order = f'{fts}.rowid DESC'
+    elif weights:
+        order = f"bm25({fts}, {', '.join(str(float(w)) for w in weights)}), t.id DESC"
+    else:
+        order = f'bm25({fts}), t.id DESC'
+    sql = (f"SELECT {', '.join('t.' + _ident(c) for c in columns)} FROM {fts} "
+           f"JOIN {_ident(table)} AS t ON t.id = {fts}.rowid WHERE {fts} MATCH ?")
+    if where:
+        sql += f" AND ({where})"
+    sql += f" ORDER BY {order} LIMIT ?"
+    return [dict(r) for r in db.query_all(sql, [query, *params, int(limit)])]
+
+
+__all__ = ['search', 'match_expression', 'TABLES']
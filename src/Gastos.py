@@ -1,2 +1,360 @@
+"""Expenses and bills to pay (cadastrarGasto, AtualizarGasto, excluirGasto, consultarGastos, somarGastos).
+
+Expenses live in ``gastos``; period listings are answered from the covering
+index ``idx_gastos_periodo (data, categoria, valor_centavos)``.
+
+``somarGastos`` is served from in-memory prefix sums: a Fenwick tree of daily
+totals per category, built on first use from one index-only aggregate query
+and updated in O(log n) by this object's own writes. Triggers bump a change
+counter (``versoes``) on every write to an amount, from any connection or
+process; when it moved past what the trees have seen, they are rebuilt before
+answering. Any period total therefore costs a counter lookup and two prefix
+lookups, however many years of history exist.
+
+Recurring bills (rent, suppliers) are rules in ``gastos_recorrentes``. They
+are not pre-generated: every query first materializes the occurrences due up
+to the end of the requested period (``gerado_ate`` remembers how far each rule
+went) as unpaid rows, which are the "contas a pagar" until ``marcarPago``.
+
+Every change is mirrored into Controle's balance rollups, and recorded on
+the ChangeBus ('gastos'), in the same transaction.
+"""
+from __future__ import annotations
+
+import calendar
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+from ChangeBus import BUS
+from Migrations import ensure_schema
+from RemoteDBProxy import open_db
+from Controle import Controle
+
+Dia = Union[str, date]
+
+
+def _dia(d: Dia) -> date:
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class _Fenwick:
+    """Binary indexed tree: point add and prefix sum in O(log n)."""
+
+    __slots__ = ('tree',)
+
+    def __init__(self, n: int):
+        self.tree = [0] * (n + 1)
+
+    def add(self, i: int, v: int) -> None:
+        i += 1
+        n = len(self.tree)
+        while i < n:
+            self.tree[i] += v
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        """Sum of positions 0..i (inclusive); negative i gives 0."""
+        i = min(i + 1, len(self.tree) - 1)
+        s = 0
+        while i > 0:
+            s += self.tree[i]
+            i -= i & -i
+        return s
+
+
+class _SomasDiarias:
+    """Fenwick trees over day offsets, one per category plus the overall total."""
+
+    # room after the last known day, so new expenses rarely force a rebuild
+    FOLGA_DIAS = 3660
+
+    def __init__(self, base: date, ultimo: date):
+        self.base = base
+        self.n = (ultimo - base).days + 1 + self.FOLGA_DIAS
+        self.total = _Fenwick(self.n)
+        self.por_categoria: Dict[str, _Fenwick] = {}
+
+    def cabe(self, d: date) -> bool:
+        return 0 <= (d - self.base).days < self.n
+
+    def add(self, d: date, categoria: str, valor: int) -> None:
+        i = (d - self.base).days
+        self.total.add(i, valor)
+        arvore = self.por_categoria.get(categoria)
+        if arvore is None:
+            arvore = self.por_categoria[categoria] = _Fenwick(self.n)
+        arvore.add(i, valor)
+
+    def soma(self, inicio: date, fim: date, categoria: Optional[str] = None) -> int:
+        arvore = self.total if categoria is None else self.por_categoria.get(categoria)
+        if arvore is None:
+            return 0
+        return arvore.prefix((fim - self.base).days) - arvore.prefix((inicio - self.base).days - 1)
+
+
 class Gastos:
-    pass    
\ No newline at end of file
+    """Expense manager backed by SysDB.
+
+    Usage:
+        gastos = Gastos()
+        gastos.cadastrarGasto('2024-03-05', 'fornecedor', 125000, 'Café em grão')
+        gastos.cadastrarRecorrente('Aluguel', 'aluguel', 350000, dia=10)
+        gastos.somarGastos('2024-01-01', '2024-12-31')
+    """
+
+    COLUNAS = ('id', 'data', 'categoria', 'descricao', 'valor_centavos', 'pago', 'recorrente_id',
+               'created_at', 'updated_at')
+
+    def __init__(self, db_path: str = "data/SysDB.db", *, controle: Optional[Controle] = None):
+        self.db = open_db(db_path)
+        ensure_schema(self.db)
+        self.controle = controle or Controle(db_path)
+        hoje = date.today()
+        self.periodo: Tuple[date, date] = (hoje.replace(day=1), hoje)
+        self._lock = threading.RLock()
+        self._somas: Optional[_SomasDiarias] = None
+        # value of the versoes counter the trees reflect
+        self._versao_somas = -1
+
+    # --- prefix sums ---
+    def _versao(self) -> int:
+        return self.db.query_one("SELECT versao FROM versoes WHERE tabela = 'gastos'")[0]
+
+    def _somas_atuais(self) -> _SomasDiarias:
+        versao = self._versao()
+        with self._lock:
+            if self._somas is None or self._versao_somas != versao:
+                self._versao_somas, self._somas = self._carregar_somas()
+            return self._somas
+
+    def _carregar_somas(self) -> Tuple[int, _SomasDiarias]:
+        # one read transaction: the counter and the totals come from the same snapshot
+        with self.db.transaction():
+            versao = self._versao()
+            rows = self.db.query_all(
+                "SELECT data, categoria, SUM(valor_centavos) FROM gastos GROUP BY data, categoria")
+        dias = [_dia(r[0]) for r in rows]
+        hoje = date.today()
+        somas = _SomasDiarias(min(dias + [hoje]), max(dias + [hoje]))
+        for d, r in zip(dias, rows):
+            somas.add(d, r[1], r[2])
+        return versao, somas
+
+    @contextmanager
+    def _alterando(self):
+        """Transaction for our own writes; yields a list of (dia, categoria, delta) to apply to the trees.
+
+        The deltas are applied once the transaction commits, and only if no
+        other change landed since the trees were built; otherwise the next
+        query rebuilds them.
+        """
+        deltas: List[Tuple[date, str, int]] = []
+        with self.db.transaction():
+            antes = self._versao()
+            yield deltas
+            depois = self._versao()
+            if depois != antes:
+                self.db.after_commit(lambda: self._somas_aplicar(antes, depois, deltas))
+
+    def _somas_aplicar(self, antes: int, depois: int, deltas: List[Tuple[date, str, int]]) -> None:
+        with self._lock:
+            if self._somas is None:
+                return
+            if self._versao_somas != antes or not all(self._somas.cabe(d) for d, _, _ in deltas):
+                self._somas = None
+                return
+            for d, categoria, valor in deltas:
+                self._somas.add(d, categoria, valor)
+            self._versao_somas = depois
+
+    # --- recurring bills ---
+    @staticmethod
+    def _vencimentos(dia: int, de: date, ate: date):
+        """Due dates of a monthly bill on day dia (clamped to month length) within [de, ate]."""
+        ano, mes = de.year, de.month
+        while True:
+            venc = date(ano, mes, min(dia, calendar.monthrange(ano, mes)[1]))
+            if venc > ate:
+                return
+            if venc >= de:
+                yield venc
+            ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+    def _materializar(self, ate: date) -> int:
+        """Insert the occurrences of recurring bills due up to ate; return how many were added."""
+        regras = self.db.query_all(
+            "SELECT id, descricao, categoria, valor_centavos, dia, inicio, fim, gerado_ate FROM gastos_recorrentes "
+            "WHERE ativo = 1 AND (gerado_ate IS NULL OR gerado_ate < ?) AND inicio <= ?",
+            (ate.isoformat(), ate.isoformat()))
+        if not regras:
+            return 0
+        agora = _agora()
+        with self._alterando() as novos:
+            for r in regras:
+                de = _dia(r['gerado_ate']) + timedelta(days=1) if r['gerado_ate'] else _dia(r['inicio'])
+                limite = min(ate, _dia(r['fim'])) if r['fim'] else ate
+                for venc in self._vencimentos(r['dia'], de, limite):
+                    cur = self.db.execute(
+                        "INSERT OR IGNORE INTO gastos (data, categoria, descricao, valor_centavos, pago, recorrente_id, "
+                        "created_at) VALUES (?, ?, ?, ?, 0, ?, ?)",
+                        (venc.isoformat(), r['categoria'], r['descricao'], r['valor_centavos'], r['id'], agora),
+                    )
+                    if cur.rowcount:
+                        self.controle.lancarGasto(venc, r['valor_centavos'], db=self.db)
+                        BUS.record(self.db, 'gastos', 'insert', cur.lastrowid)
+                        novos.append((venc, r['categoria'], r['valor_centavos']))
+                self.db.execute("UPDATE gastos_recorrentes SET gerado_ate = ? WHERE id = ?",
+                                (max(limite, de - timedelta(days=1)).isoformat(), r['id']))
+        return len(novos)
+
+    def cadastrarRecorrente(self, descricao: str, categoria: str, valor_centavos: int, dia: int,
+                            inicio: Optional[Dia] = None, fim: Optional[Dia] = None) -> int:
+        """Register a monthly bill due on day dia (1-31) from inicio (default: today)."""
+        if not descricao or not categoria:
+            raise ValueError('descricao and categoria are required')
+        if not 1 <= int(dia) <= 31:
+            raise ValueError('dia must be between 1 and 31')
+        cur = self.db.execute(
+            "INSERT INTO gastos_recorrentes (descricao, categoria, valor_centavos, dia, inicio, fim, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (descricao, categoria, int(valor_centavos), int(dia), _dia(inicio or date.today()).isoformat(),
+             _dia(fim).isoformat() if fim else None, _agora()),
+            commit=True,
+        )
+        return cur.lastrowid
+
+    def encerrarRecorrente(self, recorrente_id: int, fim: Optional[Dia] = None) -> bool:
+        """Stop generating a bill after fim (default: today); already generated rows are kept."""
+        cur = self.db.execute("UPDATE gastos_recorrentes SET fim = ?, updated_at = ? WHERE id = ?",
+                              (_dia(fim or date.today()).isoformat(), _agora(), recorrente_id), commit=True)
+        return cur.rowcount > 0
+
+    def listarRecorrentes(self) -> List[Dict[str, Any]]:
+        return [dict(r) for r in self.db.query_all("SELECT * FROM gastos_recorrentes WHERE ativo = 1 ORDER BY dia")]
+
+    # --- expenses ---
+    def cadastrarGasto(self, data: Dia, categoria: str, valor_centavos: int, descricao: Optional[str] = None,
+                       pago: bool = True) -> int:
+        """Record an expense and return its id."""
+        if not categoria:
+            raise ValueError('categoria is required')
+        d, valor = _dia(data), int(valor_centavos)
+        with self._alterando() as deltas:
+            cur = self.db.execute(
+                "INSERT INTO gastos (data, categoria, descricao, valor_centavos, pago, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (d.isoformat(), categoria, descricao, valor, 1 if pago else 0, _agora()),
+            )
+            self.controle.lancarGasto(d, valor, db=self.db)
+            BUS.record(self.db, 'gastos', 'insert', cur.lastrowid)
+            deltas.append((d, categoria, valor))
+        return cur.lastrowid
+
+    def AtualizarGasto(self, gasto_id: int, **fields) -> bool:
+        """Update fields for gasto_id. Allowed: data, categoria, descricao, valor_centavos, pago
+
+        Returns True when a row was changed, False otherwise.
+        """
+        allowed = {'data', 'categoria', 'descricao', 'valor_centavos', 'pago'}
+        fields = {k: v for k, v in fields.items() if k in allowed}
+        if not fields:
+            return False
+        if 'data' in fields:
+            fields['data'] = _dia(fields['data']).isoformat()
+        with self._alterando() as deltas:
+            antigo = self.db.query_one("SELECT data, categoria, valor_centavos FROM gastos WHERE id = ?", (gasto_id,))
+            if antigo is None:
+                return False
+            sets = ', '.join(f"{k} = ?" for k in fields)
+            self.db.execute(f"UPDATE gastos SET {sets}, updated_at = ? WHERE id = ?",
+                            list(fields.values()) + [_agora(), gasto_id])
+            novo = (_dia(fields.get('data', antigo['data'])), fields.get('categoria', antigo['categoria']),
+                    int(fields.get('valor_centavos', antigo['valor_centavos'])))
+            velho = (_dia(antigo['data']), antigo['categoria'], antigo['valor_centavos'])
+            if novo != velho:
+                self.controle.lancarGasto(velho[0], -velho[2], db=self.db)
+                self.controle.lancarGasto(novo[0], novo[2], db=self.db)
+                deltas += [(velho[0], velho[1], -velho[2]), novo]
+            BUS.record(self.db, 'gastos', 'update', gasto_id)
+        return True
+
+    def excluirGasto(self, gasto_id: int) -> bool:
+        """Permanently remove an expense. Returns False if not found."""
+        with self._alterando() as deltas:
+            antigo = self.db.query_one("SELECT data, categoria, valor_centavos FROM gastos WHERE id = ?", (gasto_id,))
+            if antigo is None:
+                return False
+            self.db.execute("DELETE FROM gastos WHERE id = ?", (gasto_id,))
+            self.controle.lancarGasto(antigo['data'], -antigo['valor_centavos'], db=self.db)
+            BUS.record(self.db, 'gastos', 'delete', gasto_id)
+            deltas.append((_dia(antigo['data']), antigo['categoria'], -antigo['valor_centavos']))
+        return True
+
+    def marcarPago(self, gasto_id: int, pago: bool = True) -> bool:
+        return self.AtualizarGasto(gasto_id, pago=1 if pago else 0)
+
+    # --- period queries ---
+    def selecionarPeriodo(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None) -> Tuple[date, date]:
+        """Set the period used by queries when none is given (default: the current month)."""
+        hoje = date.today()
+        ini = _dia(inicio) if inicio is not None else hoje.replace(day=1)
+        end = _dia(fim) if fim is not None else hoje
+        if end < ini:
+            raise ValueError('fim must not be before inicio')
+        self.periodo = (ini, end)
+        self._materializar(end)
+        return self.periodo
+
+    def _periodo(self, inicio: Optional[Dia], fim: Optional[Dia]) -> Tuple[date, date]:
+        ini = _dia(inicio) if inicio is not None else self.periodo[0]
+        end = _dia(fim) if fim is not None else self.periodo[1]
+        self._materializar(end)
+        return ini, end
+
+    def consultarGastos(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None,
+                        categoria: Optional[str] = None, *, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Expenses in the period (default: the selected one), oldest first."""
+        ini, end = self._periodo(inicio, fim)
+        sql = f"SELECT {', '.join(self.COLUNAS)} FROM gastos WHERE data BETWEEN ? AND ?"
+        params: List[Any] = [ini.isoformat(), end.isoformat()]
+        if categoria is not None:
+            sql += " AND categoria = ?"
+            params.append(categoria)
+        sql += " ORDER BY data, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(r) for r in self.db.query_all(sql, params)]
+
+    def somarGastos(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None,
+                    categoria: Optional[str] = None) -> int:
+        """Total in cents for the period (and category), from the prefix sums."""
+        ini, end = self._periodo(inicio, fim)
+        return self._somas_atuais().soma(ini, end, categoria)
+
+    def somarPorCategoria(self, inicio: Optional[Dia] = None, fim: Optional[Dia] = None) -> Dict[str, int]:
+        ini, end = self._periodo(inicio, fim)
+        somas = self._somas_atuais()
+        totais = {c: somas.soma(ini, end, c) for c in somas.por_categoria}
+        return {c: v for c, v in sorted(totais.items()) if v}
+
+    def contasAPagar(self, ate: Optional[Dia] = None) -> List[Dict[str, Any]]:
+        """Unpaid bills due up to ate (default: 30 days from today), oldest first."""
+        limite = _dia(ate) if ate is not None else date.today() + timedelta(days=30)
+        self._materializar(limite)
+        rows = self.db.query_all(
+            f"SELECT {', '.join(self.COLUNAS)} FROM gastos WHERE pago = 0 AND data <= ? ORDER BY data, id",
+            (limite.isoformat(),))
+        return [dict(r) for r in rows]
+
+    def close(self) -> None:
+        self.db.close()
+
+
+__all__ = ['Gastos']
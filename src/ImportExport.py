@@ -0,0 +1,515 @@
+"""Streaming import and export of SysDB tables as CSV or JSON Lines.
+
+Every stage is a generator, so memory stays flat however big the file is:
+
+    read_records -> validate/convert -> hash passwords -> chunks -> executemany
+
+Each chunk is inserted with one ``executemany`` in its own transaction, and
+recorded on the ChangeBus as a bulk insert, so open screens reload once per
+chunk. Rows that fail validation or hit a constraint are counted and reported
+(``ImportResult.errors``, by line) instead of aborting the import, unless
+on_error='abort'. Chunks committed before an abort stay committed.
+
+Plain-text passwords are hashed by the PasswordHasher's worker processes
+one chunk ahead of the inserts; values that already are stored hashes
+(``$pbkdf2-sha256$...``, ``$scrypt$...``, e.g. from ``export_usuarios(...,
+include_senha=True)``) are kept as they are.
+
+Files ending in .gz are (de)compressed on the fly; the format comes from the
+extension (.csv, .jsonl / .ndjson) unless given. In CSV an empty field is NULL.
+
+    python src/ImportExport.py import usuarios novos.csv
+    python src/ImportExport.py export gastos gastos_2024.csv --where "data >= '2024-01-01'"
+
+Usage:
+    res = import_usuarios('novos.csv', progress=lambda p: print(p.rows, p.bytes_done))
+    export_table('data/SysDB.db', 'pedidos', 'pedidos.jsonl.gz')
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from itertools import chain, islice
+from typing import Optional, Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+from AuthUtils import parse_hash
+from ChangeBus import BUS
+from DBProxy import _ident
+from Migrations import ensure_schema
+from PasswordHasher import PasswordHasher, default_hasher
+from RemoteDBProxy import open_db
+from Usuario import Usuario
+
+FORMATS = ('csv', 'jsonl')
+
+# tables import_table/export_table accept, with the key exports are paged by
+TABLES: Dict[str, str] = {
+    'produtos': 'id',
+    'pedidos': 'id',
+    'pedido_itens': 'id',
+    'estoque_itens': 'id',
+    'estoque_movimentos': 'id',
+    'gastos': 'id',
+    'gastos_recorrentes': 'id',
+    'balanco_diario': 'dia',
+    'balanco_mensal': 'mes',
+}
+
+# the balance rollups are derived from these; importing them rebuilds the rollups
+_ROLLUP_SOURCES = {'pedidos', 'gastos'}
+
+
+class Progress(NamedTuple):
+    """Passed to progress callbacks after every chunk (bytes_* are None for exports)."""
+    rows: int
+    written: int
+    rejected: int
+    bytes_done: Optional[int]
+    bytes_total: Optional[int]
+    seconds: float
+
+
+class ImportResult(NamedTuple):
+    rows: int
+    inserted: int
+    rejected: int
+    errors: List[Tuple[int, str]]     # (line, message), at most max_errors of them
+    seconds: float
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+# --- files ---
+def detect_format(path: str, formato: Optional[str] = None) -> str:
+    if formato:
+        if formato not in FORMATS:
+            raise ValueError(f'unknown format: {formato!r} (use one of {FORMATS})')
+        return formato
+    name = path[:-3] if path.endswith('.gz') else path
+    ext = os.path.splitext(name)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f'cannot tell the format of {path!r}; pass formato')
+
+
+class _Source:
+    """Records of a CSV/JSONL file, with how many bytes of it were consumed."""
+
+    def __init__(self, path: str, formato: Optional[str] = None):
+        self.path = path
+        self.formato = detect_format(path, formato)
+        self.bytes_total = os.path.getsize(path)
+        self._raw = open(path, 'rb')
+        stream = gzip.GzipFile(fileobj=self._raw, mode='rb') if path.endswith('.gz') else self._raw
+        # utf-8-sig: spreadsheets often save CSV with a BOM
+        self._text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    @property
+    def bytes_done(self) -> int:
+        return self._raw.tell()
+
+    def records(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (line number, record); CSV fields come back as str, '' as None."""
+        if self.formato == 'csv':
+            reader = csv.DictReader(self._text)
+            for rec in reader:
+                yield reader.line_num, {k: (v if v != '' else None) for k, v in rec.items() if k is not None}
+            return
+        for line_no, line in enumerate(self._text, 1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as exc:
+                rec = _BadRecord(f'invalid JSON: {exc}')
+            yield line_no, rec
+
+    def close(self) -> None:
+        self._text.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _BadRecord(dict):
+    """Placeholder for a line that could not be parsed; validation rejects it."""
+
+    def __init__(self, error: str):
+        super().__init__()
+        self.error = error
+
+
+def read_records(path: str, formato: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a CSV or JSONL file one at a time."""
+    with _Source(path, formato) as src:
+        for _, rec in src.records():
+            yield rec
+
+
+def write_records(path: str, records: Iterable[Dict[str, Any]], columns: Sequence[str],
+                  formato: Optional[str] = None, *, progress: Optional[ProgressCallback] = None,
+                  progress_every: int = 10_000) -> int:
+    """Write records (dicts) to a CSV or JSONL file and return how many were written."""
+    formato = detect_format(path, formato)
+    t0 = time.perf_counter()
+    n = 0
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8', newline='') as out:
+        if formato == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            emit = lambda rec: writer.writerow(['' if rec.get(c) is None else rec.get(c) for c in columns])
+        else:
+            dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+            emit = lambda rec: out.write(dumps({c: rec.get(c) for c in columns}) + '\n')
+        for rec in records:
+            emit(rec)
+            n += 1
+            if progress is not None and n % progress_every == 0:
+                progress(Progress(n, n, 0, None, None, time.perf_counter() - t0))
+    if progress is not None:
+        progress(Progress(n, n, 0, None, None, time.perf_counter() - t0))
+    return n
+
+
+# --- the import pipeline ---
+class _Rejected(Exception):
+    pass
+
+
+def _is_stored_hash(value: str) -> bool:
+    if not value.startswith('$'):
+        return False
+    try:
+        parse_hash(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _chunks(it: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Importer:
+    """Shared state of one import: counters, error log and progress reporting."""
+
+    def __init__(self, src: _Source, progress: Optional[ProgressCallback], max_errors: int, on_error: str):
+        if on_error not in ('skip', 'abort'):
+            raise ValueError("on_error must be 'skip' or 'abort'")
+        self.src = src
+        self.progress = progress
+        self.max_errors = max_errors
+        self.on_error = on_error
+        self.rows = self.inserted = self.rejected = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.t0 = time.perf_counter()
+
+    def reject(self, line: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+        if self.on_error == 'abort':
+            raise ValueError(f'line {line}: {message}')
+
+    def validated(self, records: Iterable[Tuple[int, Dict[str, Any]]],
+                  convert: Callable[[Dict[str, Any]], Tuple]) -> Iterator[Tuple[int, Tuple]]:
+        """Stage 2: (line, converted row) for every record convert() accepts."""
+        for line, rec in records:
+            self.rows += 1
+            if isinstance(rec, _BadRecord):
+                self.reject(line, rec.error)
+                continue
+            try:
+                yield line, convert(rec)
+            except (_Rejected, ValueError, TypeError, KeyError) as exc:
+                self.reject(line, str(exc))
+
+    def insert(self, db, sql: str, chunk: List[Tuple[int, Tuple]], table: str) -> None:
+        """Last stage: one executemany in one transaction; a bad row only costs its own line."""
+        try:
+            with db.transaction():
+                db.executemany(sql, [row for _, row in chunk], commit=False)
+                BUS.record(db, table, 'insert', None, count=len(chunk))
+            self.inserted += len(chunk)
+        except sqlite3.IntegrityError:
+            # rare: find the offending rows one by one, keep the rest
+            with db.transaction():
+                ok = 0
+                for line, row in chunk:
+                    try:
+                        with db.transaction():
+                            db.execute(sql, row)
+                        ok += 1
+                    except sqlite3.IntegrityError as exc:
+                        self.reject(line, str(exc))
+                if ok:
+                    BUS.record(db, table, 'insert', None, count=ok)
+            self.inserted += ok
+        self.report()
+
+    def report(self) -> None:
+        if self.progress is not None:
+            self.progress(Progress(self.rows, self.inserted, self.rejected, self.src.bytes_done,
+                                   self.src.bytes_total, time.perf_counter() - self.t0))
+
+    def result(self) -> ImportResult:
+        return ImportResult(self.rows, self.inserted, self.rejected, self.errors, time.perf_counter() - self.t0)
+
+
+_USUARIO_COLS = ('nome', 'sobrenome', 'cpf', 'nome_usuario', 'senha', 'data_admissao', 'tipo_acesso', 'ativo',
+                 'created_at')
+_TIPOS_ACESSO = {None: None, 'admin': 'admin', 'atend': 'atend', 'Administrador': 'admin', 'Funcionário': 'atend'}
+
+
+def _usuario_row(rec: Dict[str, Any]) -> Tuple:
+    """Validate one user record into the insert tuple (senha still as given)."""
+    missing = [c for c in ('nome', 'sobrenome', 'cpf', 'nome_usuario', 'senha') if rec.get(c) in (None, '')]
+    if missing:
+        raise _Rejected(f"missing {', '.join(missing)}")
+    cpf = ''.join(ch for ch in str(rec['cpf']) if ch.isdigit())
+    if not cpf:
+        raise _Rejected(f"invalid cpf: {rec['cpf']!r}")
+    tipo = rec.get('tipo_acesso')
+    if tipo not in _TIPOS_ACESSO:
+        raise _Rejected(f'invalid tipo_acesso: {tipo!r}')
+    ativo = rec.get('ativo')
+    ativo = 1 if ativo is None else int(ativo)
+    return (str(rec['nome']), str(rec['sobrenome']), int(cpf), str(rec['nome_usuario']).strip(), str(rec['senha']),
+            rec.get('data_admissao'), _TIPOS_ACESSO[tipo], ativo,
+            rec.get('created_at') or time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def _hashed(chunks: Iterator[List[Tuple[int, Tuple]]], hasher: PasswordHasher,
+            lookahead: int) -> Iterator[List[Tuple[int, Tuple]]]:
+    """Stage 3: replace plain passwords by hashes, keeping lookahead chunks in the pool."""
+    pending: deque = deque()
+
+    def start(chunk):
+        plain = [i for i, (_, row) in enumerate(chunk) if not _is_stored_hash(row[4])]
+        return chunk, plain, hasher.submit_many(chunk[i][1][4] for i in plain)
+
+    def finish(chunk, plain, futures):
+        for i, fut in zip(plain, futures):
+            line, row = chunk[i]
+            chunk[i] = (line, row[:4] + (fut.result(),) + row[5:])
+        return chunk
+
+    for chunk in chunks:
+        pending.append(start(chunk))
+        if len(pending) > lookahead:
+            yield finish(*pending.popleft())
+    while pending:
+        yield finish(*pending.popleft())
+
+
+def import_usuarios(path: str, db_path: str = "data/SysDB.db", *, formato: Optional[str] = None,
+                    hasher: Optional[PasswordHasher] = None, chunk_size: int = 5000, lookahead: int = 1,
+                    on_error: str = 'skip', max_errors: int = 100,
+                    progress: Optional[ProgressCallback] = None) -> ImportResult:
+    """Import users from a CSV/JSONL file with the columns of ``Usuario.adicionar``.
+
+    Required: nome, sobrenome, cpf, nome_usuario, senha. Optional:
+    data_admissao, tipo_acesso ('admin'/'atend' or the screen's labels),
+    ativo, created_at. Duplicated nome_usuario/cpf are rejected by line.
+    """
+    repo = Usuario(db_path)
+    db = repo.db
+    sql = f"INSERT INTO usuarios ({', '.join(_USUARIO_COLS)}) VALUES ({', '.join('?' * len(_USUARIO_COLS))})"
+    with _Source(path, formato) as src:
+        imp = _Importer(src, progress, max_errors, on_error)
+        rows = imp.validated(src.records(), _usuario_row)
+        for chunk in _hashed(_chunks(rows, chunk_size), hasher or default_hasher(), lookahead):
+            imp.insert(db, sql, chunk, 'usuarios')
+        return imp.result()
+
+
+def export_usuarios(path: str, db_path: str = "data/SysDB.db", *, formato: Optional[str] = None,
+                    include_inativos: bool = True, include_senha: bool = False, page_size: int = 5000,
+                    progress: Optional[ProgressCallback] = None) -> int:
+    """Write every user (newest first) to path; password hashes only with include_senha=True."""
+    repo = Usuario(db_path)
+    cols = list(repo.COLUNAS if include_senha else repo.COLUNAS_PUBLICAS)
+    rows = repo.iterar(include_inativos, colunas=cols, page_size=page_size)
+    return write_records(path, rows, cols, formato, progress=progress)
+
+
+# --- any transactional table ---
+def _table_info(db, table: str) -> List[Dict[str, Any]]:
+    if table not in TABLES:
+        raise ValueError(f'unsupported table: {table!r} (one of {sorted(TABLES)})')
+    return [dict(r) for r in db.query_all(f"PRAGMA table_info({_ident(table)})")]
+
+
+def _converter(info: Dict[str, Any]) -> Callable[[Any], Any]:
+    decl = (info['type'] or '').upper()
+    if 'INT' in decl:
+        def to_int(v):
+            if isinstance(v, str):
+                v = float(v) if ('.' in v or 'e' in v.lower()) else int(v)
+            if isinstance(v, float):
+                if not v.is_integer():
+                    raise _Rejected(f"{info['name']}: {v!r} is not an integer")
+                v = int(v)
+            return int(v)
+        return to_int
+    if any(t in decl for t in ('REAL', 'FLOA', 'DOUB')):
+        return float
+    return lambda v: v if isinstance(v, str) else json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+
+
+def import_table(table: str, path: str, db_path: str = "data/SysDB.db", *, formato: Optional[str] = None,
+                 chunk_size: int = 5000, on_error: str = 'skip', max_errors: int = 100,
+                 rebuild_rollups: bool = True, progress: Optional[ProgressCallback] = None) -> ImportResult:
+    """Import rows into one of TABLES; the file's columns must be columns of the table.
+
+    Values are converted to the declared column types, and NOT NULL columns
+    without a default are required. Importing pedidos or gastos rebuilds the
+    balance rollups at the end; importing pedidos also moves the order id
+    sequence past the imported ids. Import orders with the tills closed.
+    """
+    db = open_db(db_path)
+    ensure_schema(db)
+    info = {c['name']: c for c in _table_info(db, table)}
+    required = {n for n, c in info.items() if c['notnull'] and c['dflt_value'] is None and not c['pk']}
+
+    with _Source(path, formato) as src:
+        imp = _Importer(src, progress, max_errors, on_error)
+        records = src.records()
+        first = next(records, None)
+        if first is None:
+            return imp.result()
+        cols = [c for c in first[1]] if not isinstance(first[1], _BadRecord) else []
+        unknown = [c for c in cols if c not in info]
+        if unknown or not cols:
+            raise ValueError(f'{path}: columns not in {table}: {unknown}' if unknown else f'{path}: no columns')
+        missing = required - set(cols)
+        if missing:
+            raise ValueError(f'{path}: required columns missing: {sorted(missing)}')
+        convs = [(c, _converter(info[c]), c in required) for c in cols]
+
+        def convert(rec: Dict[str, Any]) -> Tuple:
+            out = []
+            for c, conv, req in convs:
+                v = rec.get(c)
+                if v is None:
+                    if req:
+                        raise _Rejected(f'missing {c}')
+                    out.append(None)
+                else:
+                    out.append(conv(v))
+            return tuple(out)
+
+        sql = f"INSERT INTO {_ident(table)} ({', '.join(_ident(c) for c in cols)}) VALUES ({', '.join('?' * len(cols))})"
+        for chunk in _chunks(imp.validated(chain([first], records), convert), chunk_size):
+            imp.insert(db, sql, chunk, table)
+
+    if imp.inserted:
+        if table == 'pedidos':
+            db.execute("UPDATE sequencias SET proximo = MAX(proximo, (SELECT COALESCE(MAX(id), 0) + 1 FROM pedidos)) "
+                       "WHERE nome = 'pedidos'", commit=True)
+        if rebuild_rollups and table in _ROLLUP_SOURCES:
+            from Controle import Controle
+            Controle(db_path).reconstruir()
+    return imp.result()
+
+
+def export_table(table: str, path: str, db_path: str = "data/SysDB.db", *, formato: Optional[str] = None,
+                 columns: Optional[Sequence[str]] = None, where: Optional[str] = None,
+                 params: Sequence[Any] = (), page_size: int = 5000,
+                 progress: Optional[ProgressCallback] = None) -> int:
+    """Write one of TABLES to path in key order, one keyset page at a time.
+
+    where is an SQL condition written by the caller (never user input),
+    e.g. ``where="data BETWEEN ? AND ?", params=(ini, fim)``.
+    """
+    db = open_db(db_path)
+    ensure_schema(db)
+    names = [c['name'] for c in _table_info(db, table)]
+    cols = list(columns) if columns else names
+    unknown = [c for c in cols if c not in names]
+    if unknown:
+        raise ValueError(f'unknown columns for {table}: {unknown}')
+    key = TABLES[table]
+    fetch = cols if key in cols else [key] + cols
+    base = f"SELECT {', '.join(_ident(c) for c in fetch)} FROM {_ident(table)} WHERE {_ident(key)} > ?"
+    if where:
+        base += f" AND ({where})"
+    base += f" ORDER BY {_ident(key)} LIMIT ?"
+
+    def pages() -> Iterator[Dict[str, Any]]:
+        # below every key: integer keys start at the smallest int64, text keys at ''
+        after: Any = -2 ** 63 if key == 'id' else ''
+        while True:
+            page = db.query_all(base, [after, *params, page_size])
+            if not page:
+                return
+            for r in page:
+                yield dict(r)
+            if len(page) < page_size:
+                return
+            after = page[-1][key]
+
+    return write_records(path, pages(), cols, formato, progress=progress)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='Import or export SysDB tables as CSV / JSON Lines')
+    ap.add_argument('action', choices=('import', 'export'))
+    ap.add_argument('table', choices=['usuarios'] + sorted(TABLES))
+    ap.add_argument('path')
+    ap.add_argument('--db', default='data/SysDB.db')
+    ap.add_argument('--format', choices=FORMATS)
+    ap.add_argument('--where', help='export: SQL condition on the table')
+    ap.add_argument('--include-senha', action='store_true', help='export usuarios with password hashes')
+    ap.add_argument('--abort', action='store_true', help='import: stop at the first bad row')
+    args = ap.parse_args(argv)
+
+    def show(p: Progress) -> None:
+        pct = f' {100 * p.bytes_done / p.bytes_total:5.1f}%' if p.bytes_total else ''
+        print(f'\r{p.rows:>10} rows{pct} {p.rows / max(p.seconds, 1e-9):>9.0f} rows/s', end='', flush=True)
+
+    on_error = 'abort' if args.abort else 'skip'
+    if args.action == 'import':
+        if args.table == 'usuarios':
+            res = import_usuarios(args.path, args.db, formato=args.format, on_error=on_error, progress=show)
+        else:
+            res = import_table(args.table, args.path, args.db, formato=args.format, on_error=on_error, progress=show)
+        print(f'\n{res.inserted} inserted, {res.rejected} rejected in {res.seconds:.1f}s')
+        for line, msg in res.errors:
+            print(f'  line {line}: {msg}')
+        return 1 if res.rejected else 0
+    if args.table == 'usuarios':
+        n = export_usuarios(args.path, args.db, formato=args.format, include_senha=args.include_senha, progress=show)
+    else:
+        n = export_table(args.table, args.path, args.db, formato=args.format, where=args.where, progress=show)
+    print(f'\n{n} rows written')
+    return 0
+
+
+__all__ = ['import_usuarios', 'export_usuarios', 'import_table', 'export_table', 'read_records', 'write_records',
+           'detect_format', 'Progress', 'ImportResult', 'TABLES', 'FORMATS']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -13,15 +13,22 @@ class Login:
       creds = login.show()  # returns (username, password) or None if cancelled
    """
 
-   def __init__(self, parent=None, auth_handler: Optional[Callable[[str, str], object]] = None):
+   def __init__(self, parent=None, auth_handler: Optional[Callable[[str, str], object]] = None, bridge=None):
       self.parent = parent
       self.username = None
       self.password = None
       # userType: True for admin, False for atend, None for not-set/other users
       self.userType = None
+      # userId: usuarios.id of the authenticated user (None for builtin credentials)
+      self.userId = None
+      # retry_after: seconds to wait when the last attempt was rate limited
+      self.retry_after = None
       # auth_handler: callable(username, password) -> AuthResult-like object
       # If not provided, Login will only use its minimal builtin checks
       self.auth_handler = auth_handler
+      # bridge: optional TkBridge; when set, auth_handler runs off the Tk thread
+      # so a slow password hash does not freeze the dialog
+      self.bridge = bridge
 
    def _center(self, win, w=380, h=200):
       win.update_idletasks()
@@ -61,39 +68,72 @@ class Login:
 
       result = {'value': None}
 
+      pending = {'busy': False}
+
+      def apply_result(res, u, p):
+         # Res may be an AuthResult-like object with access_type attribute
+         self.retry_after = getattr(res, 'retry_after', None)
+         if self.retry_after:
+            # throttled: do not fall back to the builtin check either
+            return
+         if getattr(res, 'ok', False):
+            self.userId = (getattr(res, 'user', None) or {}).get('id')
+            at = getattr(res, 'access_type', None)
+            if at == 'admin':
+               self.userType = True
+            elif at == 'atend':
+               self.userType = False
+            else:
+               self.userType = None
+         else:
+            # if handler failed to authenticate, fallback to builtin check
+            self.userCheck(u, p)
+
+      def finish(u, p):
+         # Accept values and return them
+         self.username = u
+         self.password = p
+         result['value'] = (u, p)
+         if root.winfo_exists():
+            root.destroy()
+
       def submit(event=None):
          # event is optional so this can be called from the Enter key binding
+         if pending['busy']:
+            return
          u = user_entry.get().strip()
          p = pass_entry.get()
          # Attempt to authenticate using provided handler (AuthService) if available
+         if self.auth_handler is not None and self.bridge is not None:
+            pending['busy'] = True
+            enter_btn.state(['disabled'])
+            root.config(cursor='watch')
+
+            def done(res):
+               apply_result(res, u, p)
+               finish(u, p)
+
+            def failed(_ex):
+               # any errors from handler should not break UI - fallback to builtin
+               self.userCheck(u, p)
+               finish(u, p)
+
+            self.bridge.call(self.auth_handler, u, p, on_success=done, on_error=failed)
+            return
          if self.auth_handler is not None:
             try:
-               res = self.auth_handler(u, p)
-               # Res may be an AuthResult-like object with access_type attribute
-               if getattr(res, 'ok', False):
-                  at = getattr(res, 'access_type', None)
-                  if at == 'admin':
-                     self.userType = True
-                  elif at == 'atend':
-                     self.userType = False
-                  else:
-                     self.userType = None
-               else:
-                  # if handler failed to authenticate, fallback to builtin check
-                  self.userCheck(u, p)
+               apply_result(self.auth_handler(u, p), u, p)
             except Exception:
                # any errors from handler should not break UI - fallback to builtin
                self.userCheck(u, p)
          else:
             # No handler provided -> use builtin check only
             self.userCheck(u, p)
-         # Accept values and return them
-         self.username = u
-         self.password = p
-         result['value'] = (u, p)
-         root.destroy()
+         finish(u, p)
 
       def cancel():
+         if pending['busy']:
+            return
          result['value'] = None
          root.destroy()
 
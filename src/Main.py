@@ -1,7 +1,20 @@
-from App import App
+import sys
 
+from Startup import STARTUP
 
-def main():
+
+def main(argv=None):
+	argv = sys.argv[1:] if argv is None else argv
+	for arg in argv:
+		if arg == '--startup-report' or arg.startswith('--startup-report='):
+			STARTUP.enable_report(arg.partition('=')[2] or '-')
+	from App import App
+	STARTUP.mark('imports')
+	import os
+	if os.environ.get('SYSDB_METRICS'):
+		from Metrics import install_signal_toggle
+		# kill -USR1 <pid> starts/stops a cProfile + tracemalloc snapshot
+		install_signal_toggle()
 	app = App()
 	app.homeScreen()
 
@@ -1,2 +1,333 @@
+"""Attendant point-of-sale screen (MostrarPedidos).
+
+Everything the attendant touches while building an order stays on the Tk
+thread and in memory: product search goes to the Catalogo trie, and adding an
+item changes one ticket row and the total label. Nothing is written until the
+order is sent. Sending and closing orders run through a TkBridge, so the
+screen never waits on the Pedidos journal or SQLite.
+
+Keyboard:
+    type            search the catalog ("2*lat" adds two of the first match)
+    Up / Down       move in the results
+    Enter           add the selected product to the ticket
+    + / -           change the quantity of the selected ticket line
+    Delete          remove the selected ticket line
+    F2              send the order
+    Esc             clear the search (twice: clear the ticket)
+"""
+from __future__ import annotations
+
+import time
+import tkinter as tk
+from tkinter import messagebox, ttk
+from typing import Optional, Dict, Any, Callable
+
+from Catalogo import Catalogo
+from Pedidos import Pedidos, STATUS_ABERTO
+
+
+def reais(centavos: Optional[int]) -> str:
+    if centavos is None:
+        return ''
+    return f"R$ {centavos / 100:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+
 class MenuFunc:
-    pass    
\ No newline at end of file
+    """POS screen rendered inside an existing frame.
+
+    Usage:
+        MenuFunc(frm, win, pedidos=pedidos, bridge=TkBridge(win)).render()
+    """
+
+    MAX_RESULTADOS = 30
+
+    def __init__(self, frm, win, *, pedidos: Pedidos, bridge, catalogo: Optional[Catalogo] = None,
+                 usuario_id: Optional[int] = None, on_back: Optional[Callable[[], None]] = None):
+        self.frm = frm
+        self.win = win
+        self.pedidos = pedidos
+        self.bridge = bridge
+        self.catalogo = catalogo
+        self.usuario_id = usuario_id
+        self.on_back = on_back
+        # ticket lines: produto_id -> {'produto', 'quantidade'}; the Treeview iid is str(produto_id)
+        self.ticket: Dict[int, Dict[str, Any]] = {}
+        self._resultados: list = []
+        self._enviando = False
+        # UI time of the last add, in ms (kept for diagnostics)
+        self.ultimo_add_ms = 0.0
+
+    # --- layout ---
+    def render(self) -> None:
+        for w in list(self.frm.winfo_children()):
+            w.destroy()
+
+        top = tk.Frame(self.frm)
+        top.pack(fill=tk.X, pady=(0, 8))
+        tk.Label(top, text="Atendimento", font=("Segoe UI", 14, "bold")).pack(side=tk.LEFT)
+        if self.on_back is not None:
+            tk.Button(top, text='Voltar', width=12, command=self.on_back).pack(side=tk.RIGHT)
+        tk.Button(top, text='Pedidos abertos', width=16, command=self.MostrarPedidos).pack(side=tk.RIGHT, padx=6)
+
+        body = tk.Frame(self.frm)
+        body.pack(expand=True, fill=tk.BOTH)
+
+        # left: search and results
+        left = tk.Frame(body)
+        left.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 8))
+        self.busca = tk.Entry(left, font=("Segoe UI", 13))
+        self.busca.pack(fill=tk.X)
+        self.lista = tk.Listbox(left, font=("Segoe UI", 12), activestyle='dotbox', exportselection=False)
+        self.lista.pack(fill=tk.BOTH, expand=True, pady=(6, 0))
+
+        # right: ticket
+        right = tk.Frame(body)
+        right.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        mesa_frm = tk.Frame(right)
+        mesa_frm.pack(fill=tk.X)
+        tk.Label(mesa_frm, text='Mesa').pack(side=tk.LEFT)
+        self.mesa = tk.Entry(mesa_frm, width=8)
+        self.mesa.pack(side=tk.LEFT, padx=6)
+        self.tree = ttk.Treeview(right, columns=('descricao', 'qtd', 'total'), show='headings', selectmode='browse')
+        for c, h, w in (('descricao', 'Produto', 220), ('qtd', 'Qtd', 60), ('total', 'Total', 100)):
+            self.tree.heading(c, text=h, anchor=tk.CENTER)
+            self.tree.column(c, width=w, anchor=tk.CENTER)
+        self.tree.pack(fill=tk.BOTH, expand=True, pady=(6, 0))
+        self.total_lbl = tk.Label(right, text=reais(0), font=("Segoe UI", 16, "bold"))
+        self.total_lbl.pack(anchor=tk.E, pady=6)
+        btns = tk.Frame(right)
+        btns.pack(fill=tk.X)
+        self.enviar_btn = tk.Button(btns, text='Enviar pedido (F2)', width=18, command=self.enviar)
+        self.enviar_btn.pack(side=tk.RIGHT)
+        tk.Button(btns, text='Limpar', width=10, command=self.limpar).pack(side=tk.RIGHT, padx=6)
+        self.status = tk.Label(self.frm, text='', anchor=tk.W, fg='#333333')
+        self.status.pack(fill=tk.X, pady=(6, 0))
+
+        self.busca.bind('<KeyRelease>', self._on_key)
+        self.busca.bind('<Return>', lambda e: self.adicionar_selecionado())
+        self.busca.bind('<Down>', lambda e: self._mover(1))
+        self.busca.bind('<Up>', lambda e: self._mover(-1))
+        self.busca.bind('<Escape>', self._on_escape)
+        self.lista.bind('<Double-Button-1>', lambda e: self.adicionar_selecionado())
+        self.tree.bind('<plus>', lambda e: self._alterar_selecionado(1))
+        self.tree.bind('<KP_Add>', lambda e: self._alterar_selecionado(1))
+        self.tree.bind('<minus>', lambda e: self._alterar_selecionado(-1))
+        self.tree.bind('<KP_Subtract>', lambda e: self._alterar_selecionado(-1))
+        self.tree.bind('<Delete>', lambda e: self._remover_selecionado())
+        self.win.bind('<F2>', lambda e: self.enviar())
+
+        if self.catalogo is None:
+            # first open: load the catalog off the Tk thread
+            self.status.config(text='Carregando catálogo...')
+            self.bridge.call(Catalogo.get, on_success=self._catalogo_pronto,
+                             on_error=lambda ex: self.status.config(text=f'Falha ao carregar catálogo: {ex}'))
+        else:
+            self._catalogo_pronto(self.catalogo)
+        self.busca.focus_set()
+
+    def _catalogo_pronto(self, catalogo: Catalogo) -> None:
+        self.catalogo = catalogo
+        if self.status.winfo_exists():
+            self.status.config(text=f'{len(catalogo)} produtos')
+            self._pesquisar()
+
+    # --- search ---
+    def _consulta(self):
+        """Split "N*texto" into (N, texto)."""
+        texto = self.busca.get()
+        qtd, sep, resto = texto.partition('*')
+        if sep and qtd.strip().isdigit() and int(qtd) > 0:
+            return int(qtd), resto
+        return 1, texto
+
+    def _on_key(self, event) -> None:
+        if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'F2'):
+            return
+        self._pesquisar()
+
+    def _pesquisar(self) -> None:
+        if self.catalogo is None:
+            return
+        _, texto = self._consulta()
+        self._resultados = self.catalogo.buscar(texto, self.MAX_RESULTADOS)
+        self.lista.delete(0, tk.END)
+        if self._resultados:
+            self.lista.insert(tk.END, *(f"{p['nome']}  —  {reais(p['preco_centavos'])}" for p in self._resultados))
+            self.lista.selection_set(0)
+
+    def _mover(self, passo: int) -> str:
+        if self._resultados:
+            sel = self.lista.curselection()
+            i = min(max((sel[0] if sel else -1) + passo, 0), len(self._resultados) - 1)
+            self.lista.selection_clear(0, tk.END)
+            self.lista.selection_set(i)
+            self.lista.see(i)
+        return 'break'
+
+    def _on_escape(self, event) -> None:
+        if self.busca.get():
+            self.busca.delete(0, tk.END)
+            self._pesquisar()
+        else:
+            self.limpar()
+
+    # --- ticket ---
+    def adicionar_selecionado(self) -> None:
+        sel = self.lista.curselection()
+        if not sel or sel[0] >= len(self._resultados):
+            return
+        qtd, _ = self._consulta()
+        self.adicionar(self._resultados[sel[0]], qtd)
+        self.busca.delete(0, tk.END)
+        self._pesquisar()
+
+    def adicionar(self, produto: Dict[str, Any], quantidade: float = 1) -> None:
+        """Add quantidade of produto to the ticket, touching only its row."""
+        t0 = time.perf_counter()
+        linha = self.ticket.get(produto['id'])
+        if linha is None:
+            linha = self.ticket[produto['id']] = {'produto': produto, 'quantidade': 0}
+        linha['quantidade'] += quantidade
+        self._render_linha(produto['id'])
+        self.ultimo_add_ms = (time.perf_counter() - t0) * 1000
+
+    def _render_linha(self, produto_id: int) -> None:
+        iid = str(produto_id)
+        linha = self.ticket.get(produto_id)
+        if linha is None or linha['quantidade'] <= 0:
+            self.ticket.pop(produto_id, None)
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+        else:
+            p = linha['produto']
+            values = (p['nome'], f"{linha['quantidade']:g}", reais(round(linha['quantidade'] * p['preco_centavos'])))
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert('', tk.END, iid=iid, values=values)
+            self.tree.see(iid)
+        self.total_lbl.config(text=reais(self.total_centavos()))
+
+    def _alterar_selecionado(self, passo: int) -> None:
+        sel = self.tree.selection()
+        if sel:
+            pid = int(sel[0])
+            self.ticket[pid]['quantidade'] += passo
+            self._render_linha(pid)
+
+    def _remover_selecionado(self) -> None:
+        sel = self.tree.selection()
+        if sel:
+            pid = int(sel[0])
+            self.ticket.pop(pid, None)
+            self._render_linha(pid)
+
+    def total_centavos(self) -> int:
+        return sum(round(l['quantidade'] * l['produto']['preco_centavos']) for l in self.ticket.values())
+
+    def limpar(self) -> None:
+        self.ticket.clear()
+        self.tree.delete(*self.tree.get_children())
+        self.total_lbl.config(text=reais(0))
+
+    # --- orders ---
+    def enviar(self) -> None:
+        """Send the ticket as a new order; the screen is free again immediately."""
+        if not self.ticket or self._enviando:
+            return
+        itens = [{'produto_id': pid, 'descricao': l['produto']['nome'], 'quantidade': l['quantidade'],
+                  'preco_unit_centavos': l['produto']['preco_centavos']} for pid, l in self.ticket.items()]
+        mesa = self.mesa.get().strip() or None
+        self._enviando = True
+        self.enviar_btn.config(state=tk.DISABLED)
+        self.limpar()
+
+        def enviado(pid):
+            self._enviando = False
+            if self.status.winfo_exists():
+                self.enviar_btn.config(state=tk.NORMAL)
+                self.status.config(text=f'Pedido #{pid} enviado' + (f' (mesa {mesa})' if mesa else ''))
+
+        def falhou(ex):
+            self._enviando = False
+            if self.status.winfo_exists():
+                self.enviar_btn.config(state=tk.NORMAL)
+                # give the items back so nothing typed is lost
+                for item in itens:
+                    self.adicionar(self.catalogo.produto(item['produto_id']) or {
+                        'id': item['produto_id'], 'nome': item['descricao'],
+                        'preco_centavos': item['preco_unit_centavos']}, item['quantidade'])
+            messagebox.showerror('Pedidos', f'Falha ao enviar pedido: {ex}')
+
+        self.bridge.call(self.pedidos.criarPedido, mesa, itens, self.usuario_id, on_success=enviado, on_error=falhou)
+
+    def MostrarPedidos(self) -> None:
+        """Show the open orders, with an action to close the selected one."""
+        top = tk.Toplevel(self.win)
+        top.title('Pedidos abertos')
+        top.geometry('520x360')
+        tree = ttk.Treeview(top, columns=('id', 'mesa', 'itens', 'total'), show='headings', selectmode='browse')
+        for c, h, w in (('id', 'Pedido', 70), ('mesa', 'Mesa', 70), ('itens', 'Itens', 200), ('total', 'Total', 100)):
+            tree.heading(c, text=h, anchor=tk.CENTER)
+            tree.column(c, width=w, anchor=tk.CENTER)
+        tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+
+        def valores(p):
+            itens = ', '.join(f"{i['quantidade']:g}x {i['descricao']}" for i in p['itens'])
+            return p['id'], p['mesa'] or '', itens, reais(p['total_centavos'])
+
+        def carregar(pedidos):
+            if not tree.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for p in pedidos:
+                tree.insert('', tk.END, iid=str(p['id']), values=valores(p))
+
+        def patch(pid, p):
+            # one order changed: update, add or drop just its row
+            if not tree.winfo_exists():
+                return
+            iid = str(pid)
+            if p is None or p['status'] != STATUS_ABERTO:
+                if tree.exists(iid):
+                    tree.delete(iid)
+            elif tree.exists(iid):
+                tree.item(iid, values=valores(p))
+            else:
+                tree.insert('', 0, iid=iid, values=valores(p))
+
+        def on_change(change):
+            if change.key is None:
+                atualizar()
+            elif change.local or tree.exists(str(change.key)):
+                # other tills' open orders are not listed here
+                self.bridge.call(self.pedidos.obter, change.key, on_success=lambda p: patch(change.key, p))
+
+        def atualizar():
+            self.bridge.call(self.pedidos.MostrarPedidos, on_success=carregar,
+                             on_error=lambda ex: messagebox.showerror('Pedidos', str(ex)))
+
+        def fechar():
+            sel = tree.selection()
+            if not sel:
+                return
+            pid = int(sel[0])
+
+            def fechado(p):
+                # the row goes away with the 'pedidos' change
+                if self.status.winfo_exists():
+                    self.status.config(text=f"Pedido #{pid} fechado — {reais(p.total_centavos)}")
+
+            self.bridge.call(self.pedidos.fecharPedido, pid, on_success=fechado,
+                             on_error=lambda ex: messagebox.showerror('Pedidos', f'Falha ao fechar pedido: {ex}'))
+
+        btns = tk.Frame(top)
+        btns.pack(pady=(0, 8))
+        tk.Button(btns, text='Fechar pedido', width=14, command=fechar).pack(side=tk.LEFT, padx=6)
+        tk.Button(btns, text='Atualizar', width=12, command=atualizar).pack(side=tk.LEFT, padx=6)
+        tk.Button(btns, text='Sair', width=10, command=top.destroy).pack(side=tk.LEFT, padx=6)
+        self.bridge.subscribe('pedidos', on_change, owner=tree)
+        atualizar()
+
+
+__all__ = ['MenuFunc', 'reais']
@@ -0,0 +1,371 @@
+"""Opt-in latency histograms, slow-query log and profiling snapshots.
+
+Instrumented code reports durations to the process-wide ``METRICS`` registry:
+
+    with METRICS.timer('sysdb_auth_seconds', phase='kdf'):
+        ...
+    @METRICS.timed('sysdb_ui_seconds', fn='VirtualTreeview._append')
+    def _append(self, rows): ...
+
+While the registry is disabled (the default) a timer is a shared no-op, so
+instrumented hot paths cost one attribute check. Enable it from code with
+``METRICS.enable()`` or with environment variables:
+
+    SYSDB_METRICS=1               record histograms
+    SYSDB_SLOW_QUERY_MS=50        log statements slower than this (default 100)
+    SYSDB_METRICS_FILE=m.prom     rewrite this file every SYSDB_METRICS_INTERVAL
+                                  seconds (.json for JSON, anything else is the
+                                  Prometheus text format)
+
+DBProxy reports every execute/query_* call keyed by its normalized SQL
+(literals replaced by ?), so the histograms stay bounded. Statements slower
+than the threshold are logged on the 'sysdb.slow' logger together with their
+EXPLAIN QUERY PLAN and kept in ``slow_queries()``.
+
+``toggle_profiling()`` starts cProfile and tracemalloc on the first call and
+writes a .pstats file and a tracemalloc top list on the second; on POSIX
+``install_signal_toggle()`` binds it to SIGUSR1 (``kill -USR1 <pid>``).
+cProfile only sees the thread that started it.
+"""
+from __future__ import annotations
+
+import bisect
+import functools
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional, Any, Callable, Dict, List, Sequence, Tuple
+
+
+def _log():
+    # logging costs a few ms to import; only slow queries and export errors need it
+    import logging
+    return logging.getLogger('sysdb.slow')
+
+
+# histogram bucket upper bounds, in seconds
+BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                              0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'sysdb_sql_seconds': 'DBProxy statement latency by normalized SQL',
+    'sysdb_auth_seconds': 'AuthService.authenticate latency by phase',
+    'sysdb_ui_seconds': 'Tk render function latency',
+    'sysdb_backup_seconds': 'Backup.backup duration (copy, compression and verification)',
+}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals, so one statement shape is one key.
+
+    "SELECT * FROM t WHERE id IN (1, 2,3)" -> "SELECT * FROM t WHERE id IN (?...)"
+    """
+    s = _STRING_RE.sub('?', sql)
+    s = _NUMBER_RE.sub('?', s)
+    s = _IN_LIST_RE.sub('(?...)', s)
+    return _SPACE_RE.sub(' ', s).strip().rstrip(';')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus-compatible cumulative export)."""
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (max for the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'sum_s': round(self.sum, 6), 'max_s': round(self.max, 6),
+                'p50_s': self.quantile(0.5), 'p95_s': self.quantile(0.95), 'p99_s': self.quantile(0.99)}
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 't0')
+
+    def __init__(self, metrics: 'Metrics', name: str, labels: Tuple[Tuple[str, str], ...]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe(self.name, self.labels, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+class Metrics:
+    """Registry of latency histograms keyed by (metric name, labels).
+
+    Usage:
+        METRICS.enable()
+        with METRICS.timer('sysdb_auth_seconds', phase='lookup'):
+            ...
+        METRICS.write('data/metrics.prom')
+    """
+
+    def __init__(self, *, enabled: bool = False, slow_query_ms: float = 100.0, keep_slow: int = 50):
+        self.enabled = enabled
+        self.slow_query_s = slow_query_ms / 1000.0
+        self._hist: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._slow: 'deque[Dict[str, Any]]' = deque(maxlen=keep_slow)
+        self._slow_total = 0
+        self._lock = threading.Lock()
+        self._exporter: Optional[threading.Thread] = None
+        self._exporter_stop = threading.Event()
+
+    def enable(self, *, slow_query_ms: Optional[float] = None) -> None:
+        if slow_query_ms is not None:
+            self.slow_query_s = slow_query_ms / 1000.0
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._slow.clear()
+            self._slow_total = 0
+
+    # --- recording ---
+    def _observe(self, name: str, labels: Tuple[Tuple[str, str], ...], seconds: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = Histogram()
+            h.observe(seconds)
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        if self.enabled:
+            self._observe(name, tuple(sorted((k, str(v)) for k, v in labels.items())), seconds)
+
+    def timer(self, name: str, **labels: Any):
+        """Context manager recording the block's wall time (a no-op while disabled)."""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def timed(self, name: str, **labels: Any) -> Callable[[Callable], Callable]:
+        """Decorator form of ``timer``; the enabled flag is checked on every call."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+        def deco(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._observe(name, key, time.perf_counter() - t0)
+            return wrapper
+        return deco
+
+    def observe_sql(self, sql: str, seconds: float, explain: Optional[Callable[[], Sequence[Any]]] = None) -> None:
+        """Record one statement; past the slow threshold also log it with its query plan."""
+        norm = normalize_sql(sql)
+        self._observe('sysdb_sql_seconds', (('sql', norm),), seconds)
+        if seconds < self.slow_query_s:
+            return
+        plan: List[str] = []
+        if explain is not None:
+            try:
+                # rows are (id, parent, notused, detail)
+                plan = [str(r[-1]) for r in explain()]
+            except Exception as exc:
+                plan = [f'(no plan: {exc})']
+        entry = {'sql': norm, 'ms': round(seconds * 1000, 3), 'plan': plan,
+                 'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self._lock:
+            self._slow.append(entry)
+            self._slow_total += 1
+        _log().warning('slow query (%.1f ms): %s | plan: %s', entry['ms'], norm, '; '.join(plan) or '-')
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._slow)
+
+    # --- export ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = [(name, labels, h.to_dict()) for (name, labels), h in self._hist.items()]
+            slow, slow_total = list(self._slow), self._slow_total
+        metrics: Dict[str, List[Dict[str, Any]]] = {}
+        for name, labels, data in sorted(items, key=lambda i: (i[0], -i[2]['sum_s'])):
+            metrics.setdefault(name, []).append({'labels': dict(labels), **data})
+        return {'metrics': metrics, 'slow_queries_total': slow_total, 'slow_queries': slow}
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        import json
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """Text exposition format (histograms plus the slow query counter)."""
+        with self._lock:
+            items = [(name, labels, list(h.counts), h.sum, h.count) for (name, labels), h in self._hist.items()]
+            slow_total = self._slow_total
+        out: List[str] = []
+        last = None
+        for name, labels, counts, total, count in sorted(items, key=lambda i: (i[0], i[1])):
+            if name != last:
+                out.append(f'# HELP {name} {HELP.get(name, name)}')
+                out.append(f'# TYPE {name} histogram')
+                last = name
+            lbl = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+            sep = ',' if lbl else ''
+            cum = 0
+            for bound, n in zip(BUCKETS, counts):
+                cum += n
+                out.append(f'{name}_bucket{{{lbl}{sep}le="{bound}"}} {cum}')
+            out.append(f'{name}_bucket{{{lbl}{sep}le="+Inf"}} {count}')
+            suffix = f'{{{lbl}}}' if lbl else ''
+            out.append(f'{name}_sum{suffix} {total!r}')
+            out.append(f'{name}_count{suffix} {count}')
+        out.append('# HELP sysdb_slow_queries_total Statements slower than the slow query threshold')
+        out.append('# TYPE sysdb_slow_queries_total counter')
+        out.append(f'sysdb_slow_queries_total {slow_total}')
+        return '\n'.join(out) + '\n'
+
+    def write(self, path: str) -> None:
+        """Atomically (re)write path as JSON (.json) or Prometheus text (anything else)."""
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def start_exporter(self, path: str, interval: float = 15.0) -> None:
+        """Rewrite path every interval seconds from a daemon thread (e.g. for node_exporter's textfile collector)."""
+        if self._exporter is not None:
+            return
+        self._exporter_stop.clear()
+
+        def run():
+            while not self._exporter_stop.wait(interval):
+                try:
+                    self.write(path)
+                except OSError:
+                    _log().exception('could not write metrics to %s', path)
+            self.write(path)
+
+        self._exporter = threading.Thread(target=run, name='sysdb-metrics', daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self) -> None:
+        if self._exporter is None:
+            return
+        self._exporter_stop.set()
+        self._exporter.join()
+        self._exporter = None
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# --- on-demand profiling ---
+_profile_lock = threading.Lock()
+_profiler = None
+
+
+def toggle_profiling(out_dir: str = 'data/profiles', top: int = 40) -> Optional[Dict[str, str]]:
+    """Start cProfile + tracemalloc, or stop them and write the snapshots.
+
+    Returns None when profiling was started, else the paths written:
+    {'pstats': ..., 'tracemalloc': ...}. Open the .pstats file with
+    ``python -m pstats`` or snakeviz.
+    """
+    global _profiler
+    import cProfile
+    import tracemalloc
+    with _profile_lock:
+        if _profiler is None:
+            tracemalloc.start(25)
+            _profiler = cProfile.Profile()
+            _profiler.enable()
+            return None
+        prof, _profiler = _profiler, None
+        prof.disable()
+        snap = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    paths = {'pstats': os.path.join(out_dir, f'profile-{stamp}.pstats'),
+             'tracemalloc': os.path.join(out_dir, f'tracemalloc-{stamp}.txt')}
+    prof.dump_stats(paths['pstats'])
+    with open(paths['tracemalloc'], 'w', encoding='utf-8') as f:
+        for stat in snap.statistics('lineno')[:top]:
+            f.write(f'{stat}\n')
+    return paths
+
+
+def install_signal_toggle(signum: Optional[int] = None) -> bool:
+    """Toggle profiling on a signal (SIGUSR1 by default); False where unsupported."""
+    import signal
+    signum = signum if signum is not None else getattr(signal, 'SIGUSR1', None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, lambda *_: toggle_profiling())
+    return True
+
+
+METRICS = Metrics(enabled=os.environ.get('SYSDB_METRICS', '') not in ('', '0'),
+                  slow_query_ms=float(os.environ.get('SYSDB_SLOW_QUERY_MS', 100)))
+
+if METRICS.enabled and os.environ.get('SYSDB_METRICS_FILE'):
+    METRICS.start_exporter(os.environ['SYSDB_METRICS_FILE'],
+                           float(os.environ.get('SYSDB_METRICS_INTERVAL', 15)))
+
+
+__all__ = ['METRICS', 'Metrics', 'Histogram', 'normalize_sql', 'toggle_profiling', 'install_signal_toggle']
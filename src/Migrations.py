@@ -0,0 +1,319 @@
+"""Versioned schema migrations for SysDB.
+
+The schema version lives in ``PRAGMA user_version``. ``ensure_schema(db)`` runs
+every migration newer than that version, each in its own ``BEGIN IMMEDIATE``
+transaction together with the version bump, and remembers the database path so
+later calls in the same process return immediately. Repository classes call it
+from their constructors instead of issuing DDL themselves.
+
+To change the schema, append a new (version, description, statements) entry
+to MIGRATIONS; never edit one that has already shipped. The first migrations
+use IF NOT EXISTS because databases created before this module already have
+some of the tables.
+
+Money columns are stored as integer cents (``*_centavos``).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import List, Sequence, Set, Tuple
+
+from DBProxy import DBProxy
+
+
+def _fts_index(table: str, columns: Sequence[str]) -> List[str]:
+    """Statements creating ``<table>_fts`` over columns of table, kept in sync by triggers.
+
+    The index is external-content (it stores only the tokens; rows are read
+    from table by rowid = id), folds case and Portuguese accents, and keeps
+    1- to 3-character prefix indexes for search-as-you-type. See FullText.
+    """
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    insert = f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        # only changes to indexed columns touch the index (not ativo, updated_at, ...)
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+_BUMP_GASTOS = "UPDATE versoes SET versao = versao + 1 WHERE tabela = 'gastos';"
+
+
+MIGRATIONS: List[Tuple[int, str, Sequence[str]]] = [
+    (1, 'usuarios', [
+        """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            sobrenome TEXT NOT NULL,
+            cpf INTEGER UNIQUE NOT NULL,
+            nome_usuario TEXT UNIQUE NOT NULL,
+            senha TEXT NOT NULL,
+            data_admissao DATE,
+            tipo_acesso TEXT,
+            ativo INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_usuarios_ativos ON usuarios (id) WHERE ativo = 1",
+        "CREATE INDEX IF NOT EXISTS idx_usuarios_nome ON usuarios (nome COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_usuarios_nome_usuario_nocase ON usuarios (nome_usuario COLLATE NOCASE)",
+    ]),
+    (2, 'login_bloqueios', [
+        "CREATE TABLE IF NOT EXISTS login_bloqueios (chave TEXT PRIMARY KEY, ate REAL NOT NULL)",
+    ]),
+    (3, 'produtos, pedidos e itens de pedido', [
+        """
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            categoria TEXT,
+            preco_centavos INTEGER NOT NULL DEFAULT 0,
+            ativo INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_produtos_ativos ON produtos (nome COLLATE NOCASE) WHERE ativo = 1",
+        """
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY,
+            mesa TEXT,
+            status TEXT NOT NULL DEFAULT 'aberto',
+            usuario_id INTEGER,
+            total_centavos INTEGER NOT NULL DEFAULT 0,
+            criado_em TEXT NOT NULL,
+            atualizado_em TEXT,
+            fechado_em TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_abertos ON pedidos (mesa) WHERE status = 'aberto'",
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_fechado_em ON pedidos (fechado_em) WHERE fechado_em IS NOT NULL",
+        """
+        CREATE TABLE IF NOT EXISTS pedido_itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL REFERENCES pedidos (id) ON DELETE CASCADE,
+            produto_id INTEGER REFERENCES produtos (id),
+            descricao TEXT,
+            quantidade REAL NOT NULL,
+            preco_unit_centavos INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_pedido_itens_pedido ON pedido_itens (pedido_id)",
+    ]),
+    (4, 'estoque_itens', [
+        """
+        CREATE TABLE IF NOT EXISTS estoque_itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE,
+            unidade TEXT NOT NULL DEFAULT 'un',
+            quantidade REAL NOT NULL DEFAULT 0,
+            ponto_reposicao REAL NOT NULL DEFAULT 0,
+            custo_unit_centavos INTEGER,
+            ativo INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+        """,
+    ]),
+    (5, 'gastos', [
+        """
+        CREATE TABLE IF NOT EXISTS gastos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            descricao TEXT,
+            valor_centavos INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_gastos_data ON gastos (data)",
+    ]),
+    (6, 'sequencias (blocos de ids reservados por processo)', [
+        "CREATE TABLE IF NOT EXISTS sequencias (nome TEXT PRIMARY KEY, proximo INTEGER NOT NULL)",
+    ]),
+    (7, 'estoque_movimentos, produto_ingredientes e índice de estoque baixo', [
+        """
+        CREATE TABLE IF NOT EXISTS estoque_movimentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL REFERENCES estoque_itens (id),
+            delta REAL NOT NULL,
+            motivo TEXT NOT NULL,
+            pedido_id INTEGER,
+            criado_em TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_estoque_movimentos_item ON estoque_movimentos (item_id, id)",
+        """
+        CREATE TABLE IF NOT EXISTS produto_ingredientes (
+            produto_id INTEGER NOT NULL REFERENCES produtos (id) ON DELETE CASCADE,
+            item_id INTEGER NOT NULL REFERENCES estoque_itens (id),
+            quantidade REAL NOT NULL,
+            PRIMARY KEY (produto_id, item_id)
+        ) WITHOUT ROWID
+        """,
+        # only rows below their reorder point are in this index
+        "CREATE INDEX IF NOT EXISTS idx_estoque_baixo ON estoque_itens (nome) "
+        "WHERE ativo = 1 AND quantidade < ponto_reposicao",
+    ]),
+    (8, 'balanco_diario e balanco_mensal (agregados de vendas e gastos)', [
+        """
+        CREATE TABLE IF NOT EXISTS balanco_diario (
+            dia TEXT PRIMARY KEY,
+            receita_centavos INTEGER NOT NULL DEFAULT 0,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            itens REAL NOT NULL DEFAULT 0,
+            gastos_centavos INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS balanco_mensal (
+            mes TEXT PRIMARY KEY,
+            receita_centavos INTEGER NOT NULL DEFAULT 0,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            itens REAL NOT NULL DEFAULT 0,
+            gastos_centavos INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (9, 'gastos: índice de cobertura, contas a pagar e gastos recorrentes', [
+        """
+        CREATE TABLE IF NOT EXISTS gastos_recorrentes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            descricao TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            valor_centavos INTEGER NOT NULL,
+            dia INTEGER NOT NULL CHECK (dia BETWEEN 1 AND 31),
+            inicio TEXT NOT NULL,
+            fim TEXT,
+            gerado_ate TEXT,
+            ativo INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+        """,
+        "ALTER TABLE gastos ADD COLUMN recorrente_id INTEGER REFERENCES gastos_recorrentes (id)",
+        "ALTER TABLE gastos ADD COLUMN pago INTEGER NOT NULL DEFAULT 1",
+        # period queries and sums are answered from this index alone
+        "CREATE INDEX IF NOT EXISTS idx_gastos_periodo ON gastos (data, categoria, valor_centavos)",
+        "DROP INDEX IF EXISTS idx_gastos_data",
+        # one row per bill and due date, so materializing twice is harmless
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_gastos_recorrente_data ON gastos (recorrente_id, data) "
+        "WHERE recorrente_id IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_a_pagar ON gastos (data) WHERE pago = 0",
+    ]),
+    (10, 'alteracoes (log de alterações lido pelos outros terminais)', [
+        """
+        CREATE TABLE IF NOT EXISTS alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            op TEXT NOT NULL,
+            chave INTEGER,
+            dados TEXT,
+            origem TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+    ]),
+    (11, 'índices de busca FTS5 de usuarios, produtos e estoque_itens', [
+        *_fts_index('usuarios', ('nome', 'sobrenome', 'nome_usuario')),
+        *_fts_index('produtos', ('nome', 'categoria')),
+        *_fts_index('estoque_itens', ('nome',)),
+    ]),
+    (12, 'terminal dono de cada pedido', [
+        # open orders belong to the till that holds them in memory (see Pedidos)
+        "ALTER TABLE pedidos ADD COLUMN terminal TEXT",
+        "DROP INDEX IF EXISTS idx_pedidos_abertos",
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_abertos ON pedidos (terminal, mesa) WHERE status = 'aberto'",
+    ]),
+    (13, 'contador de alterações de gastos', [
+        # bumped by every commit touching amounts, from any connection or process;
+        # Gastos checks it before answering from its in-memory sums
+        "CREATE TABLE IF NOT EXISTS versoes (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0)",
+        "INSERT OR IGNORE INTO versoes (tabela) VALUES ('gastos')",
+        f"CREATE TRIGGER gastos_versao_ai AFTER INSERT ON gastos BEGIN {_BUMP_GASTOS} END",
+        f"CREATE TRIGGER gastos_versao_ad AFTER DELETE ON gastos BEGIN {_BUMP_GASTOS} END",
+        f"CREATE TRIGGER gastos_versao_au AFTER UPDATE OF data, categoria, valor_centavos ON gastos "
+        f"BEGIN {_BUMP_GASTOS} END",
+    ]),
+]
+
+_migrated: Set[str] = set()
+_lock = threading.Lock()
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(db: DBProxy) -> int:
+    return db.query_one("PRAGMA user_version")[0]
+
+
+def migrate(db: DBProxy) -> int:
+    """Apply pending migrations to db and return the resulting schema version.
+
+    Each migration runs in a BEGIN IMMEDIATE transaction, so two processes
+    starting at once serialize here and the second one sees the new version.
+    Raises RuntimeError if a migration is pending while db's connection is
+    inside a transaction, instead of committing the caller's work with it.
+    """
+    conn = db.conn
+    version = current_version(db)
+    for number, _desc, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        if conn.in_transaction:
+            raise RuntimeError('migrate() called inside an open transaction; '
+                               'run ensure_schema() before starting it')
+        # DDL is not implicitly transactional in sqlite3; open one explicitly
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another process may have migrated while we waited for the lock
+            if current_version(db) >= number:
+                conn.rollback()
+                version = current_version(db)
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(number)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+    return version
+
+
+def ensure_schema(db: DBProxy) -> None:
+    """Migrate db's database once per process; later calls are a set lookup."""
+    if getattr(db, 'remote', False):
+        # a DBServer migrates the database it owns before accepting clients
+        return
+    if db.db_path == ':memory:':
+        # every in-memory connection is a separate database
+        migrate(db)
+        return
+    key = os.path.abspath(db.db_path)
+    if key in _migrated:
+        return
+    with _lock:
+        if key in _migrated:
+            return
+        migrate(db)
+        _migrated.add(key)
+
+
+__all__ = ['MIGRATIONS', 'ensure_schema', 'migrate', 'latest_version', 'current_version']
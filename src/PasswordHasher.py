@@ -0,0 +1,182 @@
+"""Password hashing service backed by a process pool.
+
+PBKDF2 with 100k iterations costs tens of milliseconds per call. Running it in
+a ProcessPoolExecutor keeps the calling thread (Tk, the asyncio loop, a login
+worker) free and lets concurrent logins and bulk imports use every core.
+
+The workers call AuthUtils.hash_password / verify_password, so the stored
+format is exactly the one AuthUtils produces and verifies. The hash scheme and
+cost are read in the calling process (AuthUtils.current_params()) and sent
+with each job, so AuthUtils.configure() applies to pooled hashing too.
+
+Usage:
+    hasher = default_hasher()
+    stored = hasher.hash('s3nha')
+    oks = hasher.verify_many([('s3nha', stored), ('errada', stored)])
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Iterable, List, Tuple
+
+from AuthUtils import hash_password, verify_password, current_params
+
+
+def _hash(password: str, params: dict) -> str:
+    # module-level so it can be pickled to worker processes
+    return hash_password(password, **params)
+
+
+def _mp_context():
+    # never fork: the caller runs Tk, the writer thread and pool threads, and a
+    # child forked while one of them holds a lock can deadlock on it
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PasswordHasher:
+    """Hash and verify passwords in worker processes.
+
+    The pool is started lazily on first use. If worker processes cannot be
+    started at all (restricted sandbox, frozen build without multiprocessing
+    support) the hasher falls back to hashing inline in the caller. A call
+    whose worker dies mid-job is retried once inline and the broken pool is
+    replaced on the next call.
+    ``inline=True`` forces that mode (useful for benchmarks and scripts).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, *, inline: bool = False):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inline = inline
+        self._lock = threading.Lock()
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._pool is None and not self._inline:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context())
+                except (OSError, NotImplementedError, ImportError):
+                    self._inline = True
+            return self._pool
+
+    def _reset(self) -> None:
+        # the pool died (e.g. a worker was killed); start a fresh one next time
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _submit(self, fn, *args) -> Future:
+        pool = self._executor()
+        if pool is not None:
+            try:
+                return pool.submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError):
+                self._reset()
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as exc:
+            fut.set_exception(exc)
+        return fut
+
+    def _result(self, fut: Future, fn, *args):
+        """fut's result; if its worker died, reset the pool and run fn inline once."""
+        try:
+            return fut.result()
+        except BrokenProcessPool:
+            self._reset()
+            return fn(*args)
+
+    async def _result_async(self, fut: Future, fn, *args):
+        try:
+            return await asyncio.wrap_future(fut)
+        except BrokenProcessPool:
+            self._reset()
+            return fn(*args)
+
+    # --- blocking API ---
+    def hash(self, password: str) -> str:
+        params = current_params()
+        return self._result(self._submit(_hash, password, params), _hash, password, params)
+
+    def verify(self, password: str, stored: str) -> bool:
+        return self._result(self._submit(verify_password, password, stored), verify_password, password, stored)
+
+    def hash_many(self, passwords: Iterable[str]) -> List[str]:
+        """Hash every password in parallel; results keep the input order."""
+        params = current_params()
+        passwords = list(passwords)
+        futures = [self._submit(_hash, p, params) for p in passwords]
+        return [self._result(f, _hash, p, params) for f, p in zip(futures, passwords)]
+
+    def submit_many(self, passwords: Iterable[str]) -> List[Future]:
+        """Start hashing every password and return their futures at once.
+
+        Lets a pipeline hash the next chunk while it stores the current one.
+        """
+        params = current_params()
+        return [self._submit(_hash, p, params) for p in passwords]
+
+    def verify_many(self, pairs: Iterable[Tuple[str, str]]) -> List[bool]:
+        """Verify (password, stored) pairs in parallel; results keep the input order."""
+        pairs = list(pairs)
+        futures = [self._submit(verify_password, p, s) for p, s in pairs]
+        return [self._result(f, verify_password, p, s) for f, (p, s) in zip(futures, pairs)]
+
+    # --- asyncio API ---
+    async def hash_async(self, password: str) -> str:
+        params = current_params()
+        return await self._result_async(self._submit(_hash, password, params), _hash, password, params)
+
+    async def verify_async(self, password: str, stored: str) -> bool:
+        return await self._result_async(self._submit(verify_password, password, stored),
+                                        verify_password, password, stored)
+
+    async def hash_many_async(self, passwords: Iterable[str]) -> List[str]:
+        params = current_params()
+        passwords = list(passwords)
+        futures = [self._submit(_hash, p, params) for p in passwords]
+        return list(await asyncio.gather(*(self._result_async(f, _hash, p, params)
+                                           for f, p in zip(futures, passwords))))
+
+    async def verify_many_async(self, pairs: Iterable[Tuple[str, str]]) -> List[bool]:
+        pairs = list(pairs)
+        futures = [self._submit(verify_password, p, s) for p, s in pairs]
+        return list(await asyncio.gather(*(self._result_async(f, verify_password, p, s)
+                                           for f, (p, s) in zip(futures, pairs))))
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
+
+
+_default: Optional[PasswordHasher] = None
+_default_lock = threading.Lock()
+
+
+def default_hasher() -> PasswordHasher:
+    """Return the process-wide PasswordHasher shared by AuthService and imports."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PasswordHasher()
+        return _default
+
+
+__all__ = ['PasswordHasher', 'default_hasher']
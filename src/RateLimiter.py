@@ -0,0 +1,187 @@
+"""Login rate limiting and lockout tracking.
+
+AuthService asks the LoginRateLimiter before doing any work for a login, so a
+brute-force loop is rejected before a single hash is computed.
+
+Attempts are counted in SlidingWindowCounter ring buffers: a fixed number of
+time buckets per key, so adding and counting cost O(buckets) regardless of how
+many attempts were made. Counters live in memory in an LRU of bounded size.
+Active lockouts can optionally be persisted to the ``login_bloqueios`` table
+through DBProxy so they survive an application restart.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Callable, Dict
+
+from DBProxy import DBProxy
+from Migrations import ensure_schema
+
+
+class SlidingWindowCounter:
+    """Approximate sliding-window event counter over a ring of time buckets.
+
+    The window is split into ``buckets`` slots of window/buckets seconds; a
+    slot is reset lazily when the ring wraps around to it.
+    """
+
+    __slots__ = ('width', 'counts', 'slots')
+
+    def __init__(self, window: float = 60.0, buckets: int = 12):
+        self.width = window / buckets
+        self.counts = [0] * buckets
+        self.slots = [-1] * buckets
+
+    def add(self, now: float, n: int = 1) -> int:
+        """Record n events at time now and return the count in the window."""
+        slot = int(now // self.width)
+        idx = slot % len(self.counts)
+        if self.slots[idx] != slot:
+            self.slots[idx] = slot
+            self.counts[idx] = 0
+        self.counts[idx] += n
+        return self.count(now)
+
+    def count(self, now: float) -> int:
+        oldest = int(now // self.width) - len(self.counts)
+        return sum(c for c, s in zip(self.counts, self.slots) if s > oldest)
+
+    def reset(self) -> None:
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+            self.slots[i] = -1
+
+
+class LoginRateLimiter:
+    """Per-username and per-terminal login throttling.
+
+    - a terminal may start at most ``max_per_terminal`` attempts per window
+    - a username may fail at most ``max_failures`` times per window; the next
+      failure locks it for ``lockout`` seconds
+    - a terminal that exceeds its attempt rate is locked for ``lockout`` too
+
+    ``check()`` returns the seconds to wait (None when the attempt may
+    proceed) and counts the attempt against the terminal.
+    """
+
+    def __init__(self, *, max_failures: int = 5, max_per_terminal: int = 30, window: float = 60.0,
+                 lockout: float = 300.0, max_keys: int = 10_000, db: Optional[DBProxy] = None,
+                 clock: Callable[[], float] = time.time):
+        self.max_failures = max_failures
+        self.max_per_terminal = max_per_terminal
+        self.window = window
+        self.lockout = lockout
+        self.max_keys = max_keys
+        self.db = db
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters: 'OrderedDict[str, SlidingWindowCounter]' = OrderedDict()
+        self._locked: Dict[str, float] = {}
+        if db is not None:
+            ensure_schema(db)
+            self._load()
+
+    # --- persistence ---
+    def _load(self) -> None:
+        now = self._clock()
+        for row in self.db.query_all("SELECT chave, ate FROM login_bloqueios WHERE ate > ?", (now,)):
+            self._locked[row['chave']] = row['ate']
+        self.db.execute("DELETE FROM login_bloqueios WHERE ate <= ?", (now,), commit=True)
+
+    def _persist(self, key: str, until: Optional[float]) -> None:
+        if self.db is None:
+            return
+        try:
+            if until is None:
+                self.db.execute("DELETE FROM login_bloqueios WHERE chave = ?", (key,), commit=True)
+            else:
+                self.db.execute(
+                    "INSERT INTO login_bloqueios (chave, ate) VALUES (?, ?) "
+                    "ON CONFLICT (chave) DO UPDATE SET ate = excluded.ate",
+                    (key, until), commit=True,
+                )
+        except Exception:
+            # the in-memory lockout still applies
+            pass
+
+    # --- counters ---
+    def _counter(self, key: str) -> SlidingWindowCounter:
+        c = self._counters.get(key)
+        if c is None:
+            c = self._counters[key] = SlidingWindowCounter(self.window)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+        return c
+
+    def _lock_key(self, key: str, now: float) -> float:
+        until = now + self.lockout
+        self._locked[key] = until
+        return until
+
+    def _remaining(self, key: str, now: float) -> Optional[float]:
+        until = self._locked.get(key)
+        if until is None:
+            return None
+        if until <= now:
+            del self._locked[key]
+            return None
+        return until - now
+
+    # --- public API ---
+    def check(self, username: str, terminal: str) -> Optional[float]:
+        """Return seconds until an attempt is allowed, or None (and count the attempt)."""
+        ukey, tkey = 'u:' + username, 't:' + terminal
+        persist = None
+        with self._lock:
+            now = self._clock()
+            wait = self._remaining(ukey, now) or self._remaining(tkey, now)
+            if wait:
+                return wait
+            if self._counter(tkey).add(now) > self.max_per_terminal:
+                persist = self._lock_key(tkey, now)
+        if persist is not None:
+            self._persist(tkey, persist)
+            return self.lockout
+        return None
+
+    def record_failure(self, username: str, terminal: str) -> None:
+        ukey = 'u:' + username
+        persist = None
+        with self._lock:
+            now = self._clock()
+            if self._counter(ukey).add(now) >= self.max_failures:
+                persist = self._lock_key(ukey, now)
+        if persist is not None:
+            self._persist(ukey, persist)
+
+    def record_success(self, username: str, terminal: str) -> None:
+        ukey = 'u:' + username
+        with self._lock:
+            c = self._counters.pop(ukey, None)
+            if c is not None:
+                c.reset()
+
+    def unlock(self, username: Optional[str] = None, terminal: Optional[str] = None) -> None:
+        """Clear lockouts and counters (e.g. after an administrator verifies the user)."""
+        keys = []
+        if username is not None:
+            keys.append('u:' + username)
+        if terminal is not None:
+            keys.append('t:' + terminal)
+        with self._lock:
+            for k in keys:
+                self._locked.pop(k, None)
+                self._counters.pop(k, None)
+        for k in keys:
+            self._persist(k, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'tracked': len(self._counters), 'locked': len(self._locked)}
+
+
+__all__ = ['SlidingWindowCounter', 'LoginRateLimiter']
@@ -0,0 +1,240 @@
+"""Columnar sales analytics for the Faturamento and Gestão reports.
+
+Order lines and expenses are streamed out of SQLite with ``fetchmany`` in
+chunks of ``chunk_size`` rows and folded into fixed-size accumulators indexed
+by day, hour and product, so memory is bounded by the chunk size and the
+number of groups, not by the number of lines. Date parts are computed by
+SQLite in the query; weekday totals come from the daily series. In service
+mode (RemoteDBProxy), which has no server-side cursor, each chunk is its own
+request, paged by primary key (``AND id > ? ORDER BY id LIMIT ?``), so the
+same bound holds on both sides of the socket.
+
+With NumPy each chunk becomes float64 columns and every group-by is one
+``bincount``. Without it the accumulators are ``array('d')`` buffers and each
+chunk is folded in a single pass.
+"""
+from __future__ import annotations
+
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate, chain
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Union
+
+from Migrations import ensure_schema
+from RemoteDBProxy import open_db
+
+try:
+    import numpy as np
+except ImportError:  # optional: the array fallback gives the same results
+    np = None
+
+Dia = Union[str, date]
+
+DIAS_SEMANA = ('dom', 'seg', 'ter', 'qua', 'qui', 'sex', 'sáb')
+
+# day offset from the start of the period (julian day number - ?), hour, product, quantity, revenue;
+# weekday totals are derived from the daily series afterwards
+_SQL_LINHAS = ("""
+    SELECT CAST(julianday(substr(p.fechado_em, 1, 10)) AS INTEGER) - ?,
+           CAST(substr(p.fechado_em, 12, 2) AS INTEGER),
+           COALESCE(i.produto_id, 0),
+           i.quantidade,
+           i.quantidade * i.preco_unit_centavos
+    FROM pedidos p JOIN pedido_itens i ON i.pedido_id = p.id
+    WHERE p.status = 'fechado' AND p.fechado_em >= ? AND p.fechado_em < ?
+""", 'i.id')
+
+_SQL_GASTOS = ("""
+    SELECT CAST(julianday(data) AS INTEGER) - ?, valor_centavos
+    FROM gastos WHERE data >= ? AND data < ?
+""", 'id')
+
+
+def _dia(d: Dia) -> date:
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+
+class _Acumuladores:
+    """Per-group sums of order lines, folded one chunk at a time."""
+
+    GRUPOS = ('receita_dia', 'receita_hora', 'qtd_produto', 'receita_produto')
+
+    def __init__(self, ndias: int, nprodutos: int, use_numpy: bool):
+        self.use_numpy = use_numpy
+        sizes = {'receita_dia': ndias, 'gastos_dia': ndias, 'receita_hora': 24,
+                 'qtd_produto': nprodutos, 'receita_produto': nprodutos}
+        if use_numpy:
+            self.acc = {name: np.zeros(n) for name, n in sizes.items()}
+        else:
+            self.acc = {name: array('d', bytes(8 * n)) for name, n in sizes.items()}
+
+    def linhas(self, rows: List[tuple]) -> None:
+        """Fold (dia, hora, produto, quantidade, receita) rows."""
+        if self.use_numpy:
+            m = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 5).reshape(-1, 5)
+            d, h, prod = (m[:, i].astype(np.int64) for i in range(3))
+            qtd, receita = m[:, 3], m[:, 4]
+            self._bincount('receita_dia', d, receita)
+            self._bincount('receita_hora', h, receita)
+            self._bincount('qtd_produto', prod, qtd)
+            self._bincount('receita_produto', prod, receita)
+            return
+        # without NumPy: one pass over the chunk with the accumulators bound locally
+        rd, rh, qp, rp = (self.acc[g] for g in self.GRUPOS)
+        for d, h, prod, qtd, receita in rows:
+            rd[d] += receita
+            rh[h] += receita
+            qp[prod] += qtd
+            rp[prod] += receita
+
+    def gastos(self, rows: List[tuple]) -> None:
+        """Fold (dia, valor) rows."""
+        if self.use_numpy:
+            m = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 2).reshape(-1, 2)
+            self._bincount('gastos_dia', m[:, 0].astype(np.int64), m[:, 1])
+            return
+        gd = self.acc['gastos_dia']
+        for d, valor in rows:
+            gd[d] += valor
+
+    def _bincount(self, name: str, chaves, valores) -> None:
+        acc = self.acc[name]
+        acc += np.bincount(chaves, weights=valores, minlength=len(acc))[:len(acc)]
+
+    def lista(self, name: str) -> List[float]:
+        return self.acc[name].tolist()
+
+
+def media_movel(serie: Sequence[float], janela: int) -> List[float]:
+    """Trailing moving average (shorter windows at the start) via prefix sums."""
+    if janela < 1:
+        raise ValueError('janela must be >= 1')
+    if np is not None and not isinstance(serie, list):
+        c = np.concatenate(([0.0], np.cumsum(serie)))
+        idx = np.arange(1, len(serie) + 1)
+        ini = np.maximum(idx - janela, 0)
+        return ((c[idx] - c[ini]) / (idx - ini)).tolist()
+    c = [0.0] + list(accumulate(serie))
+    return [(c[i] - c[max(i - janela, 0)]) / (i - max(i - janela, 0)) for i in range(1, len(c))]
+
+
+class Relatorios:
+    """Sales and expense analytics over a period.
+
+    Usage:
+        rel = Relatorios()
+        r = rel.gerar('2024-01-01', '2024-12-31', janela=7)
+        r['fluxo_caixa'], r['por_produto'], r['por_hora'], r['por_dia_semana']
+    """
+
+    def __init__(self, db_path: str = "data/SysDB.db", *, chunk_size: int = 50_000,
+                 use_numpy: Optional[bool] = None):
+        self.db = open_db(db_path)
+        ensure_schema(self.db)
+        self.chunk_size = chunk_size
+        if use_numpy and np is None:
+            raise RuntimeError('numpy is not installed')
+        self.use_numpy = (np is not None) if use_numpy is None else use_numpy
+
+    def _stream(self, query: Tuple[str, str], params: Sequence[Any]):
+        """Yield the rows of query, a (sql, key column) pair, chunk_size at a time."""
+        sql, chave = query
+        if getattr(self.db, 'remote', False):
+            # one request per chunk, resuming after the last key seen
+            paged = sql.replace('SELECT', f'SELECT {chave},', 1) + f" AND {chave} > ? ORDER BY {chave} LIMIT ?"
+            ultimo = 0
+            while True:
+                rows = self.db.query_all(paged, (*params, ultimo, self.chunk_size))
+                if not rows:
+                    break
+                ultimo = rows[-1][0]
+                yield [tuple(r)[1:] for r in rows]
+                if len(rows) < self.chunk_size:
+                    break
+            return
+        cur = self.db.conn.cursor()
+        # plain tuples: sqlite3.Row objects are much slower to build
+        cur.row_factory = None
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    def _custos(self) -> Dict[int, float]:
+        """Ingredient cost per unit of each product, from its recipe."""
+        rows = self.db.query_all(
+            "SELECT pi.produto_id, SUM(pi.quantidade * COALESCE(e.custo_unit_centavos, 0)) "
+            "FROM produto_ingredientes pi JOIN estoque_itens e ON e.id = pi.item_id GROUP BY pi.produto_id"
+        )
+        return {r[0]: r[1] for r in rows}
+
+    def gerar(self, inicio: Dia, fim: Dia, *, janela: int = 7) -> Dict[str, Any]:
+        """Build every report for [inicio, fim] in one pass over the lines."""
+        ini, end = _dia(inicio), _dia(fim)
+        if end < ini:
+            raise ValueError('fim must not be before inicio')
+        ndias = (end - ini).days + 1
+        limite = (end + timedelta(days=1)).isoformat()
+        max_prod = self.db.query_one("SELECT COALESCE(MAX(id), 0) FROM produtos")[0]
+        acc = _Acumuladores(ndias, max_prod + 1, self.use_numpy)
+
+        # julian day numbers as SQLite truncates them (dates sit at .5)
+        base = ini.toordinal() + 1721424
+        for rows in self._stream(_SQL_LINHAS, (base, ini.isoformat(), limite)):
+            acc.linhas(rows)
+        for rows in self._stream(_SQL_GASTOS, (base, ini.isoformat(), limite)):
+            acc.gastos(rows)
+
+        receita_dia = [round(v) for v in acc.lista('receita_dia')]
+        gastos_dia = [round(v) for v in acc.lista('gastos_dia')]
+        saldo = [r - g for r, g in zip(receita_dia, gastos_dia)]
+        acumulado = list(accumulate(saldo))
+        media = media_movel(acc.acc['receita_dia'] if self.use_numpy else receita_dia, janela)
+        semana = [0] * 7
+        w0 = ini.isoweekday() % 7
+        for i, v in enumerate(receita_dia):
+            semana[(w0 + i) % 7] += v
+        fluxo = [{'dia': (ini + timedelta(days=i)).isoformat(), 'receita_centavos': receita_dia[i],
+                  'gastos_centavos': gastos_dia[i], 'saldo_centavos': saldo[i],
+                  'saldo_acumulado_centavos': acumulado[i], 'media_movel_receita_centavos': round(media[i])}
+                 for i in range(ndias)]
+
+        nomes = {r[0]: r[1] for r in self.db.query_all("SELECT id, nome FROM produtos")}
+        custos = self._custos()
+        qtd_prod, rec_prod = acc.lista('qtd_produto'), acc.lista('receita_produto')
+        por_produto = []
+        for pid in range(max_prod + 1):
+            if not qtd_prod[pid]:
+                continue
+            receita = round(rec_prod[pid])
+            custo = round(qtd_prod[pid] * custos.get(pid, 0))
+            por_produto.append({'produto_id': pid or None, 'nome': nomes.get(pid, 'Avulso'),
+                                'quantidade': qtd_prod[pid], 'receita_centavos': receita,
+                                'custo_centavos': custo, 'margem_centavos': receita - custo,
+                                'margem_pct': round(100 * (receita - custo) / receita, 1) if receita else None})
+        por_produto.sort(key=lambda p: p['receita_centavos'], reverse=True)
+
+        receita_total, gastos_total = sum(receita_dia), sum(gastos_dia)
+        return {
+            'inicio': ini.isoformat(), 'fim': end.isoformat(),
+            'totais': {'receita_centavos': receita_total, 'gastos_centavos': gastos_total,
+                       'saldo_centavos': receita_total - gastos_total,
+                       'margem_pct': round(100 * (receita_total - gastos_total) / receita_total, 1)
+                       if receita_total else None},
+            'fluxo_caixa': fluxo,
+            'por_produto': por_produto,
+            'por_hora': [{'hora': h, 'receita_centavos': round(v)} for h, v in enumerate(acc.lista('receita_hora'))],
+            'por_dia_semana': [{'dia_semana': DIAS_SEMANA[w], 'receita_centavos': v} for w, v in enumerate(semana)],
+        }
+
+    def gerarFluxoCaixa(self, inicio: Dia, fim: Dia, *, janela: int = 7) -> List[Dict[str, Any]]:
+        """Daily cash flow with running balance and moving average of revenue."""
+        return self.gerar(inicio, fim, janela=janela)['fluxo_caixa']
+
+    def close(self) -> None:
+        self.db.close()
+
+
+__all__ = ['Relatorios', 'media_movel', 'DIAS_SEMANA']
@@ -0,0 +1,486 @@
+"""Client side of the SysDB service mode (see DBServer).
+
+RemoteDBProxy speaks to a DBServer over a Unix socket or local TCP and
+offers the DBProxy calls the repositories use: ``execute``, ``executemany``,
+``query_all``, ``query_one``, ``transaction``, ``bulk_insert``/``bulk_upsert``
+and ``writer()``. Rows come back as ``Row`` objects that index by position or
+column name like sqlite3.Row, and database errors are re-raised as the same
+sqlite3 exception classes.
+
+Requests are pipelined: any number may be in flight on the one socket and a
+reader thread matches replies by id, so threads share a connection and the
+``*_async`` variants return Futures without waiting for the round trip.
+
+Differences from DBProxy: there is no ``conn`` (code that needs the raw
+sqlite3 connection must run next to the database), and a write outside
+``transaction()`` is always committed, as if commit=True, through the
+server's group commit.
+
+Wire format: each frame is a 4-byte big-endian length followed by a UTF-8
+JSON object; bytes values travel as {"$b": "<base64>"}.
+
+``open_db()`` hands every caller in the process the same RemoteDBProxy per
+server address, the way pooled DBProxy instances share connections; its
+``close()`` leaves the shared socket open (``RemoteDBProxy.close_shared()``
+closes them).
+
+Usage:
+    db = open_db()           # RemoteDBProxy when SYSDB_SERVER is set, else DBProxy
+    db = RemoteDBProxy('unix:data/sysdb.sock')
+    with db.transaction():
+        db.execute("UPDATE ...", (...))
+"""
+from __future__ import annotations
+
+import base64
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import struct
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Optional, Any, Iterable, Tuple, Dict, List, Sequence
+
+from DBProxy import DBProxy, ExecResult
+
+PROTOCOL_VERSION = 1
+_HEADER = struct.Struct('>I')
+MAX_FRAME = 64 * 1024 * 1024
+
+
+# --- wire format (shared with DBServer) ---
+def _enc(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'$b': base64.b64encode(bytes(value)).decode('ascii')}
+    return value
+
+
+def _dec(value: Any) -> Any:
+    if isinstance(value, dict) and len(value) == 1 and '$b' in value:
+        return base64.b64decode(value['$b'])
+    return value
+
+
+def encode_params(params: Any) -> Any:
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: _enc(v) for k, v in params.items()}
+    return [_enc(v) for v in params]
+
+
+def decode_params(params: Any) -> Any:
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {k: _dec(v) for k, v in params.items()}
+    return tuple(_dec(v) for v in params)
+
+
+def encode_rows(rows: Iterable[Sequence[Any]]) -> List[List[Any]]:
+    return [[_enc(v) for v in r] for r in rows]
+
+
+def pack(msg: Dict[str, Any]) -> bytes:
+    body = json.dumps(msg, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return _HEADER.pack(len(body)) + body
+
+
+def unpack(body: bytes) -> Dict[str, Any]:
+    return json.loads(body.decode('utf-8'))
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """'unix:/path', 'tcp:host:port' or 'host:port' -> (family, address)."""
+    if address.startswith('unix:'):
+        return 'unix', address[5:]
+    if address.startswith('tcp:'):
+        address = address[4:]
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+def error_payload(exc: BaseException) -> Dict[str, str]:
+    return {'type': type(exc).__name__, 'message': str(exc)}
+
+
+def _raise(err: Dict[str, str]) -> None:
+    cls = getattr(sqlite3, err.get('type', ''), None)
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        cls = RemoteError
+    raise cls(err.get('message', ''))
+
+
+class RemoteError(Exception):
+    """A server-side failure that is not a sqlite3 error (protocol, auth, disconnect)."""
+
+
+class Row:
+    """Result row addressable by index or column name (like sqlite3.Row)."""
+
+    __slots__ = ('_values', '_index')
+
+    def __init__(self, values: Tuple[Any, ...], index: Dict[str, int]):
+        self._values = values
+        self._index = index
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return self._values[self._index[key]]
+            except KeyError:
+                raise IndexError(f'No item with that key: {key!r}') from None
+        return self._values[key]
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Row):
+            return self._values == other._values and self._index == other._index
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._values)
+
+    def __repr__(self) -> str:
+        return f'Row({dict(zip(self._index, self._values))!r})'
+
+
+class RemoteCursor:
+    """The part of sqlite3.Cursor callers use, filled from one reply."""
+
+    def __init__(self, reply: Dict[str, Any]):
+        self.lastrowid: Optional[int] = reply.get('lastrowid')
+        self.rowcount: int = reply.get('rowcount', -1)
+        cols = reply.get('columns')
+        self.description = tuple((c, None, None, None, None, None, None) for c in cols) if cols else None
+        index = {c: i for i, c in enumerate(cols or ())}
+        self._rows = [Row(tuple(_dec(v) for v in r), index) for r in reply.get('rows') or ()]
+        self._pos = 0
+
+    def fetchone(self) -> Optional[Row]:
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchmany(self, size: int = 1) -> List[Row]:
+        out = self._rows[self._pos:self._pos + size]
+        self._pos += len(out)
+        return out
+
+    def fetchall(self) -> List[Row]:
+        out = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return out
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class _RemoteWriter:
+    """``WriteBehindQueue``-shaped view: the server already group-commits every write."""
+
+    def __init__(self, db: 'RemoteDBProxy'):
+        self.db = db
+
+    def execute(self, sql: str, params: Optional[Iterable[Any]] = None, *, durable: bool = False,
+                on_success=None, on_error=None) -> Future:
+        out: Future = Future()
+
+        def done(f: Future) -> None:
+            try:
+                cur = f.result()
+            except BaseException as exc:
+                out.set_exception(exc)
+                if on_error is not None:
+                    on_error(exc)
+                return
+            res = ExecResult(cur.lastrowid, cur.rowcount)
+            out.set_result(res)
+            if on_success is not None:
+                on_success(res)
+
+        self.db.execute_async(sql, params, durable=durable).add_done_callback(done)
+        return out
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        self.db.query_one("SELECT 1")
+
+
+class RemoteDBProxy:
+    """DBProxy drop-in that forwards calls to a DBServer.
+
+    One socket per instance, safe to share between threads; each thread has
+    its own ``transaction()`` state. ``shared(address)`` returns the
+    process-wide instance for an address.
+    """
+
+    remote = True
+    _shared: Dict[str, 'RemoteDBProxy'] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, address: str, **kwargs) -> 'RemoteDBProxy':
+        """Return the process-wide proxy for address, connecting on first use."""
+        with cls._shared_lock:
+            db = cls._shared.get(address)
+            if db is None:
+                db = cls(address, **kwargs)
+                db.is_shared = True
+                cls._shared[address] = db
+            return db
+
+    @classmethod
+    def close_shared(cls) -> None:
+        """Close every proxy handed out by ``shared()``."""
+        with cls._shared_lock:
+            dbs, cls._shared = list(cls._shared.values()), {}
+        for db in dbs:
+            db.is_shared = False
+            db.close()
+
+    def __init__(self, address: Optional[str] = None, *, token: Optional[str] = None, timeout: float = 30.0,
+                 db_path: str = "data/SysDB.db"):
+        self.address = address or os.environ.get('SYSDB_SERVER') or 'unix:data/sysdb.sock'
+        self.token = token if token is not None else os.environ.get('SYSDB_SERVER_TOKEN')
+        self.timeout = timeout
+        # kept for callers that key caches by path (Catalogo, Metrics labels)
+        self.db_path = db_path
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._local = threading.local()
+        self._sock: Optional[socket.socket] = None
+        self._closed = False
+        self.is_shared = False
+        # the database file the server has open, as it reported in hello
+        self.server_db_path: Optional[str] = None
+        self.connect()
+
+    # --- connection ---
+    def connect(self) -> None:
+        if self._sock is not None:
+            return
+        family, addr = parse_address(self.address)
+        if family == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        sock.connect(addr)
+        sock.settimeout(None)
+        self._sock = sock
+        self._closed = False
+        threading.Thread(target=self._reader, args=(sock,), name='sysdb-remote-reader', daemon=True).start()
+        hello = self._call('hello', version=PROTOCOL_VERSION, token=self.token)
+        if hello.get('version') != PROTOCOL_VERSION:
+            raise RemoteError(f"server speaks protocol {hello.get('version')}, client {PROTOCOL_VERSION}")
+        self.server_db_path = hello.get('db_path')
+
+    def close(self) -> None:
+        """Close the socket; on a shared proxy this does nothing (see ``close_shared``)."""
+        if self.is_shared:
+            return
+        self._closed = True
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    @staticmethod
+    def _read_exact(rfile, n: int) -> bytes:
+        data = rfile.read(n)
+        if len(data) < n:
+            raise ConnectionError('server closed the connection')
+        return data
+
+    def _reader(self, sock: socket.socket) -> None:
+        # buffered: header and body of a reply (often several replies) come in one recv
+        rfile = sock.makefile('rb', buffering=1 << 16)
+        try:
+            while True:
+                (size,) = _HEADER.unpack(self._read_exact(rfile, _HEADER.size))
+                reply = unpack(self._read_exact(rfile, size))
+                with self._pending_lock:
+                    fut = self._pending.pop(reply.get('id'), None)
+                if fut is not None:
+                    fut.set_result(reply)
+        except (OSError, ConnectionError, ValueError) as exc:
+            err = RemoteError(f'connection to {self.address} lost: {exc}')
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for fut in pending.values():
+                fut.set_exception(err)
+            if self._sock is sock:
+                self._sock = None
+        finally:
+            rfile.close()
+
+    def _send(self, op: str, **fields) -> Future:
+        if self._sock is None:
+            if self._closed:
+                raise RemoteError('RemoteDBProxy is closed')
+            self.connect()
+        rid = next(self._ids)
+        fut: Future = Future()
+        with self._pending_lock:
+            self._pending[rid] = fut
+        tx = getattr(self._local, 'tx', None)
+        if tx is not None and 'tx' not in fields:
+            fields['tx'] = tx
+        frame = pack({'id': rid, 'op': op, **fields})
+        with self._send_lock:
+            self._sock.sendall(frame)
+        return fut
+
+    @staticmethod
+    def _check(reply: Dict[str, Any]) -> Dict[str, Any]:
+        if not reply.get('ok'):
+            _raise(reply.get('error') or {})
+        return reply
+
+    def _call(self, op: str, **fields) -> Dict[str, Any]:
+        return self._check(self._send(op, **fields).result(self.timeout))
+
+    def _cursor_future(self, fut: Future) -> Future:
+        out: Future = Future()
+
+        def done(f: Future) -> None:
+            try:
+                out.set_result(RemoteCursor(self._check(f.result())))
+            except BaseException as exc:
+                out.set_exception(exc)
+
+        fut.add_done_callback(done)
+        return out
+
+    # --- DBProxy API ---
+    def execute_async(self, sql: str, params: Optional[Iterable[Any]] = None, *, durable: bool = False) -> Future:
+        """Send a statement and return a Future[RemoteCursor] without waiting for it."""
+        return self._cursor_future(self._send('execute', sql=sql, params=encode_params(params), durable=durable))
+
+    def query_all_async(self, sql: str, params: Optional[Iterable[Any]] = None) -> Future:
+        return self._cursor_future(self._send('execute', sql=sql, params=encode_params(params)))
+
+    def execute(self, sql: str, params: Optional[Iterable[Any]] = None, commit: bool = False,
+                *, cached: bool = False) -> RemoteCursor:
+        return self.execute_async(sql, params).result(self.timeout)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Tuple], commit: bool = True) -> RemoteCursor:
+        rows = [encode_params(p) for p in seq_of_params]
+        return RemoteCursor(self._call('executemany', sql=sql, rows=rows))
+
+    def query_all(self, sql: str, params: Optional[Iterable[Any]] = None) -> List[Row]:
+        return self.execute(sql, params).fetchall()
+
+    def query_one(self, sql: str, params: Optional[Iterable[Any]] = None) -> Optional[Row]:
+        return self.execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self):
+        """Like DBProxy.transaction(): nested blocks become SAVEPOINTs on the server session."""
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            name = f"sp_{depth}"
+            self.execute(f"SAVEPOINT {name}")
+            self._local.depth = depth + 1
+            mark = len(self._local.after)
+            try:
+                yield self
+            except Exception:
+                self.execute(f"ROLLBACK TO {name}")
+                self.execute(f"RELEASE {name}")
+                del self._local.after[mark:]
+                raise
+            else:
+                self.execute(f"RELEASE {name}")
+            finally:
+                self._local.depth = depth
+            return
+        self._local.tx = self._call('begin')['tx']
+        self._local.depth = 1
+        self._local.after = []
+        try:
+            yield self
+        except BaseException:
+            tx, self._local.tx, self._local.depth = self._local.tx, None, 0
+            try:
+                self._call('rollback', tx=tx)
+            except RemoteError:
+                pass
+            raise
+        tx, self._local.tx, self._local.depth = self._local.tx, None, 0
+        self._call('commit', tx=tx)
+        pending, self._local.after = self._local.after, []
+        for fn in pending:
+            fn()
+
+    def after_commit(self, fn) -> None:
+        """Like DBProxy.after_commit()."""
+        if getattr(self._local, 'depth', 0):
+            self._local.after.append(fn)
+        else:
+            fn()
+
+    def writer(self, **kwargs) -> _RemoteWriter:
+        return _RemoteWriter(self)
+
+    # same SQL building and chunking as DBProxy
+    bulk_insert = DBProxy.bulk_insert
+    bulk_upsert = DBProxy.bulk_upsert
+    _bulk = DBProxy._bulk
+
+    def stats(self) -> Dict[str, Any]:
+        """Server-side counters (connections, requests, group commits)."""
+        return self._call('stats')['stats']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def open_db(db_path: str = "data/SysDB.db", **kwargs):
+    """A pooled DBProxy for db_path, or the shared RemoteDBProxy when SYSDB_SERVER names a server.
+
+    The server decides which database is used. The default path means "the
+    server's database". Any other db_path (a test or demo database) must be
+    the file the server has open, or RemoteError is raised rather than
+    quietly using the server's database.
+    """
+    address = os.environ.get('SYSDB_SERVER')
+    if address:
+        db = RemoteDBProxy.shared(address, db_path=db_path)
+        if db_path != "data/SysDB.db" and db.server_db_path is not None \
+                and os.path.realpath(db_path) != db.server_db_path:
+            raise RemoteError(f'SYSDB_SERVER {address} serves {db.server_db_path}, not {db_path}')
+        return db
+    return DBProxy(db_path, pooled=True, **kwargs)
+
+
+__all__ = ['RemoteDBProxy', 'RemoteCursor', 'Row', 'RemoteError', 'open_db']
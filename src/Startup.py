@@ -0,0 +1,229 @@
+"""Cold-start bookkeeping: startup milestones, import timing and background warm-up.
+
+Main imports this module first, so ``STARTUP`` measures from the top of the
+program. Screens call ``STARTUP.mark('first_window')`` and friends; the App
+hands its warm-up jobs (connection, migrations, auth caches, product
+catalog) to ``STARTUP.warm_up``, which runs them on a daemon thread after
+the first window is on screen.
+
+    python src/Main.py --startup-report          # report on stderr
+    python src/Main.py --startup-report=st.json  # report as JSON
+    SYSDB_STARTUP_REPORT=- python src/Main.py
+
+With a report requested, an import hook times every module executed
+afterwards (self and cumulative, like ``python -X importtime``), and the
+report is emitted once the first window is shown and warm-up finished.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import Optional, Any, Callable, Dict, List, Sequence, Tuple
+
+_T0 = time.perf_counter()
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since the process started (interpreter start-up included); Linux only."""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            # the command name may contain spaces; fields after it are space separated
+            fields = f.read().rsplit(b')', 1)[1].split()
+        with open('/proc/uptime', 'rb') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _TimedLoader:
+    """Wraps a module loader to time exec_module; put back on the module afterwards."""
+
+    def __init__(self, loader: Any, profiler: 'ImportProfiler', name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self._profiler._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._name)
+            module.__loader__ = self._loader
+            if getattr(module, '__spec__', None) is not None:
+                module.__spec__.loader = self._loader
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class ImportProfiler:
+    """``sys.meta_path`` hook recording self/cumulative import time per module."""
+
+    def __init__(self):
+        self.records: List[Tuple[str, float, float, int]] = []   # name, self s, cumulative s, depth
+        # per thread: the warm-up thread imports while the Tk thread does
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        if getattr(self._local, 'busy', False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                        spec.loader = _TimedLoader(spec.loader, self, name)
+                    return spec
+            return None
+        finally:
+            self._local.busy = False
+
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []   # [start, time spent in children]
+        return stack
+
+    def _enter(self) -> None:
+        self._stack().append([time.perf_counter(), 0.0])
+
+    def _exit(self, name: str) -> None:
+        stack = self._stack()
+        start, children = stack.pop()
+        total = time.perf_counter() - start
+        if stack:
+            stack[-1][1] += total
+        with self._lock:
+            self.records.append((name, total - children, total, len(stack)))
+
+    def top(self, n: int = 15) -> List[Dict[str, Any]]:
+        """Slowest top-level imports by cumulative time."""
+        with self._lock:
+            recs = list(self.records)
+        recs.sort(key=lambda r: r[2], reverse=True)
+        return [{'module': name, 'self_ms': round(s * 1000, 2), 'cumulative_ms': round(c * 1000, 2), 'depth': d}
+                for name, s, c, d in recs[:n]]
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(c for _, _, c, d in self.records if d == 0)
+
+
+class Startup:
+    """Milestones and warm-up jobs of this process.
+
+    Usage:
+        STARTUP.mark('imports')
+        STARTUP.warm_up([('schema', fn), ('catalogo', fn2)])
+    """
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+        self.warm: Dict[str, Any] = {}
+        self.report_to: Optional[str] = None
+        self.profiler: Optional[ImportProfiler] = None
+        self._warm_done = threading.Event()
+        self._window_done = threading.Event()
+        self._lock = threading.Lock()
+
+    def enable_report(self, target: str = '-') -> None:
+        """Time imports from now on and emit a report ('-' = stderr, else a JSON file)."""
+        self.report_to = target
+        if self.profiler is None:
+            self.profiler = ImportProfiler()
+            self.profiler.install()
+
+    def mark(self, label: str) -> float:
+        """Record ms since start-up for label (only the first time) and return it."""
+        ms = (time.perf_counter() - _T0) * 1000
+        with self._lock:
+            self.marks.setdefault(label, round(ms, 2))
+        if label == 'first_window':
+            self._window_done.set()
+            self._maybe_report()
+        return ms
+
+    def warm_up(self, jobs: Sequence[Tuple[str, Callable[[], Any]]]) -> threading.Thread:
+        """Run jobs in order on a daemon thread; a failing job is recorded and skipped."""
+        def run():
+            for label, fn in jobs:
+                t0 = time.perf_counter()
+                try:
+                    fn()
+                    self.warm[label] = round((time.perf_counter() - t0) * 1000, 2)
+                except Exception as exc:
+                    # the screen that needs it will retry and report the error itself
+                    self.warm[label] = f'failed: {exc}'
+            self.mark('warm')
+            self._warm_done.set()
+            self._maybe_report()
+
+        t = threading.Thread(target=run, name='sysdb-warm-up', daemon=True)
+        t.start()
+        return t
+
+    def wait_warm(self, timeout: Optional[float] = None) -> bool:
+        return self._warm_done.wait(timeout)
+
+    def report(self) -> Dict[str, Any]:
+        age = _process_age()
+        since = age - (time.perf_counter() - _T0) if age is not None else None
+        rep: Dict[str, Any] = {
+            'interpreter_ms': round(since * 1000, 1) if since is not None else None,
+            'marks_ms': dict(self.marks),
+            'warm_up_ms': dict(self.warm),
+        }
+        if self.profiler is not None:
+            rep['imports_ms'] = round(self.profiler.total() * 1000, 2)
+            rep['slowest_imports'] = self.profiler.top()
+        return rep
+
+    def _maybe_report(self) -> None:
+        if self.report_to is None or not (self._window_done.is_set() and self._warm_done.is_set()):
+            return
+        with self._lock:
+            target, self.report_to = self.report_to, None
+        if target is None:
+            return
+        if self.profiler is not None:
+            self.profiler.uninstall()
+        rep = self.report()
+        import json
+        if target == '-':
+            lines = [f"startup: interpreter {rep['interpreter_ms']} ms before Main"]
+            lines += [f'  {k:<14} {v:>9} ms' for k, v in rep['marks_ms'].items()]
+            lines += [f'  warm {k:<9} {v}' + (' ms' if isinstance(v, float) else '') for k, v in rep['warm_up_ms'].items()]
+            for imp in rep.get('slowest_imports', []):
+                lines.append(f"  import {imp['module']:<28} {imp['cumulative_ms']:>8} ms (self {imp['self_ms']})")
+            print('\n'.join(lines), file=sys.stderr)
+        else:
+            with open(target, 'w', encoding='utf-8') as f:
+                json.dump(rep, f, indent=2)
+
+
+STARTUP = Startup()
+
+if os.environ.get('SYSDB_STARTUP_REPORT'):
+    STARTUP.enable_report(os.environ['SYSDB_STARTUP_REPORT'])
+
+
+__all__ = ['STARTUP', 'Startup', 'ImportProfiler']
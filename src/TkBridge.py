@@ -0,0 +1,179 @@
+"""Bridge between the Tk main loop and background work.
+
+Tk widgets may only be touched from the thread running mainloop, so slow work
+(database calls, password hashing) is sent to a shared asyncio loop running on
+a daemon thread, and results are handed back through a queue that the Tk
+thread drains with ``after()``.
+
+Usage:
+    bridge = TkBridge(root)
+    bridge.submit(adb.call(u_mgr.listar), on_success=populate)
+    bridge.call(authsvc.authenticate, user, pwd, on_success=finish)
+    bridge.subscribe('usuarios', on_change, owner=tree)   # ChangeBus events on the Tk thread
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional, Any, Callable
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide asyncio loop, starting its daemon thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            t = threading.Thread(target=loop.run_forever, name='tk-bridge-loop', daemon=True)
+            t.start()
+            _loop = loop
+        return _loop
+
+
+class TkBridge:
+    """Schedule work off the Tk thread and run callbacks back on it.
+
+    ``submit`` accepts a coroutine (e.g. from AsyncDBProxy), a plain callable,
+    which runs in the loop's default thread pool, or a concurrent Future that
+    is already running (e.g. from WriteBehindQueue). on_success(result) or
+    on_error(exc) is then called on the Tk thread. Without on_error, errors go
+    to Tk's ``report_callback_exception``.
+    """
+
+    def __init__(self, widget, *, poll_ms: int = 15, listen_ms: int = 100):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.listen_ms = listen_ms
+        self.loop = background_loop()
+        self._results: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._events: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._pending = 0
+        self._listening = 0
+        self._polling = False
+        self._after_id = None
+        self._delay = 0
+
+    def submit(self, work: Any, on_success: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None) -> Future:
+        if isinstance(work, Future):
+            fut = work
+        elif asyncio.iscoroutine(work):
+            fut = asyncio.run_coroutine_threadsafe(work, self.loop)
+        elif callable(work):
+            fut = asyncio.run_coroutine_threadsafe(self._in_thread(work), self.loop)
+        else:
+            raise TypeError('work must be a coroutine, a callable or a Future')
+        fut.add_done_callback(lambda f: self._results.put((f, on_success, on_error)))
+        self._pending += 1
+        self._schedule()
+        return fut
+
+    def call(self, fn: Callable[..., Any], *args, on_success: Optional[Callable[[Any], None]] = None,
+             on_error: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Future:
+        """Run fn(*args, **kwargs) in a worker thread; shorthand for submit()."""
+        return self.submit(functools.partial(fn, *args, **kwargs), on_success, on_error)
+
+    def subscribe(self, table: Optional[str], callback: Callable[[Any], None], *, owner=None,
+                  bus=None) -> Callable[[], None]:
+        """Deliver ChangeBus changes of table to callback(change) on the Tk thread.
+
+        Call from the Tk thread. The subscription ends when owner (default:
+        the bridge's widget) is destroyed or the returned function is called.
+        While subscribed the bridge polls every ``listen_ms``.
+        """
+        if bus is None:
+            from ChangeBus import BUS as bus
+        owner = owner or self.widget
+        unsubscribe = bus.subscribe(table, lambda change: self._events.put((callback, change)))
+        self._listening += 1
+        active = [True]
+
+        def cancel(_event=None) -> None:
+            if _event is not None and _event.widget is not owner:
+                return
+            if active[0]:
+                active[0] = False
+                unsubscribe()
+                self._listening -= 1
+
+        owner.bind('<Destroy>', cancel, add='+')
+        self._schedule()
+        return cancel
+
+    @staticmethod
+    async def _in_thread(fn: Callable[[], Any]) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, fn)
+
+    def _schedule(self) -> None:
+        # only subscriptions to wait for: nobody is waiting on a result, poll slower
+        delay = self.poll_ms if self._pending > 0 else self.listen_ms
+        if self._polling:
+            if delay >= self._delay:
+                return
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+        try:
+            self._after_id = self.widget.after(delay, self._drain)
+            self._delay = delay
+            self._polling = True
+        except Exception:
+            # widget destroyed; nobody is left to receive the results
+            pass
+
+    def _drain(self) -> None:
+        self._polling = False
+        while True:
+            try:
+                fut, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            self._deliver(fut, on_success, on_error)
+        while True:
+            try:
+                callback, change = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver_change(callback, change)
+        if self._pending > 0 or self._listening > 0:
+            self._schedule()
+
+    def _deliver_change(self, callback, change) -> None:
+        try:
+            callback(change)
+        except Exception as cb_exc:
+            try:
+                self.widget._root().report_callback_exception(type(cb_exc), cb_exc, cb_exc.__traceback__)
+            except Exception:
+                pass
+
+    def _deliver(self, fut: Future, on_success, on_error) -> None:
+        try:
+            exc = fut.exception()
+        except BaseException as cancelled:
+            exc = cancelled
+        try:
+            if exc is None:
+                if on_success is not None:
+                    on_success(fut.result())
+            elif on_error is not None:
+                on_error(exc)
+            else:
+                self.widget._root().report_callback_exception(type(exc), exc, exc.__traceback__)
+        except Exception as cb_exc:
+            # a failing callback must not stop other results from being delivered
+            try:
+                self.widget._root().report_callback_exception(type(cb_exc), cb_exc, cb_exc.__traceback__)
+            except Exception:
+                pass
+
+
+__all__ = ['TkBridge', 'background_loop']
@@ -1,9 +1,15 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from itertools import islice
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Sequence, Tuple
 
-from DBProxy import DBProxy
+from ChangeBus import BUS
+from DBProxy import ExecResult
+from FullText import search
+from Migrations import ensure_schema
 from AuthUtils import hash_password, verify_password
+from PasswordHasher import PasswordHasher, default_hasher
+from RemoteDBProxy import open_db
 
 
 @dataclass
@@ -25,29 +31,46 @@ class Usuario:
     This class will create and manage a `usuarios` table inside the SysDB
     SQLite database (default file: data/SysDB.db). It exposes methods to add,
     update and logically remove users (adicionar, atualizar, remover).
+
+    Every committed change is published on the ChangeBus under 'usuarios'
+    (key = user id, None for bulk inserts; data may carry nome_usuario).
+    Caches such as AuthService's and the users screen subscribe to it.
+
+    With write_behind=True single-row writes go through the database's
+    WriteBehindQueue, so concurrent callers share one commit instead of paying
+    an fsync each; every call still returns only after its own commit.
     """
 
-    def __init__(self, db_path: str = "data/SysDB.db"):
-        self.db = DBProxy(db_path)
-        self._ensure_table()
-
-    def _ensure_table(self):
-        sql = """
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            sobrenome TEXT NOT NULL,
-            cpf INTEGER UNIQUE NOT NULL,
-            nome_usuario TEXT UNIQUE NOT NULL,
-            senha TEXT NOT NULL,
-            data_admissao DATE,
-            tipo_acesso TEXT,
-            ativo INTEGER NOT NULL DEFAULT 1,
-            created_at TEXT NOT NULL,
-            updated_at TEXT
-        )
+    # every column of the table, and the ones listar/iterar return by default
+    # (never the password hash unless explicitly requested)
+    COLUNAS = ('id', 'nome', 'sobrenome', 'cpf', 'nome_usuario', 'senha', 'data_admissao',
+               'tipo_acesso', 'ativo', 'created_at', 'updated_at')
+    COLUNAS_PUBLICAS = tuple(c for c in COLUNAS if c != 'senha')
+
+    def __init__(self, db_path: str = "data/SysDB.db", *, write_behind: bool = False):
+        # a RemoteDBProxy when SYSDB_SERVER points at a DBServer
+        self.db = open_db(db_path)
+        ensure_schema(self.db)
+        self.write_behind = write_behind
+
+    def _write(self, sql: str, params: Sequence[Any], op: str, user_id: Optional[int] = None,
+               **data) -> ExecResult:
+        """Run one write, record it on the ChangeBus when it hit a row, and commit.
+
+        Goes through the write-behind queue when enabled (not through a
+        DBServer, which group-commits on its side anyway).
         """
-        self.db.execute(sql, commit=True)
+        def run(db) -> ExecResult:
+            cur = db.execute(sql, params)
+            res = ExecResult(cur.lastrowid, cur.rowcount)
+            if res.rowcount > 0:
+                BUS.record(db, 'usuarios', op, res.lastrowid if user_id is None else user_id, **data)
+            return res
+
+        if self.write_behind and not getattr(self.db, 'remote', False):
+            return self.db.writer().call(run).result()
+        with self.db.transaction():
+            return run(self.db)
 
     # Password handling is delegated to auth_utils.hash_password / verify_password
 
@@ -60,16 +83,48 @@ class Usuario:
             raise ValueError('nome, nome_usuario and senha are required')
         hashed = hash_password(senha)
         now = datetime.utcnow().isoformat()
-        cur = self.db.execute(
+        cur = self._write(
             """
             INSERT INTO usuarios (nome, sobrenome, cpf, nome_usuario, senha, data_admissao, tipo_acesso, ativo, created_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
             """,
             (nome, sobrenome, cpf, nome_usuario, hashed, data_admissao, tipo_acesso, now),
-            commit=True,
+            'insert', nome_usuario=nome_usuario,
         )
         return cur.lastrowid
 
+    def adicionar_muitos(self, registros: Iterable[Dict[str, Any]], hasher: Optional[PasswordHasher] = None,
+                         chunk_size: int = 500) -> int:
+        """Add many users in a single transaction and return how many were inserted.
+
+        Each registro is a dict with the same keys as ``adicionar``. Passwords
+        are hashed chunk by chunk in parallel through the PasswordHasher
+        (default_hasher() when none is given). Raises ValueError on a record
+        missing required fields and sqlite3.IntegrityError on duplicates; in
+        both cases nothing is inserted.
+        """
+        hasher = hasher or default_hasher()
+        cols = ('nome', 'sobrenome', 'cpf', 'nome_usuario', 'senha', 'data_admissao', 'tipo_acesso', 'ativo', 'created_at')
+        total = 0
+        it = iter(registros)
+        with self.db.transaction():
+            while True:
+                chunk = list(islice(it, chunk_size))
+                if not chunk:
+                    break
+                for r in chunk:
+                    if not r.get('nome') or not r.get('nome_usuario') or not r.get('senha'):
+                        raise ValueError('nome, nome_usuario and senha are required')
+                hashes = hasher.hash_many(r['senha'] for r in chunk)
+                now = datetime.utcnow().isoformat()
+                rows = [(r['nome'], r.get('sobrenome'), r.get('cpf'), r['nome_usuario'], h,
+                         r.get('data_admissao'), r.get('tipo_acesso'), 1, now)
+                        for r, h in zip(chunk, hashes)]
+                total += self.db.bulk_insert('usuarios', cols, rows)
+            if total:
+                BUS.record(self.db, 'usuarios', 'insert', None, count=total)
+        return total
+
     def atualizar(self, user_id: int, **fields) -> bool:
         """Update fields for user_id. Allowed: nome, sobrenome, cpf, nome_usuario, senha, data_admissao, tipo_acesso, ativo
 
@@ -97,16 +152,15 @@ class Usuario:
         params.append(user_id)
 
         sql = f"UPDATE usuarios SET {', '.join(set_parts)} WHERE id = ?"
-        cur = self.db.execute(sql, params, commit=True)
-        return cur.rowcount > 0
+        data = {'nome_usuario': fields['nome_usuario']} if 'nome_usuario' in fields else {}
+        return self._write(sql, params, 'update', user_id, **data).rowcount > 0
 
     def remover(self, user_id: int) -> bool:
         """Permanently remove a user from the database.
 
         Returns True if a row was deleted, False if user not found.
         """
-        cur = self.db.execute("DELETE FROM usuarios WHERE id = ?", (user_id,), commit=True)
-        return cur.rowcount > 0
+        return self._write("DELETE FROM usuarios WHERE id = ?", (user_id,), 'delete', user_id).rowcount > 0
 
     # helpers
     def obter(self, user_id: int) -> Optional[Dict[str, Any]]:
@@ -123,13 +177,105 @@ class Usuario:
         row = self.db.query_one("SELECT * FROM usuarios WHERE nome_usuario = ?", (nome_usuario,))
         return dict(row) if row else None
 
-    def listar(self, include_inativos: bool = False) -> List[Dict[str, Any]]:
-        if include_inativos:
-            rows = self.db.query_all("SELECT * FROM usuarios ORDER BY id DESC")
-        else:
-            rows = self.db.query_all("SELECT * FROM usuarios WHERE ativo = 1 ORDER BY id DESC")
+    def _filtro(self, include_inativos: bool, busca: Optional[str]) -> Tuple[List[str], List[Any]]:
+        where: List[str] = []
+        params: List[Any] = []
+        if not include_inativos:
+            where.append("ativo = 1")
+        busca = (busca or '').strip()
+        if busca:
+            # prefix match, answered by the NOCASE indexes; % and _ are literal
+            like = busca.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            terms = ["nome LIKE ? ESCAPE '\\'", "nome_usuario LIKE ? ESCAPE '\\'"]
+            params += [like, like]
+            if busca.isdigit():
+                # cpf is stored as an integer: exact match through its unique index
+                terms.append("cpf = ?")
+                params.append(int(busca))
+            where.append("(" + " OR ".join(terms) + ")")
+        return where, params
+
+    def _projecao(self, colunas: Optional[Sequence[str]]) -> List[str]:
+        cols = list(colunas) if colunas else list(self.COLUNAS_PUBLICAS)
+        unknown = [c for c in cols if c not in self.COLUNAS]
+        if unknown:
+            raise ValueError(f'unknown columns: {unknown}')
+        return cols
+
+    def listar(self, include_inativos: bool = False, *, colunas: Optional[Sequence[str]] = None,
+               after_id: Optional[int] = None, limit: Optional[int] = None,
+               busca: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return users newest first (id DESC) as dicts.
+
+        - colunas: columns to fetch (default COLUNAS_PUBLICAS, i.e. no senha)
+        - after_id/limit: keyset pagination; pass the last id of the previous
+          page as after_id to get the next page
+        - busca: case-insensitive prefix search on nome and nome_usuario, or an
+          exact cpf when it is all digits
+        """
+        cols = self._projecao(colunas)
+        where, params = self._filtro(include_inativos, busca)
+        if after_id is not None:
+            where.append("id < ?")
+            params.append(after_id)
+        sql = f"SELECT {', '.join(cols)} FROM usuarios"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        rows = self.db.query_all(sql, params)
         return [dict(r) for r in rows]
 
+    def iterar(self, include_inativos: bool = False, *, colunas: Optional[Sequence[str]] = None,
+               busca: Optional[str] = None, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield users like ``listar`` but one keyset page at a time.
+
+        Only page_size rows are held in memory, which keeps exports of large
+        tables flat in memory. 'id' is always fetched to drive the pagination.
+        """
+        cols = self._projecao(colunas)
+        if 'id' not in cols:
+            cols = ['id'] + cols
+        after_id = None
+        while True:
+            page = self.listar(include_inativos, colunas=cols, after_id=after_id, limit=page_size, busca=busca)
+            if not page:
+                return
+            yield from page
+            if len(page) < page_size:
+                return
+            after_id = page[-1]['id']
+
+    def buscar(self, texto: str, limit: int = 20, *, include_inativos: bool = True,
+               colunas: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Users matching texto, best match first, through the usuarios_fts index.
+
+        Every word of texto must start a word of nome, sobrenome or
+        nome_usuario, ignoring case and accents ("jo sil" finds "João
+        Silva"). An all-digit texto also matches the exact cpf, listed first.
+        """
+        cols = self._projecao(colunas)
+        if 'id' not in cols:
+            cols = ['id'] + cols
+        where = None if include_inativos else "t.ativo = 1"
+        rows = search(self.db, 'usuarios', texto, cols, limit, where=where, weights=(2.0, 1.0, 2.0))
+        termo = (texto or '').strip()
+        if termo.isdigit():
+            sql = f"SELECT {', '.join(cols)} FROM usuarios WHERE cpf = ?" + ("" if include_inativos else " AND ativo = 1")
+            row = self.db.query_one(sql, (int(termo),))
+            if row is not None:
+                rows = [dict(row)] + [r for r in rows if r['id'] != row['id']][:limit - 1]
+        return rows
+
+    def contar(self, include_inativos: bool = False, busca: Optional[str] = None) -> int:
+        where, params = self._filtro(include_inativos, busca)
+        sql = "SELECT COUNT(*) FROM usuarios"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self.db.query_one(sql, params)[0]
+
     def close(self):
         self.db.close()
 
@@ -0,0 +1,191 @@
+"""Lazily populated Treeview for large tables.
+
+VirtualTreeview shows rows a page at a time: the first page is fetched when
+the list is (re)loaded and the next one when the user scrolls near the end.
+Changes are applied as row-level diffs (``upsert`` / ``delete``) instead of
+reloading the table, and column widths come from a bounded sample of rows
+with a cache of measured strings, so opening a screen costs one page of Tk
+calls no matter how large the table is.
+"""
+from __future__ import annotations
+
+import tkinter as tk
+from tkinter import ttk, font as tkfont
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from Metrics import METRICS
+
+# fetch_page(after_key, limit) -> list of row dicts, newest first
+FetchPage = Callable[[Optional[Any], int], List[Dict[str, Any]]]
+# runner(work, on_done): run work() somewhere and call on_done(result) on the Tk thread
+Runner = Callable[[Callable[[], Any], Callable[[Any], None]], None]
+
+
+def _run_inline(work: Callable[[], Any], on_done: Callable[[Any], None]) -> None:
+    on_done(work())
+
+
+class VirtualTreeview:
+    """A headings-only ttk.Treeview backed by a paginated query.
+
+    Usage:
+        vt = VirtualTreeview(frm, cols, fetch_page=lambda after, n: repo.listar(after_id=after, limit=n),
+                             headings=label_map, format_row=fmt)
+        vt.pack()
+        vt.reload()
+    """
+
+    def __init__(self, parent, columns: Sequence[str], *, fetch_page: FetchPage, key: str = 'id',
+                 page_size: int = 100, headings: Optional[Dict[str, str]] = None,
+                 format_row: Optional[Callable[[Dict[str, Any]], Sequence[Any]]] = None,
+                 runner: Optional[Runner] = None, sample_size: int = 200, padding: int = 18,
+                 prefetch_at: float = 0.9):
+        self.columns = tuple(columns)
+        self.fetch_page = fetch_page
+        self.key = key
+        self.page_size = page_size
+        self.format_row = format_row or (lambda row: [row.get(c) for c in self.columns])
+        self.runner = runner or _run_inline
+        self.sample_size = sample_size
+        self.padding = padding
+        self.prefetch_at = prefetch_at
+
+        self.tree = ttk.Treeview(parent, columns=self.columns, show='headings', selectmode='browse')
+        self.vsb = ttk.Scrollbar(parent, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+        headings = headings or {}
+        for c in self.columns:
+            self.tree.heading(c, text=headings.get(c, c), anchor=tk.CENTER)
+            self.tree.column(c, width=120, anchor=tk.CENTER)
+
+        try:
+            self._font = tkfont.nametofont(self.tree.cget('font'))
+        except Exception:
+            self._font = tkfont.nametofont('TkDefaultFont')
+        self._text_widths: Dict[str, int] = {}
+        self._col_widths: Dict[str, int] = {}
+        self._measured = 0
+
+        self._last_key: Optional[Any] = None
+        # newest key loaded so far: upserts above it are new rows
+        self._top_key: Optional[Any] = None
+        self._exhausted = False
+        self._loading = False
+        # bumped on reload so late pages from a previous load are dropped
+        self._generation = 0
+
+    def pack(self) -> None:
+        self.tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        self.vsb.pack(side=tk.LEFT, fill=tk.Y)
+
+    # --- loading ---
+    def reload(self) -> None:
+        """Drop every row and fetch the first page again."""
+        self._generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self._last_key = None
+        self._top_key = None
+        self._exhausted = False
+        self._loading = False
+        self._measured = 0
+        self._col_widths.clear()
+        self.adjust_columns([])
+        self.load_more()
+
+    def load_more(self) -> None:
+        """Fetch the next page unless one is in flight or the end was reached."""
+        if self._loading or self._exhausted or not self.tree.winfo_exists():
+            return
+        self._loading = True
+        gen, after, limit = self._generation, self._last_key, self.page_size
+        self.runner(lambda: self.fetch_page(after, limit), lambda rows: self._append(gen, rows))
+
+    @METRICS.timed('sysdb_ui_seconds', fn='VirtualTreeview._append')
+    def _append(self, gen: int, rows: List[Dict[str, Any]]) -> None:
+        if gen != self._generation or not self.tree.winfo_exists():
+            return
+        self._loading = False
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        sample: List[Sequence[Any]] = []
+        for row in rows:
+            k = row[self.key]
+            values = self.format_row(row)
+            if self.tree.exists(str(k)):
+                self.tree.item(str(k), values=values)
+            else:
+                self.tree.insert('', tk.END, iid=str(k), values=values)
+            if self._measured < self.sample_size:
+                sample.append(values)
+                self._measured += 1
+        if rows:
+            self._last_key = rows[-1][self.key]
+            self._note_key(max(row[self.key] for row in rows))
+        # no explicit "fill the view" loop: Tk calls yscrollcommand after the
+        # rows are laid out, and _on_yscroll asks for more while the end shows
+        self.adjust_columns(sample)
+
+    def _on_yscroll(self, first: str, last: str) -> None:
+        self.vsb.set(first, last)
+        if float(last) >= self.prefetch_at:
+            self.load_more()
+
+    # --- incremental diffs ---
+    def _note_key(self, k: Any) -> None:
+        if self._top_key is None or k > self._top_key:
+            self._top_key = k
+
+    def upsert(self, row: Dict[str, Any], *, at_top: bool = True) -> None:
+        """Insert or update a single row.
+
+        Rows newer than anything loaded are inserted first (lists are newest
+        first). Other rows that are not shown yet are left for paging to
+        fetch in order.
+        """
+        k = row[self.key]
+        iid = str(k)
+        values = self.format_row(row)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values)
+        elif (self._exhausted if self._top_key is None else k > self._top_key):
+            self.tree.insert('', 0 if at_top else tk.END, iid=iid, values=values)
+            self._note_key(k)
+        else:
+            return
+        self.adjust_columns([values])
+
+    def delete(self, key: Any) -> None:
+        iid = str(key)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+
+    def selected_key(self) -> Optional[str]:
+        sel = self.tree.selection()
+        return sel[0] if sel else None
+
+    # --- column widths ---
+    def _measure(self, text: str) -> int:
+        w = self._text_widths.get(text)
+        if w is None:
+            w = self._text_widths[text] = self._font.measure(text)
+        return w
+
+    @METRICS.timed('sysdb_ui_seconds', fn='VirtualTreeview.adjust_columns')
+    def adjust_columns(self, rows: Sequence[Sequence[Any]]) -> None:
+        """Grow column widths to fit the headers and the given rows.
+
+        Widths only grow, so callers pass just new or changed rows; each
+        distinct string is measured once.
+        """
+        for i, c in enumerate(self.columns):
+            current = self._col_widths.get(c)
+            width = current if current is not None else self._measure(str(self.tree.heading(c)['text']))
+            for values in rows:
+                val = values[i] if i < len(values) else ''
+                width = max(width, self._measure('' if val is None else str(val)))
+            if width != current:
+                self._col_widths[c] = width
+                self.tree.column(c, width=width + self.padding, anchor=tk.CENTER)
+
+
+__all__ = ['VirtualTreeview']
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from DBProxy import ConnectionPool  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A fresh database file; its pool is closed after the test."""
+    path = str(tmp_path / 'data' / 'SysDB.db')
+    yield path
+    pool = ConnectionPool._pools.pop(os.path.abspath(path), None)
+    if pool is not None:
+        pool.close_all()
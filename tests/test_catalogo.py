@@ -0,0 +1,37 @@
+import random
+
+from Catalogo import Catalogo, normalizar
+from DBProxy import DBProxy
+from Migrations import ensure_schema
+
+PALAVRAS = ['café', 'latte', 'leite', 'chá', 'cappuccino', 'pão', 'queijo', 'mocha', 'gelado', 'com']
+
+
+def catalogo(db_path, nomes):
+    db = DBProxy(db_path, pooled=True)
+    ensure_schema(db)
+    db.executemany("INSERT INTO produtos (nome, preco_centavos, created_at) VALUES (?, 500, '2024-01-01')",
+                   [(n,) for n in nomes], commit=True)
+    return Catalogo(db_path)
+
+
+def test_multi_word_search_matches_brute_force_in_name_order(db_path):
+    rnd = random.Random(7)
+    nomes = [' '.join(rnd.sample(PALAVRAS, rnd.randint(1, 4))) for _ in range(500)]
+    cat = catalogo(db_path, nomes)
+    _, produtos, ordem = cat._indice
+    por_nome = [produtos[i] for i in ordem]
+    for texto in ('c latte', 'caf le', 'pao queijo com', 'g m c', 'latte chá pão', 'x latte'):
+        termos = normalizar(texto).split()
+        esperado = [p['id'] for p in por_nome
+                    if all(any(w.startswith(t) for w in normalizar(p['nome']).split()) for t in termos)]
+        assert [p['id'] for p in cat.buscar(texto, limit=1000)] == esperado
+        assert [p['id'] for p in cat.buscar(texto, limit=5)] == esperado[:5]
+
+
+def test_code_and_empty_queries(db_path):
+    cat = catalogo(db_path, ['Café Latte', 'Cappuccino', 'Pão de queijo'])
+    assert [p['nome'] for p in cat.buscar('')] == ['Café Latte', 'Cappuccino', 'Pão de queijo']
+    assert cat.buscar('2')[0]['nome'] == 'Cappuccino'
+    assert [p['nome'] for p in cat.buscar('cafe lat')] == ['Café Latte']
+    assert cat.buscar('cafe xis') == []
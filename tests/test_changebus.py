@@ -0,0 +1,89 @@
+import json
+import sqlite3
+
+import pytest
+
+from ChangeBus import ALL, ORIGIN, Change, ChangeBus, ChangeWatcher
+from DBProxy import DBProxy
+from Migrations import ensure_schema
+
+
+@pytest.fixture
+def db(db_path):
+    db = DBProxy(db_path, pooled=True)
+    ensure_schema(db)
+    return db
+
+
+def _other_till(db_path, *rows):
+    """Commit alteracoes rows from a separate connection, as another process would."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executemany("INSERT INTO alteracoes (tabela, op, chave, dados, origem, created_at) "
+                             "VALUES (?, ?, ?, ?, ?, '2024-01-01T00:00:00')", rows)
+    finally:
+        conn.close()
+
+
+def test_record_publishes_after_commit_only(db):
+    bus, seen = ChangeBus(), []
+    bus.subscribe('usuarios', seen.append)
+    with db.transaction():
+        bus.record(db, 'usuarios', 'update', 3, nome='Ana')
+        assert seen == []
+    assert seen == [Change('usuarios', 'update', 3, {'nome': 'Ana'})]
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            bus.record(db, 'usuarios', 'delete', 3)
+            raise RuntimeError
+    assert len(seen) == 1
+    assert db.query_one("SELECT COUNT(*) FROM alteracoes")[0] == 1
+
+
+def test_subscribers_filter_by_table_and_unsubscribe(db):
+    bus, estoque, todos = ChangeBus(), [], []
+    stop = bus.subscribe('estoque', estoque.append)
+    bus.subscribe(None, todos.append)
+    bus.publish(Change('usuarios', 'insert', 1, {}))
+    bus.publish(Change('estoque', 'update', 2, {}))
+    stop()
+    bus.publish(Change('estoque', 'update', 3, {}))
+    bus.publish(Change(ALL, 'reload', None, {}))
+    assert [c.key for c in estoque] == [2]
+    assert [c.key for c in todos] == [1, 2, 3, None]
+
+
+def test_watcher_publishes_other_origins_only(db, db_path):
+    bus, seen = ChangeBus(), []
+    bus.subscribe(None, seen.append)
+    watcher = ChangeWatcher(bus, db_path)
+    watcher._mark_start()
+    assert watcher.poll() == 0
+
+    with db.transaction():
+        ChangeBus().record(db, 'usuarios', 'insert', 1, publish=False)
+    _other_till(db_path,
+                ('estoque', 'update', 5, json.dumps({'qtd': 2}), 'caixa-2:1:abc'),
+                ('usuarios', 'insert', 2, None, ORIGIN))
+    assert watcher.poll() == 1
+    assert seen == [Change('estoque', 'update', 5, {'qtd': 2}, local=False)]
+    # nothing new: data_version did not move
+    assert watcher.poll() == 0
+
+
+def test_watcher_reloads_everything_after_pruned_gap(db, db_path):
+    bus, seen = ChangeBus(), []
+    bus.subscribe('pedidos', seen.append)
+    watcher = ChangeWatcher(bus, db_path, keep=1)
+    watcher._mark_start()
+    watcher.poll()
+
+    _other_till(db_path, *[('pedidos', 'update', i, None, 'caixa-2:1:abc') for i in range(3)])
+    # another till pruned the log before this one caught up
+    assert watcher.prune() == 2
+    _other_till(db_path, ('pedidos', 'update', 9, None, 'caixa-2:1:abc'))
+    assert watcher.poll() == 3
+    assert seen[0] == Change(ALL, 'reload', None, {}, local=False)
+    assert [c.key for c in seen[1:]] == [2, 9]
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from DBProxy import DBProxy
+
+
+@pytest.fixture
+def db(db_path):
+    db = DBProxy(db_path, pooled=True)
+    db.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v INTEGER)", commit=True)
+    return db
+
+
+def test_query_one_does_not_pin_read_snapshot(db, db_path):
+    db.bulk_insert('t', ['v'], ((i,) for i in range(4)))
+    assert db.query_one("SELECT id FROM t ORDER BY id")[0] == 1
+
+    def writer():
+        DBProxy(db_path, pooled=True).bulk_insert('t', ['v'], ((i,) for i in range(96)))
+
+    th = threading.Thread(target=writer)
+    th.start()
+    th.join()
+    assert db.query_one("SELECT COUNT(*) FROM t")[0] == 100
+    busy, _, _ = db.query_one("PRAGMA wal_checkpoint(TRUNCATE)")
+    assert busy == 0
+
+
+def test_nested_transaction_commits_once_with_outer_block(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            with db.transaction():
+                db.execute("INSERT INTO t (v) VALUES (1)")
+            raise RuntimeError
+    assert db.query_one("SELECT COUNT(*) FROM t")[0] == 0
+
+
+def test_inner_rollback_keeps_outer_work(db):
+    with db.transaction():
+        db.execute("INSERT INTO t (v) VALUES (1)")
+        with pytest.raises(ValueError):
+            with db.transaction():
+                db.execute("INSERT INTO t (v) VALUES (2)")
+                raise ValueError
+    assert [r[0] for r in db.query_all("SELECT v FROM t")] == [1]
+
+
+def test_after_commit_runs_only_on_commit(db):
+    ran = []
+    with db.transaction():
+        db.after_commit(lambda: ran.append('outer'))
+        with pytest.raises(ValueError):
+            with db.transaction():
+                db.after_commit(lambda: ran.append('inner'))
+                raise ValueError
+        assert ran == []
+    assert ran == ['outer']
+
+
+def test_bulk_upsert_updates_existing_rows(db):
+    db.bulk_insert('t', ['id', 'v'], [(1, 1), (2, 2)])
+    assert db.bulk_upsert('t', ['id', 'v'], [(2, 20), (3, 30)], ['id']) == 2
+    assert [tuple(r) for r in db.query_all("SELECT id, v FROM t ORDER BY id")] == [(1, 1), (2, 20), (3, 30)]
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from DBServer import DBServer, is_read
+from RemoteDBProxy import RemoteDBProxy, RemoteError, open_db
+
+
+@pytest.fixture
+def server(db_path, monkeypatch):
+    # Unix socket paths are limited to ~100 bytes: keep it out of tmp_path
+    sock_dir = tempfile.mkdtemp(prefix='sysdb')
+    sock = os.path.join(sock_dir, 's.sock')
+    monkeypatch.setenv('SYSDB_SERVER_TOKEN', 's3gredo')
+    srv = DBServer(db_path, readers=2, lock_timeout=5.0, token='s3gredo')
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(srv.start(unix_path=sock))
+        started.set()
+        loop.run_forever()
+
+    th = threading.Thread(target=run, daemon=True)
+    th.start()
+    assert started.wait(5)
+    with RemoteDBProxy('unix:' + sock) as db:
+        db.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY, v INTEGER)")
+    yield 'unix:' + sock
+    RemoteDBProxy.close_shared()
+
+    async def stop():
+        srv._server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    th.join(5)
+    loop.close()
+    srv.close()
+    shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+def test_is_read():
+    assert is_read("SELECT 1")
+    assert is_read("  (SELECT 1)")
+    assert not is_read("WITH x AS (SELECT 1) INSERT INTO t SELECT * FROM x")
+    assert is_read("PRAGMA user_version")
+    assert not is_read("PRAGMA user_version = 3")
+    assert not is_read("INSERT INTO t VALUES (1, 1)")
+
+
+def test_reads_see_own_writes_and_errors_keep_their_type(server):
+    with RemoteDBProxy(server) as db:
+        cur = db.execute("INSERT INTO t (v) VALUES (?)", (b'\x00\x01',))
+        row = db.query_one("SELECT id, v FROM t WHERE id = ?", (cur.lastrowid,))
+        assert row['v'] == b'\x00\x01' and row[0] == cur.lastrowid
+        with pytest.raises(sqlite3.OperationalError):
+            db.execute("SELECT * FROM nao_existe")
+        with pytest.raises(sqlite3.IntegrityError):
+            db.execute("INSERT INTO t (id, v) VALUES (?, 0)", (cur.lastrowid,))
+
+
+def test_nested_transaction_rolls_back_to_savepoint(server):
+    with RemoteDBProxy(server) as db:
+        with db.transaction():
+            db.execute("INSERT INTO t (v) VALUES (1)")
+            with pytest.raises(ValueError):
+                with db.transaction():
+                    db.execute("INSERT INTO t (v) VALUES (2)")
+                    raise ValueError
+        assert [r[0] for r in db.query_all("SELECT v FROM t")] == [1]
+
+
+def test_concurrent_transactions_do_not_starve_the_lock_holder(server):
+    # more clients than reader threads, each holding its transaction open for a while
+    clientes = 6
+    erros, duracoes = [], []
+
+    def cliente(k):
+        with RemoteDBProxy(server) as db:
+            t0 = time.perf_counter()
+            try:
+                with db.transaction():
+                    db.execute("INSERT INTO t (v) VALUES (?)", (k,))
+                    time.sleep(0.05)
+                    db.execute("INSERT INTO t (v) VALUES (?)", (k,))
+            except Exception as exc:
+                erros.append(exc)
+            duracoes.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=cliente, args=(k,)) for k in range(clientes)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join(30)
+    assert erros == []
+    assert max(duracoes) < 2.0
+    with RemoteDBProxy(server) as db:
+        assert db.query_one("SELECT COUNT(*) FROM t")[0] == 2 * clientes
+
+
+def test_disconnect_mid_transaction_rolls_back_and_frees_the_lock(server):
+    db = RemoteDBProxy(server)
+    tx = db._call('begin')['tx']
+    db._call('execute', tx=tx, sql="INSERT INTO t (v) VALUES (7)", params=None)
+    db.close()
+    with RemoteDBProxy(server) as other:
+        with other.transaction():
+            other.execute("INSERT INTO t (v) VALUES (8)")
+        assert [r[0] for r in other.query_all("SELECT v FROM t")] == [8]
+
+
+def test_open_db_shares_one_proxy_per_server(server, monkeypatch):
+    monkeypatch.setenv('SYSDB_SERVER', server)
+    a, b = open_db(), open_db()
+    assert a is b
+    a.close()
+    assert b.query_one("SELECT 1")[0] == 1
+
+
+def test_hello_rejects_a_wrong_token(server):
+    for token in ('errada', ''):
+        with pytest.raises(RemoteError, match='invalid token'):
+            RemoteDBProxy(server, token=token)
+
+
+def test_open_db_refuses_a_database_the_server_does_not_serve(server, db_path, tmp_path, monkeypatch):
+    monkeypatch.setenv('SYSDB_SERVER', server)
+    assert open_db(db_path).server_db_path == os.path.realpath(db_path)
+    assert open_db() is open_db(db_path)
+    with pytest.raises(RemoteError):
+        open_db(str(tmp_path / 'demo.db'))
+
+
+def test_repositories_run_through_the_server(server, db_path, monkeypatch):
+    from Controle import Controle
+    from Gastos import Gastos
+    from Pedidos import Pedidos
+    from Relatorios import Relatorios
+
+    monkeypatch.setenv('SYSDB_SERVER', server)
+    ped = Pedidos(db_path, flush_interval=0, terminal='caixa1')
+    assert ped.db.remote
+    controle = Controle(db_path)
+    ped.add_close_hook(controle.pedidoFechado)
+    pid = ped.criarPedido(mesa='1', itens=[{'descricao': 'café', 'preco_unit_centavos': 500}])
+    ped.fecharPedido(pid)
+    gastos = Gastos(db_path, controle=controle)
+    gastos.cadastrarGasto('2024-05-01', 'a', 120)
+    assert gastos.somarGastos('2024-05-01', '2024-05-31') == 120
+    rel = Relatorios(db_path)
+    assert rel.gerar('2024-05-01', '2024-05-31')['totais']['gastos_centavos'] == 120
+    ped.close()
+
+    local = sqlite3.connect(db_path)
+    assert local.execute("SELECT status FROM pedidos WHERE id = ?", (pid,)).fetchone()[0] == 'fechado'
+    local.close()
+
+
+def test_remote_report_pages_by_key(server, db_path, monkeypatch):
+    from Pedidos import Pedidos
+    from Relatorios import Relatorios
+
+    ped = Pedidos(db_path, flush_interval=0, terminal='caixa1')
+    for k in range(5):
+        pid = ped.criarPedido(mesa=str(k), itens=[{'descricao': 'café', 'preco_unit_centavos': 500, 'quantidade': k + 1},
+                                                  {'descricao': 'pão', 'preco_unit_centavos': 300}])
+        ped.fecharPedido(pid)
+    ped.close()
+    hoje = date.today().isoformat()
+    esperado = Relatorios(db_path).gerar(hoje, hoje)
+
+    monkeypatch.setenv('SYSDB_SERVER', server)
+    rel = Relatorios(db_path, chunk_size=3)
+    respostas = []
+    query_all = rel.db.query_all
+
+    def espiao(sql, params=None):
+        rows = query_all(sql, params)
+        respostas.append(len(rows))
+        return rows
+    monkeypatch.setattr(rel.db, 'query_all', espiao)
+    assert rel.gerar(hoje, hoje) == esperado
+    # 10 lines in pages of at most 3, then the expense query's empty page
+    assert max(respostas) <= 3 and sum(respostas[:4]) == 10
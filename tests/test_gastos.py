@@ -0,0 +1,91 @@
+import random
+import threading
+from datetime import date, timedelta
+
+from Gastos import Gastos, _Fenwick
+from ImportExport import import_table
+
+
+def soma_sql(g, inicio, fim, categoria=None):
+    return sum(r['valor_centavos'] for r in g.consultarGastos(inicio, fim, categoria))
+
+
+def test_fenwick_prefix_sums():
+    rnd = random.Random(7)
+    valores = [0] * 50
+    f = _Fenwick(50)
+    for _ in range(200):
+        i, v = rnd.randrange(50), rnd.randint(-100, 100)
+        valores[i] += v
+        f.add(i, v)
+    for i in range(-1, 50):
+        assert f.prefix(i) == sum(valores[:i + 1])
+
+
+def test_sums_follow_own_updates_and_deletes(db_path):
+    g = Gastos(db_path)
+    base = date(2024, 1, 1)
+    rnd = random.Random(3)
+    ids = [g.cadastrarGasto(base + timedelta(days=rnd.randrange(365)), rnd.choice('abc'), rnd.randint(1, 9999))
+           for _ in range(100)]
+    assert g.somarGastos('2024-01-01', '2024-12-31') == soma_sql(g, '2024-01-01', '2024-12-31')
+    for gid in ids[:20]:
+        g.AtualizarGasto(gid, valor_centavos=1, categoria='z', data='2025-06-01')
+    for gid in ids[20:30]:
+        g.excluirGasto(gid)
+    for ini, fim, cat in [('2024-01-01', '2025-12-31', None), ('2024-03-01', '2024-03-31', 'a'),
+                          ('2025-06-01', '2025-06-01', 'z')]:
+        assert g.somarGastos(ini, fim, cat) == soma_sql(g, ini, fim, cat)
+
+
+def test_sums_see_writes_from_another_instance_on_the_same_connection(db_path):
+    g1, g2 = Gastos(db_path), Gastos(db_path)
+    g1.cadastrarGasto('2024-05-01', 'a', 100)
+    assert g1.somarGastos('2024-05-01', '2024-05-31') == 100
+    g2.cadastrarGasto('2024-05-02', 'a', 1050)
+    assert g1.somarGastos('2024-05-01', '2024-05-31') == 1150
+
+
+def test_sums_see_imports(db_path, tmp_path):
+    g = Gastos(db_path)
+    g.cadastrarGasto('2024-05-01', 'a', 100)
+    assert g.somarGastos('2024-05-01', '2024-05-31') == 100
+    arquivo = tmp_path / 'gastos.csv'
+    arquivo.write_text('data,categoria,valor_centavos,created_at\n2024-05-03,b,1050,2024-05-03T10:00:00\n')
+    assert import_table('gastos', str(arquivo), db_path).inserted == 1
+    assert g.somarGastos('2024-05-01', '2024-05-31') == 1150
+
+
+def test_first_read_from_another_thread_sees_other_commits(db_path):
+    g = Gastos(db_path)
+    g.cadastrarGasto('2024-05-01', 'a', 100)
+    assert g.somarGastos('2024-05-01', '2024-05-31') == 100
+    outro = Gastos(db_path)
+    g.db.execute("INSERT INTO gastos (data, categoria, valor_centavos, created_at) VALUES ('2024-05-02', 'a', 50, '')",
+                 commit=True)
+    res = []
+    th = threading.Thread(target=lambda: res.append(outro.somarGastos('2024-05-01', '2024-05-31')))
+    th.start()
+    th.join()
+    assert res == [150]
+    assert g.somarGastos('2024-05-01', '2024-05-31') == 150
+
+
+def test_rolled_back_outer_transaction_does_not_leak_into_sums(db_path):
+    g = Gastos(db_path)
+    g.cadastrarGasto('2024-05-01', 'a', 100)
+    assert g.somarGastos('2024-05-01', '2024-05-31') == 100
+    try:
+        with g.db.transaction():
+            g.cadastrarGasto('2024-05-02', 'a', 999)
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert g.somarGastos('2024-05-01', '2024-05-31') == 100
+
+
+def test_recurring_bills_are_counted(db_path):
+    g = Gastos(db_path)
+    g.cadastrarRecorrente('Aluguel', 'aluguel', 350000, dia=10, inicio='2024-01-01', fim='2024-06-30')
+    assert g.somarGastos('2024-01-01', '2024-12-31', 'aluguel') == 6 * 350000
+    assert len(g.contasAPagar('2024-12-31')) == 6
@@ -0,0 +1,22 @@
+import pytest
+
+from DBProxy import DBProxy
+from Migrations import current_version, latest_version, migrate
+
+
+def test_migrate_applies_every_version(db_path):
+    db = DBProxy(db_path, pooled=True)
+    assert migrate(db) == latest_version()
+    assert current_version(db) == latest_version()
+    assert migrate(db) == latest_version()
+
+
+def test_migrate_refuses_to_commit_callers_transaction(db_path):
+    db = DBProxy(db_path, pooled=True)
+    db.execute("CREATE TABLE rascunho (v INTEGER)", commit=True)
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.execute("INSERT INTO rascunho VALUES (1)")
+            migrate(db)
+    assert db.query_one("SELECT COUNT(*) FROM rascunho")[0] == 0
+    assert current_version(db) == 0
@@ -0,0 +1,38 @@
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from PasswordHasher import PasswordHasher
+
+
+class _MortoPool:
+    """A pool whose worker died after the job was accepted."""
+
+    def __init__(self):
+        self.desligado = False
+
+    def submit(self, fn, *args):
+        fut = Future()
+        fut.set_exception(BrokenProcessPool('worker died'))
+        return fut
+
+    def shutdown(self, wait=True):
+        self.desligado = True
+
+
+def test_dead_worker_is_retried_inline_and_pool_reset():
+    hasher = PasswordHasher(inline=True)
+    stored = hasher.hash('s3nha')
+
+    hasher._inline = False
+    hasher._pool = morto = _MortoPool()
+    assert hasher.verify('s3nha', stored) is True
+    assert hasher._pool is None and morto.desligado
+
+    hasher._pool = _MortoPool()
+    assert hasher.verify_many([('s3nha', stored), ('errada', stored)]) == [True, False]
+    hasher._pool = _MortoPool()
+    assert hasher.verify('s3nha', hasher.hash('s3nha'))
+    hasher._pool = _MortoPool()
+    assert asyncio.run(hasher.verify_async('errada', stored)) is False
+    hasher.shutdown()
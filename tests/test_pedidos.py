@@ -0,0 +1,118 @@
+import os
+import threading
+
+import pytest
+
+from Pedidos import Pedidos, PedidoError
+
+
+class Crash(BaseException):
+    """Stands in for the process dying at a given point."""
+
+
+def abrir(db_path, terminal='caixa1', **kwargs):
+    return Pedidos(db_path, flush_interval=0, terminal=terminal, **kwargs)
+
+
+def item(qtd=1):
+    return {'descricao': 'café', 'preco_unit_centavos': 500, 'quantidade': qtd}
+
+
+def test_unflushed_orders_are_replayed_from_the_journal(db_path):
+    p = abrir(db_path)
+    pid = p.criarPedido(mesa='1', itens=[item()])
+    p.atualizarPedido(pid, adicionar=[item(2)])
+    # crash: nothing was flushed
+    p2 = abrir(db_path)
+    assert p2.obter(pid)['total_centavos'] == 1500
+    assert p2.db.query_one("SELECT status FROM pedidos WHERE id = ?", (pid,))[0] == 'aberto'
+    p2.close()
+
+
+def test_crash_after_close_commit_does_not_reopen_order(db_path):
+    p = abrir(db_path)
+    fechados = []
+    p.add_close_hook(lambda db, pedido: fechados.append(pedido.id))
+    pid = p.criarPedido(mesa='1', itens=[item()])
+
+    def crash(_pedido):
+        raise Crash
+    p._log = crash
+    with pytest.raises(Crash):
+        p.fecharPedido(pid)
+    assert fechados == [pid]
+
+    p2 = abrir(db_path)
+    row = p2.db.query_one("SELECT status, fechado_em FROM pedidos WHERE id = ?", (pid,))
+    assert row['status'] == 'fechado' and row['fechado_em'] is not None
+    assert p2.MostrarPedidos() == []
+    with pytest.raises(PedidoError):
+        p2.fecharPedido(pid)
+    p2.close()
+
+
+def test_each_terminal_keeps_its_own_journal_and_orders(db_path):
+    a = abrir(db_path, 'caixa1')
+    b = abrir(db_path, 'caixa2')
+    assert a.journal_path != b.journal_path
+    pa = a.criarPedido(mesa='1', itens=[item()])
+    pb = b.criarPedido(mesa='2', itens=[item()])
+    a.flush()
+    b.flush()
+    b.close()
+    assert os.path.exists(a.journal_path)
+
+    # caixa2 restarts: it gets its order back and leaves caixa1's alone
+    b2 = abrir(db_path, 'caixa2')
+    assert [d['id'] for d in b2.MostrarPedidos()] == [pb]
+    a.fecharPedido(pa)
+    b2.fecharPedido(pb)
+    a.close()
+    b2.close()
+
+
+def test_close_writes_final_state_and_flush_does_not_overwrite(db_path):
+    p = abrir(db_path)
+    pid = p.criarPedido(mesa='1', itens=[item()])
+    p.fecharPedido(pid)
+    p.flush()
+    assert p.obter(pid)['status'] == 'fechado'
+    p.close()
+
+
+def test_update_during_close_is_rejected_not_lost(db_path):
+    p = abrir(db_path)
+    pid = p.criarPedido(mesa='1', itens=[item()])
+    in_hook, resume = threading.Event(), threading.Event()
+    vistos = []
+
+    def hook(db, pedido):
+        in_hook.set()
+        resume.wait(5)
+        vistos.append(pedido.total_centavos)
+    p.add_close_hook(hook)
+    closer = threading.Thread(target=p.fecharPedido, args=(pid,))
+    closer.start()
+    assert in_hook.wait(5)
+    with pytest.raises(PedidoError):
+        p.atualizarPedido(pid, adicionar=[item(3)])
+    resume.set()
+    closer.join(5)
+
+    assert vistos == [500]
+    row = p.db.query_one("SELECT status, total_centavos FROM pedidos WHERE id = ?", (pid,))
+    assert tuple(row) == ('fechado', 500)
+    p.close()
+
+
+def test_failed_close_leaves_order_editable(db_path):
+    p = abrir(db_path)
+    pid = p.criarPedido(mesa='1', itens=[item()])
+
+    def falha(db, pedido):
+        raise ValueError('sem estoque')
+    p.add_close_hook(falha)
+    with pytest.raises(ValueError):
+        p.fecharPedido(pid)
+    assert p.atualizarPedido(pid, adicionar=[item()]).total_centavos == 1000
+    p.close()
@@ -0,0 +1,43 @@
+import pytest
+
+tk = pytest.importorskip('tkinter')
+
+from VirtualTree import VirtualTreeview  # noqa: E402
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip('no display')
+    root.withdraw()
+    yield root
+    root.destroy()
+
+
+def make(root, ids, page_size=3):
+    def fetch_page(after, n):
+        rest = [i for i in ids if after is None or i < after]
+        return [{'id': i, 'nome': f'u{i}'} for i in rest[:n]]
+    vt = VirtualTreeview(root, ['id', 'nome'], fetch_page=fetch_page, page_size=page_size)
+    vt.reload()
+    return vt
+
+
+def test_upsert_puts_only_new_ids_on_top(root):
+    vt = make(root, [9, 8, 7, 6, 5, 4])
+    assert vt.tree.get_children() == ('9', '8', '7')
+    vt.upsert({'id': 10, 'nome': 'novo'})
+    vt.upsert({'id': 5, 'nome': 'ainda não carregado'})
+    vt.upsert({'id': 8, 'nome': 'editado'})
+    assert vt.tree.get_children() == ('10', '9', '8', '7')
+    assert vt.tree.item('8', 'values')[1] == 'editado'
+    vt.load_more()
+    assert vt.tree.get_children() == ('10', '9', '8', '7', '6', '5', '4')
+
+
+def test_upsert_into_empty_list(root):
+    vt = make(root, [])
+    vt.upsert({'id': 1, 'nome': 'primeiro'})
+    assert vt.tree.get_children() == ('1',)
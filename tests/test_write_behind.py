@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+
+import pytest
+
+from DBProxy import DBProxy, WriteBehindQueue
+
+
+@pytest.fixture
+def wq(db_path):
+    DBProxy(db_path, pooled=True).execute(
+        "CREATE TABLE t (id INTEGER PRIMARY KEY, v INTEGER UNIQUE)", commit=True)
+    wq = WriteBehindQueue(db_path)
+    yield wq
+    wq.close(5)
+
+
+def _hold_writer(wq):
+    """Park the writer thread so the next submissions land in one batch."""
+    started, release = threading.Event(), threading.Event()
+
+    def park(db):
+        started.set()
+        release.wait(5)
+    wq.call(park)
+    assert started.wait(5)
+    return release
+
+
+def test_futures_resolve_after_commit(wq, db_path):
+    fut = wq.execute("INSERT INTO t (v) VALUES (?)", (1,))
+    res = fut.result(5)
+    assert res.lastrowid == 1 and res.rowcount == 1
+    # visible to a connection that is not the writer's
+    other = sqlite3.connect(db_path)
+    try:
+        assert other.execute("SELECT v FROM t").fetchall() == [(1,)]
+    finally:
+        other.close()
+
+
+def test_failing_job_only_fails_its_own_future(wq, db_path):
+    release = _hold_writer(wq)
+    ok1 = wq.execute("INSERT INTO t (v) VALUES (?)", (1,))
+    bad = wq.call(lambda db: (db.execute("INSERT INTO t (v) VALUES (2)"),
+                              db.execute("INSERT INTO t (v) VALUES (1)")))
+    ok2 = wq.executemany("INSERT INTO t (v) VALUES (?)", [(3,), (4,)])
+    batches = wq.stats()['batches']
+    release.set()
+
+    assert ok1.result(5).rowcount == 1
+    assert ok2.result(5) == 2
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(5)
+    # the failing job's first insert was rolled back with its savepoint
+    rows = DBProxy(db_path, pooled=True).query_all("SELECT v FROM t ORDER BY v")
+    assert [r[0] for r in rows] == [1, 3, 4]
+    assert wq.stats()['batches'] == batches + 2
+    assert wq.stats()['errors'] == 1
+
+
+def test_durable_batch_counts_and_callbacks(wq):
+    seen = []
+    done = threading.Event()
+
+    def ok(value):
+        seen.append(value)
+        done.set()
+    wq.call(lambda db: db.execute("INSERT INTO t (v) VALUES (7)").lastrowid,
+            durable=True, on_success=ok)
+    assert done.wait(5)
+    assert seen == [1]
+    assert wq.stats()['durable_batches'] == 1
+
+
+def test_close_commits_queued_work(db_path):
+    DBProxy(db_path, pooled=True).execute("CREATE TABLE t (v INTEGER)", commit=True)
+    wq = WriteBehindQueue.get(db_path)
+    assert WriteBehindQueue.get(db_path) is wq
+    futs = [wq.execute("INSERT INTO t (v) VALUES (?)", (i,)) for i in range(50)]
+    wq.close(5)
+    assert all(f.done() for f in futs)
+    with pytest.raises(RuntimeError):
+        wq.execute("INSERT INTO t (v) VALUES (0)")
+    assert DBProxy(db_path, pooled=True).query_one("SELECT COUNT(*) FROM t")[0] == 50
+    assert WriteBehindQueue.get(db_path) is not wq
+    WriteBehindQueue.get(db_path).close(5)
+
+
+# the writer thread dies with the error; pytest reports it as a warning
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_writer_crash_fails_queued_futures(wq):
+    release = _hold_writer(wq)
+
+    def boom(db, batch):
+        raise sqlite3.OperationalError('disk I/O error')
+    wq._commit_batch = boom
+    futs = [wq.execute("INSERT INTO t (v) VALUES (?)", (i,)) for i in range(3)]
+    release.set()
+    for fut in futs:
+        with pytest.raises(RuntimeError):
+            fut.result(5)
+    with pytest.raises(RuntimeError):
+        wq.execute("INSERT INTO t (v) VALUES (9)")
+
+
+def test_no_future_is_left_pending_by_a_concurrent_close(db_path):
+    DBProxy(db_path, pooled=True).execute("CREATE TABLE t (v INTEGER)", commit=True)
+    for _ in range(20):
+        wq = WriteBehindQueue(db_path)
+        futs, go = [], threading.Event()
+
+        def submit():
+            go.wait(5)
+            for i in range(50):
+                try:
+                    futs.append(wq.execute("INSERT INTO t (v) VALUES (?)", (i,)))
+                except RuntimeError:
+                    return
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for th in threads:
+            th.start()
+        go.set()
+        wq.close(5)
+        for th in threads:
+            th.join(5)
+        for fut in futs:
+            try:
+                fut.result(5)
+            except RuntimeError:
+                pass